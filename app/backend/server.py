@@ -1,21 +1,39 @@
 from __future__ import annotations
 
 import base64
+import difflib
+import email.utils
 import fcntl
+import hashlib
+import hmac
+import html as htmllib
+import http.client
 import io
 import json
+import multiprocessing
 import logging
 import logging.handlers
+import mmap
 import time
 import os
 import re
+import select
 import shutil
+import struct
+import threading
 import unicodedata
+import urllib.parse
 import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 from html.parser import HTMLParser
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from xml.sax.saxutils import escape as xml_escape
 from typing import Any, Dict, List, Optional, Tuple
 
 from cryptography.fernet import Fernet, InvalidToken
@@ -54,7 +72,7 @@ def _setup_logging() -> None:
 _setup_logging()
 log = logging.getLogger("stickynotes")
 
-from flask import Flask, jsonify, request, send_file, send_from_directory
+from flask import Flask, Response, jsonify, request, send_file, send_from_directory
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -62,7 +80,8 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import mm
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted, PageBreak
+from reportlab.platypus.tableofcontents import TableOfContents
 try:
     import yaml
 except Exception:
@@ -95,8 +114,47 @@ def _normalize_citations(text: str) -> str:
     return out.replace(_CITE_START, "").replace(_CITE_SEP, "").replace(_CITE_END, "")
 
 
+class _GlyphWidths(dict):
+    """Glyph widths of one font in 1/1000 em, measured on first use.
+
+    For Type 1 fonts (the standard ones used here) summing glyph units and scaling
+    once, ``units * 0.001 * size``, is exactly what pdfmetrics.stringWidth computes.
+    """
+
+    def __init__(self, font_name: str):
+        super().__init__()
+        self.font_name = font_name
+        font = pdfmetrics.getFont(font_name)
+        self._t1_fonts = [font] + list(font.substitutionFonts) if type(font) is pdfmetrics.Font else None
+
+    def __missing__(self, ch: str) -> float:
+        if self._t1_fonts is not None:
+            units = sum(sum(map(f.widths.__getitem__, t)) for f, t in pdfmetrics.unicode2T1(ch, self._t1_fonts))
+        else:
+            units = pdfmetrics.stringWidth(ch, self.font_name, 1000)
+        self[ch] = units
+        return units
+
+
+_glyph_widths: Dict[str, _GlyphWidths] = {}
+
+
 def _pdf_wrap_lines(text: str, c, max_width: float, font_name: str, font_size: int):
-    # Basic word-wrap; preserves existing newlines
+    # Basic word-wrap; preserves existing newlines. Widths are accumulated from cached
+    # glyph widths instead of re-measuring the growing line for every word.
+    widths = _glyph_widths.get(font_name)
+    if widths is None:
+        widths = _glyph_widths.setdefault(font_name, _GlyphWidths(font_name))
+    glyph = widths.__getitem__
+    space_units = glyph(" ")
+
+    def fits(units: float, s: str) -> bool:
+        w = units * 0.001 * font_size
+        if abs(w - max_width) > 1e-6:
+            return w <= max_width
+        # Too close to call with summed widths (non-Type 1 fonts); measure exactly
+        return pdfmetrics.stringWidth(s, font_name, font_size) <= max_width
+
     lines_out = []
     for raw_line in (text or "").splitlines():
         if not raw_line:
@@ -104,27 +162,39 @@ def _pdf_wrap_lines(text: str, c, max_width: float, font_name: str, font_size: i
             continue
         words = raw_line.split(" ")
         cur = ""
+        cur_units = 0
         for w in words:
-            cand = (cur + " " + w).strip() if cur else w
-            if pdfmetrics.stringWidth(cand, font_name, font_size) <= max_width:
-                cur = cand
+            w_units = sum(map(glyph, w))
+            if cur:
+                cand = cur + " " + w
+                cand_units = cur_units + space_units + w_units
+                stripped = cand.strip()
+                if len(stripped) != len(cand):
+                    cand = stripped
+                    cand_units = sum(map(glyph, cand))
+            else:
+                cand, cand_units = w, w_units
+            if fits(cand_units, cand):
+                cur, cur_units = cand, cand_units
             else:
                 if cur:
                     lines_out.append(cur)
                 # if single word longer than width, hard-split
-                if pdfmetrics.stringWidth(w, font_name, font_size) <= max_width:
-                    cur = w
+                if fits(w_units, w):
+                    cur, cur_units = w, w_units
                 else:
                     chunk = ""
+                    chunk_units = 0
                     for ch in w:
-                        cand2 = chunk + ch
-                        if pdfmetrics.stringWidth(cand2, font_name, font_size) <= max_width:
-                            chunk = cand2
+                        ch_units = glyph(ch)
+                        if fits(chunk_units + ch_units, chunk + ch):
+                            chunk += ch
+                            chunk_units += ch_units
                         else:
                             if chunk:
                                 lines_out.append(chunk)
-                            chunk = ch
-                    cur = chunk
+                            chunk, chunk_units = ch, ch_units
+                    cur, cur_units = chunk, chunk_units
         if cur:
             lines_out.append(cur)
     return lines_out
@@ -207,53 +277,141 @@ class _MdBlockParser(HTMLParser):
             self.cur += (data or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
 
-def _markdown_to_flowables(md_text: str) -> List[Any]:
-    def normalize_lists(text: str) -> str:
-        if not text:
-            return text
-        lines = text.replace("\r\n", "\n").split("\n")
-        out: List[str] = []
-        in_code = False
-        list_re = re.compile(r"^\s*(?:[-*]|\d+\.)\s+")
-        for line in lines:
-            if line.strip().startswith("```"):
-                in_code = not in_code
-                out.append(line)
-                continue
-            if not in_code and list_re.match(line):
-                if out:
-                    prev = out[-1]
-                    if prev.strip() and not list_re.match(prev):
-                        out.append("")
+_MD_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*]|\d+\.)\s+")
+_MD_EXTENSIONS = ["fenced_code", "tables"]
+
+
+class _RenderContext:
+    """Styles and Markdown converters shared by all PDF and HTML renders.
+
+    ParagraphStyles are only read during layout, so one set is shared by all
+    threads. python-markdown instances keep per-document state and are not
+    thread-safe, so each thread gets its own and resets it after every document.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.styles = styles
+        self.code = styles["Code"]
+        self.title = ParagraphStyle("PdfTitle", parent=styles["Heading1"], fontSize=16, spaceAfter=10)
+        self.h1 = ParagraphStyle("H1", parent=styles["Heading1"], fontSize=18, spaceAfter=8)
+        self.h2 = ParagraphStyle("H2", parent=styles["Heading2"], fontSize=15, spaceAfter=6)
+        self.h3 = ParagraphStyle("H3", parent=styles["Heading3"], fontSize=13, spaceAfter=6)
+        self.body = ParagraphStyle(
+            "Body",
+            parent=styles["BodyText"],
+            fontSize=10.5,
+            leading=13,
+            splitLongWords=True,
+            wordWrap="CJK",
+        )
+        self.group = ParagraphStyle("PdfGroup", parent=styles["Heading1"], fontSize=18, spaceAfter=10)
+        self.note = ParagraphStyle("PdfNote", parent=styles["Heading2"], fontSize=15, spaceAfter=8)
+        self.toc_levels = [
+            ParagraphStyle("Toc0", parent=styles["BodyText"], fontSize=11, leading=14, fontName="Helvetica-Bold"),
+            ParagraphStyle("Toc1", parent=styles["BodyText"], fontSize=10, leading=12, leftIndent=12),
+        ]
+        self._local = threading.local()
+
+    def markdown_to_html(self, md_text: str, safe: bool = False) -> str:
+        """Convert Markdown; with ``safe`` raw HTML in the source is escaped, not passed
+        through, and link/image URLs with a scheme other than http(s)/mailto are dropped."""
+        attr = "md_safe" if safe else "md"
+        md = getattr(self._local, attr, None)
+        if md is None:
+            md = mdlib.Markdown(extensions=_MD_EXTENSIONS)
+            if safe:
+                md.preprocessors.deregister("html_block")
+                md.inlinePatterns.deregister("html")
+                # After "inline" (20), which creates the <a>/<img> elements
+                md.treeprocessors.register(_SafeUrlProcessor(), "safe_urls", 1)
+            setattr(self._local, attr, md)
+        try:
+            return md.convert(md_text)
+        finally:
+            md.reset()
+
+
+_SAFE_URL_SCHEMES = ("http", "https", "mailto")
+_URL_SCHEME_RE = re.compile(r"^([a-z][a-z0-9+.-]*):", re.I)
+# Browsers drop these anywhere in a URL (tab, newline) or around it (C0, space)
+_URL_IGNORED_RE = re.compile(r"[\x00-\x20\x7f-\x9f]+")
+
+
+def safe_url(value: str) -> bool:
+    """True if a link/image URL is relative, a fragment, or uses an allowed scheme.
+
+    The check runs on the value as the browser will see it: entities decoded
+    (html.unescape decodes everything a browser does in an attribute, and more)
+    and ignored characters removed, so "jav&#x61;script:" is caught.
+    """
+    if mdlib is not None:
+        value = value.replace(mdlib.util.AMP_SUBSTITUTE, "&")
+    value = _URL_IGNORED_RE.sub("", htmllib.unescape(value))
+    m = _URL_SCHEME_RE.match(value)
+    return m is None or m.group(1).lower() in _SAFE_URL_SCHEMES
+
+
+class _SafeUrlProcessor:
+    """python-markdown treeprocessor replacing unsafe href/src values with "#"."""
+
+    def run(self, root):
+        for el in root.iter():
+            for attr in ("href", "src"):
+                v = el.get(attr)
+                if v is not None and not safe_url(v):
+                    el.set(attr, "#")
+        return None
+
+
+_render_ctx: Optional[_RenderContext] = None
+_render_ctx_lock = threading.Lock()
+
+
+def _render_context() -> _RenderContext:
+    global _render_ctx
+    if _render_ctx is None:
+        with _render_ctx_lock:
+            if _render_ctx is None:
+                _render_ctx = _RenderContext()
+    return _render_ctx
+
+
+def _normalize_md_lists(text: str) -> str:
+    """Insert the blank line python-markdown needs before a list that follows a paragraph."""
+    if not text:
+        return text
+    lines = text.replace("\r\n", "\n").split("\n")
+    out: List[str] = []
+    in_code = False
+    for line in lines:
+        if line.strip().startswith("```"):
+            in_code = not in_code
             out.append(line)
-        return "\n".join(out)
+            continue
+        if not in_code and _MD_LIST_ITEM_RE.match(line):
+            if out:
+                prev = out[-1]
+                if prev.strip() and not _MD_LIST_ITEM_RE.match(prev):
+                    out.append("")
+        out.append(line)
+    return "\n".join(out)
 
+
+def _markdown_to_flowables(md_text: str) -> List[Any]:
+    ctx = _render_context()
+    code_style = ctx.code
+    max_width = A4[0] - (18 * mm * 2)
     if mdlib is None:
-        styles = getSampleStyleSheet()
-        code_style = styles["Code"]
-        max_width = A4[0] - (18 * mm * 2)
         wrapped = "\n".join(_pdf_wrap_lines(md_text or "", None, max_width, code_style.fontName, code_style.fontSize))
         return [Preformatted(wrapped, code_style)]
-    md_text = normalize_lists(md_text or "")
-    html = mdlib.markdown(md_text or "", extensions=["fenced_code", "tables"])
+    md_text = _normalize_md_lists(md_text or "")
+    html = ctx.markdown_to_html(md_text or "")
     parser = _MdBlockParser()
     parser.feed(html)
-    styles = getSampleStyleSheet()
     flow: List[Any] = []
 
-    h1 = ParagraphStyle("H1", parent=styles["Heading1"], fontSize=18, spaceAfter=8)
-    h2 = ParagraphStyle("H2", parent=styles["Heading2"], fontSize=15, spaceAfter=6)
-    h3 = ParagraphStyle("H3", parent=styles["Heading3"], fontSize=13, spaceAfter=6)
-    body = ParagraphStyle(
-        "Body",
-        parent=styles["BodyText"],
-        fontSize=10.5,
-        leading=13,
-        splitLongWords=True,
-        wordWrap="CJK",
-    )
-    code_style = styles["Code"]
-    max_width = A4[0] - (18 * mm * 2)
+    h1, h2, h3, body = ctx.h1, ctx.h2, ctx.h3, ctx.body
 
     for b in parser.blocks:
         t = b.get("type")
@@ -289,25 +447,54 @@ def _make_numbered_canvas(
     footer_left_text=None,
     footer_left_border=None,
 ):
+    # The total page count is only known at the end, so every page references a form
+    # XObject that save() defines once the count is known. Pages are flushed as they
+    # complete instead of keeping a copy of the canvas state per page.
     class NumberedCanvas(canvas.Canvas):
+        _PAGES_FORM = "pageCountForm"
+
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
-            self._saved_page_states = []
+            self._page_count = 0
 
         def showPage(self):
-            self._saved_page_states.append(dict(self.__dict__))
-            self._startPage()
+            self._page_count += 1
+            self._draw_header_footer()
+            super().showPage()
 
         def save(self):
-            num_pages = len(self._saved_page_states) + 1
-            for state in self._saved_page_states:
-                self.__dict__.update(state)
-                self._draw_header_footer(num_pages)
-                super().showPage()
-            self._draw_header_footer(num_pages)
+            if self._code:
+                # Content drawn after the last showPage() is one more page
+                self.showPage()
+            self.beginForm(self._PAGES_FORM)
+            self.setFont("Helvetica", 9)
+            self.drawString(0, 0, str(self._page_count))
+            self.endForm()
             super().save()
 
-        def _draw_header_footer(self, page_count: int):
+        def _draw_footer_text(self, x_center: float, y: float, page: int) -> None:
+            self.setFont("Helvetica", 9)
+            if "{pages}" not in footer_tpl:
+                self.drawCentredString(x_center, y, footer_tpl.format(page=page))
+                return
+            before, after = footer_tpl.split("{pages}", 1)
+            before = before.format(page=page)
+            after = after.format(page=page)
+            w_before = pdfmetrics.stringWidth(before, "Helvetica", 9)
+            w_after = pdfmetrics.stringWidth(after, "Helvetica", 9)
+            # The total has at least as many digits as the current page; centering
+            # assumes the same width, which is exact for all but digit rollovers
+            w_pages = pdfmetrics.stringWidth(str(page), "Helvetica", 9)
+            x = x_center - (w_before + w_pages + w_after) / 2
+            self.drawString(x, y, before)
+            self.saveState()
+            self.translate(x + w_before, y)
+            self.doForm(self._PAGES_FORM)
+            self.restoreState()
+            if after:
+                self.drawString(x + w_before + w_pages, y, after)
+
+        def _draw_header_footer(self):
             page = self._pageNumber
             width, height = self._pagesize
             margin = 18 * mm
@@ -346,9 +533,7 @@ def _make_numbered_canvas(
                 self.drawString(box_x + padding_x, box_y + padding_y, footer_left_label)
                 self.restoreState()
 
-            self.setFont("Helvetica", 9)
-            footer_text = footer_tpl.format(page=page, pages=page_count)
-            self.drawCentredString(width / 2, y_footer, footer_text)
+            self._draw_footer_text(width / 2, y_footer, page)
 
     return NumberedCanvas
 app = Flask(__name__, static_folder=str(FRONTEND_DIR), static_url_path="/static")
@@ -367,6 +552,10 @@ TRASH_DIR = DATA_DIR / "trash"
 JOURNAL_DIR = DATA_DIR / "journal"
 EXPORTS_DIR = DATA_DIR / "exports"
 INDEX_PATH = DATA_DIR / "index.json"
+# Records which one-off data migrations have run (see run_migrations)
+SCHEMA_PATH = DATA_DIR / "schema.json"
+SCHEMA_VERSION = 2
+SEARCH_INDEX_DIR = DATA_DIR / "search"
 PDF_SETTINGS_PATH = CONFIG_DIR / "pdf_settings.json"
 ENCRYPTION_SETTINGS_PATH = CONFIG_DIR / "encryption.json"
 
@@ -377,18 +566,34 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+_dirs_ready = False
+_dirs_lock = threading.Lock()
+
+
 def ensure_dirs() -> None:
-    NOTES_DIR.mkdir(parents=True, exist_ok=True)
-    TRASH_DIR.mkdir(parents=True, exist_ok=True)
-    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
-    EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    _maybe_migrate_pdf_settings()
+    """Create the data directories and run pending migrations, once per process.
+
+    Every handler calls this; after the first call it is a flag check.
+    """
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    with _dirs_lock:
+        if _dirs_ready:
+            return
+        NOTES_DIR.mkdir(parents=True, exist_ok=True)
+        TRASH_DIR.mkdir(parents=True, exist_ok=True)
+        JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        run_migrations()
+        _dirs_ready = True
 
 
 # ---------- Encryption helpers ----------
 _ENCRYPTION_SALT = b"stickynotes-encryption-v1"
 _fernet_cache: Optional[Fernet] = None
 _fernet_passphrase_hash: Optional[str] = None
+_fernet_key: Optional[bytes] = None
 
 
 def _derive_fernet_key(passphrase: str) -> bytes:
@@ -417,18 +622,20 @@ def _save_encryption_settings(data: Dict[str, Any]) -> None:
 
 
 def _invalidate_fernet_cache() -> None:
-    global _fernet_cache, _fernet_passphrase_hash
+    global _fernet_cache, _fernet_passphrase_hash, _fernet_key
     _fernet_cache = None
     _fernet_passphrase_hash = None
+    _fernet_key = None
 
 
 def _get_fernet() -> Optional[Fernet]:
-    global _fernet_cache, _fernet_passphrase_hash
+    global _fernet_cache, _fernet_passphrase_hash, _fernet_key
     settings = _load_encryption_settings()
     passphrase = settings.get("passphrase", "")
     if not passphrase:
         _fernet_cache = None
         _fernet_passphrase_hash = None
+        _fernet_key = None
         return None
     # Cache: only re-derive if passphrase changed
     if _fernet_cache is not None and _fernet_passphrase_hash == passphrase:
@@ -436,6 +643,7 @@ def _get_fernet() -> Optional[Fernet]:
     key = _derive_fernet_key(passphrase)
     _fernet_cache = Fernet(key)
     _fernet_passphrase_hash = passphrase
+    _fernet_key = key
     return _fernet_cache
 
 
@@ -463,12 +671,877 @@ def read_note_content(content_path: Path, meta: Dict[str, Any]) -> str:
     return raw
 
 
-def write_note_content(content_path: Path, content: str, meta: Dict[str, Any]) -> None:
+# Notes above this size are not sent whole by GET /api/notes/<id>; the editor
+# pages them through the range endpoint and saves edits as byte splices.
+LARGE_NOTE_BYTES = int(os.environ.get("LARGE_NOTE_BYTES", str(8 * 1024 * 1024)))
+CONTENT_RANGE_DEFAULT = 1024 * 1024
+CONTENT_RANGE_MAX = 8 * 1024 * 1024
+
+
+def _utf8_slice(buf, offset: int, length: int) -> Tuple[str, int, int, int]:
+    size = len(buf)
+    start = min(max(0, offset), size)
+    end = min(size, start + max(4, length))
+    # Never start or stop inside a multi-byte sequence
+    while start < size and (buf[start] & 0xC0) == 0x80:
+        start += 1
+    while start < end < size and (buf[end] & 0xC0) == 0x80:
+        end -= 1
+    return bytes(buf[start:end]).decode("utf-8", errors="ignore"), start, end, size
+
+
+def read_note_range(content_path: Path, meta: Dict[str, Any], offset: int, length: int) -> Tuple[str, int, int, int]:
+    """Text of bytes [offset, offset+length) of a note, snapped to UTF-8 character
+    boundaries. Returns (text, start, end, size), all in bytes.
+
+    Plaintext notes are mapped with mmap, so only the pages in range are read.
+    Encrypted notes have to be decrypted whole and are sliced afterwards.
+    """
+    if meta.get("encrypted"):
+        return _utf8_slice(read_note_content(content_path, meta).encode("utf-8"), offset, length)
+    if content_path.stat().st_size == 0:
+        return "", 0, 0, 0
+    with open(content_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _utf8_slice(mm, offset, length)
+
+
+# Serialises read-modify-write of note content (merging saves, splices)
+_content_lock = threading.Lock()
+
+
+def _check_utf8_boundary(buf, pos: int) -> None:
+    if 0 < pos < len(buf) and (buf[pos] & 0xC0) == 0x80:
+        raise ValueError("offset splits a UTF-8 character")
+
+
+def splice_note_content(content_path: Path, meta: Dict[str, Any], offset: int, delete: int, insert: str) -> int:
+    """Replace bytes [offset, offset+delete) of a note with `insert`; returns the new size.
+
+    Plaintext notes are rewritten by streaming the untouched head and tail into a
+    temp file, so huge notes are never held in memory. Encrypted notes have to be
+    decrypted, spliced and re-encrypted whole.
+    """
+    ins = insert.encode("utf-8")
+    if meta.get("encrypted"):
+        data = read_note_content(content_path, meta).encode("utf-8") if content_path.exists() else b""
+        if offset < 0 or delete < 0 or offset + delete > len(data):
+            raise ValueError("range outside content")
+        _check_utf8_boundary(data, offset)
+        _check_utf8_boundary(data, offset + delete)
+        data = data[:offset] + ins + data[offset + delete:]
+        write_note_content(content_path, data.decode("utf-8"), meta)
+        return len(data)
+
+    size = content_path.stat().st_size if content_path.exists() else 0
+    if offset < 0 or delete < 0 or offset + delete > size:
+        raise ValueError("range outside content")
+    tmp = None
+    try:
+        with open(content_path, "a+b") as src:
+            if size:
+                with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    _check_utf8_boundary(mm, offset)
+                    _check_utf8_boundary(mm, offset + delete)
+            tmp = NamedTemporaryFile("wb", dir=str(content_path.parent), delete=False)
+            src.seek(0)
+            remaining = offset
+            while remaining:
+                chunk = src.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                tmp.write(chunk)
+                remaining -= len(chunk)
+            tmp.write(ins)
+            src.seek(offset + delete)
+            shutil.copyfileobj(src, tmp, 1024 * 1024)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        os.replace(tmp.name, content_path)
+    finally:
+        if tmp is not None and os.path.exists(tmp.name):
+            try:
+                os.unlink(tmp.name)
+            except Exception:
+                pass
+    sync_mark_dirty(content_path)
+    return size - delete + len(ins)
+
+
+# ---------- Blob store ----------
+# With BLOB_STORE=1 plaintext note content is kept once per distinct content in
+# BLOBS_DIR/<sha256[:2]>/<sha256>, and each note's newest history revision is a
+# hard link to its blob, so history heads of duplicate notes share one inode.
+# (Encrypted notes never share content, since every encryption is randomised.)
+# The note's own .md/.txt is always a separate copy: sync and external editors
+# may write into it in place, which must never reach other notes through a
+# shared inode. Blobs and history files are only ever replaced (temp file +
+# os.replace) by this app. A blob that nothing links to any more
+# (st_nlink == 1) is removed by blob_gc(), which runs in the background at most
+# every BLOB_GC_SECONDS. Blob timestamps are never touched after creation (that
+# would change the mtime of every file sharing the inode); blobs used recently
+# are remembered in memory instead and spared by GC.
+BLOB_STORE = os.environ.get("BLOB_STORE", "0") == "1"
+BLOBS_DIR = DATA_DIR / "blobs"
+BLOB_GC_SECONDS = int(os.environ.get("BLOB_GC_SECONDS", "600"))
+# Blobs created or reused this recently are never collected: they may be about to be linked
+_BLOB_GC_GRACE = 300
+
+_blob_gc_lock = threading.Lock()
+_blob_gc_last = 0.0
+# sha -> time.time() of the last blob_put, for blobs that may not be linked yet
+_blob_recent: Dict[str, float] = {}
+
+
+def _blob_path(sha: str) -> Path:
+    return BLOBS_DIR / sha[:2] / sha
+
+
+def blob_put(data: bytes) -> Path:
+    """Store `data` under its SHA-256 unless already present; returns the blob path."""
+    sha = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha)
+    with _blob_gc_lock:
+        _blob_recent[sha] = time.time()
+    if not path.exists():
+        atomic_write_bytes(path, data)
+    return path
+
+
+def link_into_place(src: Path, dest: Path) -> bool:
+    """Atomically make `dest` a hard link to `src`; False if the filesystem refuses."""
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.lnk")
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.link(src, tmp)
+        os.replace(tmp, dest)
+        sync_mark_dirty(dest)
+        return True
+    except OSError:
+        # EMLINK, EXDEV, filesystems without hard links, a blob collected meanwhile
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return False
+
+
+def blob_gc() -> int:
+    """Delete blobs no note or history file links to; returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - _BLOB_GC_GRACE
+    with _blob_gc_lock:
+        for sha in [k for k, t in _blob_recent.items() if t < cutoff]:
+            del _blob_recent[sha]
+        recent = set(_blob_recent)
+    if not BLOBS_DIR.exists():
+        return 0
+    for sub in BLOBS_DIR.iterdir():
+        if not sub.is_dir():
+            continue
+        for blob in sub.iterdir():
+            try:
+                st = blob.stat()
+                if st.st_nlink == 1 and st.st_mtime < cutoff and blob.name not in recent:
+                    blob.unlink()
+                    removed += 1
+            except OSError:
+                continue
+    if removed:
+        log.info("Blob GC", extra={"event": "blob_gc", "extra_data": {"removed": removed}})
+    return removed
+
+
+def _maybe_blob_gc() -> None:
+    global _blob_gc_last
+    now = time.time()
+    with _blob_gc_lock:
+        if now - _blob_gc_last < BLOB_GC_SECONDS:
+            return
+        _blob_gc_last = now
+    threading.Thread(target=blob_gc, name="blob-gc", daemon=True).start()
+
+
+def write_note_content(content_path: Path, content: str, meta: Dict[str, Any], history_sealed: bool = False) -> None:
     if meta.get("encrypted"):
         data = encrypt_content(content)
     else:
         data = content
     atomic_write_text(content_path, data)
+    blob = None
+    if BLOB_STORE and not meta.get("encrypted"):
+        # Only the history head links to the blob; the note file stays its own copy
+        blob = blob_put(data.encode("utf-8"))
+        _maybe_blob_gc()
+    _enc_index_note_written(content_path, content, meta)
+    try:
+        history_record(meta, content, sealed=history_sealed, blob=blob)
+    except Exception:
+        log.warning("History record failed", extra={"event": "history_record_failed", "extra_data": {"note_id": meta.get("id")}}, exc_info=True)
+
+
+# ---------- Encrypted search index ----------
+# Searching encrypted notes would otherwise decrypt every one of them per query.
+# Each encrypted note instead gets a token index: the set of its lowercased
+# trigrams, each stored as a truncated HMAC under a subkey of the note key, so the
+# index is useless without the passphrase. Index files are Fernet-encrypted under
+# SEARCH_INDEX_DIR (plaintext never touches disk) and cached in memory. An entry
+# is valid while the note's content file keeps the (mtime_ns, size) it was built
+# from; stale or missing entries are rebuilt on the next search that needs them.
+_ENC_TOKEN_BYTES = 4
+_ENC_INDEX_CONTEXT = b"stickynotes-search-index-v1"
+_enc_index_lock = threading.Lock()
+_enc_index: Dict[str, Tuple[Tuple[int, int], frozenset]] = {}
+_enc_index_key: Optional[bytes] = None
+_enc_index_loaded = False
+
+
+def _enc_subkey() -> Optional[bytes]:
+    """HMAC key for index tokens, derived from the note key (no extra KDF run)."""
+    global _enc_index_key, _enc_index_loaded
+    if _get_fernet() is None or _fernet_key is None:
+        return None
+    subkey = hmac.digest(base64.urlsafe_b64decode(_fernet_key), _ENC_INDEX_CONTEXT, "sha256")
+    with _enc_index_lock:
+        if subkey != _enc_index_key:
+            # Passphrase changed: tokens built under the old key are meaningless
+            _enc_index.clear()
+            _enc_index_key = subkey
+            _enc_index_loaded = False
+    return subkey
+
+
+def _enc_tokens(subkey: bytes, text: str) -> frozenset:
+    t = text.lower()
+    grams = {t[i:i + 3] for i in range(len(t) - 2)}
+    return frozenset(hmac.digest(subkey, g.encode("utf-8"), "sha256")[:_ENC_TOKEN_BYTES] for g in grams)
+
+
+def _content_stat_key(content_path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = content_path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _enc_index_path(note_id: str) -> Path:
+    return SEARCH_INDEX_DIR / f"{Path(note_id).name}.idx"
+
+
+def _enc_index_put(note_id: str, stat_key: Tuple[int, int], tokens: frozenset) -> None:
+    with _enc_index_lock:
+        _enc_index[note_id] = (stat_key, tokens)
+    payload = {"v": 1, "stat": list(stat_key), "tokens": base64.b64encode(b"".join(sorted(tokens))).decode("ascii")}
+    atomic_write_text(_enc_index_path(note_id), encrypt_content(json.dumps(payload)))
+
+
+def _enc_index_drop(note_id: str) -> None:
+    with _enc_index_lock:
+        _enc_index.pop(note_id, None)
+    try:
+        _enc_index_path(note_id).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def enc_index_reset() -> None:
+    """Forget all index entries, e.g. after the passphrase changed or encryption was disabled."""
+    global _enc_index_loaded
+    with _enc_index_lock:
+        _enc_index.clear()
+        _enc_index_loaded = False
+    shutil.rmtree(SEARCH_INDEX_DIR, ignore_errors=True)
+
+
+def _enc_index_note_written(content_path: Path, content: str, meta: Dict[str, Any]) -> None:
+    note_id = meta.get("id")
+    if not note_id:
+        return
+    try:
+        if meta.get("encrypted"):
+            subkey = _enc_subkey()
+            stat_key = _content_stat_key(content_path)
+            if subkey and stat_key:
+                _enc_index_put(note_id, stat_key, _enc_tokens(subkey, content))
+        elif note_id in _enc_index or _enc_index_path(note_id).exists():
+            _enc_index_drop(note_id)
+    except Exception:
+        # The index is only an accelerator; a stale entry is rebuilt on the next search
+        log.warning("Search index update failed", extra={"event": "search_index_error", "extra_data": {"note_id": note_id}})
+
+
+def enc_index_refresh(meta: Dict[str, Any], content_path: Optional[Path]) -> None:
+    """Bring a note's entry in line with a content file changed outside the app."""
+    note_id = meta.get("id")
+    if not note_id:
+        return
+    stat_key = _content_stat_key(content_path) if content_path else None
+    if not meta.get("encrypted") or stat_key is None:
+        if note_id in _enc_index or _enc_index_path(note_id).exists():
+            _enc_index_drop(note_id)
+        return
+    entry = _enc_index.get(note_id)
+    if entry is not None and entry[0] == stat_key:
+        return
+    subkey = _enc_subkey()
+    if subkey is None:
+        return
+    try:
+        plaintext = decrypt_content(content_path.read_text(encoding="utf-8", errors="ignore").strip())
+        _enc_index_put(note_id, stat_key, _enc_tokens(subkey, plaintext))
+    except Exception:
+        # Not decryptable (yet): drop it, the next search that needs it retries
+        _enc_index_drop(note_id)
+
+
+def _enc_index_load() -> None:
+    """Load persisted index entries once per process (and again after a key change)."""
+    global _enc_index_loaded
+    if _enc_index_loaded:
+        return
+    f = _get_fernet()
+    entries: Dict[str, Tuple[Tuple[int, int], frozenset]] = {}
+    if f is not None and SEARCH_INDEX_DIR.exists():
+        for p in SEARCH_INDEX_DIR.glob("*.idx"):
+            try:
+                payload = json.loads(f.decrypt(p.read_bytes().strip()))
+                raw = base64.b64decode(payload["tokens"])
+                tokens = frozenset(raw[i:i + _ENC_TOKEN_BYTES] for i in range(0, len(raw), _ENC_TOKEN_BYTES))
+                entries[p.stem] = (tuple(payload["stat"]), tokens)
+            except Exception:
+                continue
+    with _enc_index_lock:
+        for note_id, entry in entries.items():
+            _enc_index.setdefault(note_id, entry)
+        _enc_index_loaded = True
+
+
+def enc_query_tokens(literal: Optional[str]) -> Optional[frozenset]:
+    """Index tokens a note must contain to match literal; None if the index can't tell."""
+    if literal is None or len(literal) < 3:
+        return None
+    subkey = _enc_subkey()
+    if subkey is None:
+        return None
+    return _enc_tokens(subkey, literal)
+
+
+def enc_index_may_match(meta: Dict[str, Any], required: List[Optional[frozenset]]) -> bool:
+    """False only if the token index proves an encrypted note can't match.
+
+    A missing or stale entry is rebuilt here by decrypting the note once.
+    """
+    needed = [r for r in required if r is not None]
+    if not needed:
+        return True
+    note_id = meta.get("id")
+    content_path = content_path_for_meta(meta)
+    subkey = _enc_subkey()
+    if not note_id or not content_path or subkey is None:
+        return True
+    stat_key = _content_stat_key(content_path)
+    if stat_key is None:
+        return True
+    _enc_index_load()
+    entry = _enc_index.get(note_id)
+    if entry is None or entry[0] != stat_key:
+        try:
+            plaintext = decrypt_content(content_path.read_text(encoding="utf-8", errors="ignore").strip())
+        except Exception:
+            return True
+        tokens = _enc_tokens(subkey, plaintext)
+        try:
+            _enc_index_put(note_id, stat_key, tokens)
+        except Exception:
+            pass
+    else:
+        tokens = entry[1]
+    return all(r <= tokens for r in needed)
+
+
+# ---------- Revision history ----------
+# Each note gets HISTORY_DIR/<id>/ holding an index.json and one zlib file per
+# revision. The newest revision is always stored whole (a key); when a newer one
+# arrives, the old head is rewritten as a reverse delta that rebuilds it from its
+# successor. Every HISTORY_KEYFRAME_INTERVAL-th revision stays a key, so reading
+# any revision applies at most that many deltas, and dropping the oldest entries
+# for retention never breaks the ones that remain.
+#
+# Autosave fires every 750 ms while typing, so a small edit made within
+# HISTORY_COALESCE_SECONDS of the head's first save replaces the head instead of
+# adding a revision. Larger changes (a Replace All, a paste) always start a new
+# revision, so the state right before them is kept.
+HISTORY_DIR = DATA_DIR / "history"
+HISTORY_COALESCE_SECONDS = int(os.environ.get("HISTORY_COALESCE_SECONDS", "300"))
+HISTORY_COALESCE_CHARS = 2048
+HISTORY_KEYFRAME_INTERVAL = int(os.environ.get("HISTORY_KEYFRAME_INTERVAL", "16"))
+HISTORY_MAX_REVISIONS = int(os.environ.get("HISTORY_MAX_REVISIONS", "500"))
+HISTORY_KEEP_DAYS = int(os.environ.get("HISTORY_KEEP_DAYS", "90"))
+# Past this many changed lines a delta is a plain delete+insert; SequenceMatcher
+# is roughly quadratic in the worst case.
+_HISTORY_DIFF_MAX_LINES = 20000
+_HISTORY_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+_HISTORY_HEAD_CACHE_SIZE = 32
+
+_history_locks: Dict[str, threading.Lock] = {}
+_history_locks_guard = threading.Lock()
+# note_id -> (head file name, head text), so a save doesn't re-inflate the head
+_history_head_cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+
+def _history_lock(note_id: str) -> threading.Lock:
+    with _history_locks_guard:
+        lock = _history_locks.get(note_id)
+        if lock is None:
+            lock = _history_locks[note_id] = threading.Lock()
+        return lock
+
+
+def _history_note_dir(note_id: str) -> Optional[Path]:
+    if not _HISTORY_ID_RE.match(note_id or ""):
+        return None
+    return HISTORY_DIR / note_id
+
+
+def _history_load(note_dir: Path) -> Dict[str, Any]:
+    try:
+        data = load_json(note_dir / "index.json")
+    except Exception:
+        data = {}
+    data.setdefault("entries", [])
+    data.setdefault("next", len(data["entries"]) + 1)
+    return data
+
+
+def _history_pack(data: bytes, encrypted: bool) -> bytes:
+    blob = zlib.compress(data, 6)
+    if encrypted:
+        f = _get_fernet()
+        if f is None:
+            raise ValueError("No encryption key configured")
+        blob = f.encrypt(blob)
+    return blob
+
+
+def _history_unpack(blob: bytes, encrypted: bool) -> bytes:
+    if encrypted:
+        f = _get_fernet()
+        if f is None:
+            raise ValueError("No encryption key configured")
+        blob = f.decrypt(blob)
+    return zlib.decompress(blob)
+
+
+def _history_write(note_dir: Path, data: Dict[str, Any], kind: str, payload: bytes, encrypted: bool) -> str:
+    name = f"{int(data['next']):06d}.{kind}"
+    data["next"] = int(data["next"]) + 1
+    atomic_write_bytes(note_dir / name, _history_pack(payload, encrypted))
+    return name
+
+
+def _history_read_entry(note_dir: Path, entry: Dict[str, Any]) -> bytes:
+    if entry.get("raw"):
+        # Hard link to the note's blob (BLOB_STORE); stored as-is
+        return (note_dir / entry["file"]).read_bytes()
+    return _history_unpack((note_dir / entry["file"]).read_bytes(), bool(entry.get("enc")))
+
+
+def _common_affixes(a: str, b: str) -> Tuple[int, int]:
+    """Lengths of the common prefix and (non-overlapping) common suffix of a and b."""
+    n = min(len(a), len(b))
+    p = 0
+    while p < n:
+        step = min(4096, n - p)
+        if a[p:p + step] == b[p:p + step]:
+            p += step
+            continue
+        while a[p] == b[p]:
+            p += 1
+        break
+    s = 0
+    la, lb = len(a), len(b)
+    while s < n - p:
+        step = min(4096, n - p - s)
+        if a[la - s - step:la - s] == b[lb - s - step:lb - s]:
+            s += step
+            continue
+        while a[la - s - 1] == b[lb - s - 1]:
+            s += 1
+        break
+    return p, s
+
+
+def _history_delta(new: str, old: str) -> List[Any]:
+    """Ops that rebuild `old` from `new`, by line: n > 0 copies n lines of `new`,
+    n < 0 skips -n lines of it, and a list inserts those lines."""
+    a = new.splitlines(keepends=True)
+    b = old.splitlines(keepends=True)
+    n = min(len(a), len(b))
+    p = 0
+    while p < n and a[p] == b[p]:
+        p += 1
+    s = 0
+    while s < n - p and a[-1 - s] == b[-1 - s]:
+        s += 1
+    am = a[p:len(a) - s]
+    bm = b[p:len(b) - s]
+    ops: List[Any] = [p] if p else []
+    if len(am) + len(bm) <= _HISTORY_DIFF_MAX_LINES:
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, am, bm, autojunk=False).get_opcodes():
+            if tag == "equal":
+                ops.append(i2 - i1)
+                continue
+            if i2 > i1:
+                ops.append(i1 - i2)
+            if j2 > j1:
+                ops.append(bm[j1:j2])
+    else:
+        if am:
+            ops.append(-len(am))
+        if bm:
+            ops.append(bm)
+    if s:
+        ops.append(s)
+    return ops
+
+
+def _history_apply(new: str, ops: List[Any]) -> str:
+    a = new.splitlines(keepends=True)
+    out: List[str] = []
+    i = 0
+    for op in ops:
+        if isinstance(op, list):
+            out.extend(op)
+        elif op > 0:
+            out.extend(a[i:i + op])
+            i += op
+        else:
+            i -= op
+    return "".join(out)
+
+
+def _history_text_at(note_dir: Path, entries: List[Dict[str, Any]], i: int) -> str:
+    """Text of entries[i]: inflate the nearest newer key, then apply deltas back to i."""
+    j = i
+    while entries[j].get("kind") != "key":
+        j += 1
+    text = _history_read_entry(note_dir, entries[j]).decode("utf-8")
+    for k in range(j - 1, i - 1, -1):
+        text = _history_apply(text, json.loads(_history_read_entry(note_dir, entries[k])))
+    return text
+
+
+def _history_head_text(note_id: str, note_dir: Path, entries: List[Dict[str, Any]]) -> str:
+    head = entries[-1]
+    cached = _history_head_cache.get(note_id)
+    if cached and cached[0] == head["file"]:
+        _history_head_cache.move_to_end(note_id)
+        return cached[1]
+    return _history_read_entry(note_dir, head).decode("utf-8")
+
+
+def _history_cache_head(note_id: str, name: str, text: str) -> None:
+    _history_head_cache[note_id] = (name, text)
+    _history_head_cache.move_to_end(note_id)
+    while len(_history_head_cache) > _HISTORY_HEAD_CACHE_SIZE:
+        _history_head_cache.popitem(last=False)
+
+
+def _history_to_delta(note_dir: Path, data: Dict[str, Any], entry: Dict[str, Any],
+                      text: str, successor: str, stale: List[str]) -> None:
+    """Store `entry` (whose content is `text`) as a delta from `successor` if that is smaller."""
+    ops = _history_delta(successor, text)
+    payload = json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    packed = _history_pack(payload, bool(entry.get("enc")))
+    try:
+        current = (note_dir / entry["file"]).stat().st_size
+    except OSError:
+        current = None
+    if current is not None and len(packed) >= current and entry.get("kind") == "key":
+        return
+    name = f"{int(data['next']):06d}.delta"
+    data["next"] = int(data["next"]) + 1
+    atomic_write_bytes(note_dir / name, packed)
+    stale.append(entry["file"])
+    entry["kind"] = "delta"
+    entry["file"] = name
+    entry.pop("raw", None)
+
+
+def history_record(meta: Dict[str, Any], content: str, sealed: bool = False,
+                   ts: Optional[float] = None, blob: Optional[Path] = None) -> None:
+    """Add `content` as revision meta["rev"] of the note's history.
+
+    A sealed revision is never coalesced with the one before or after it; it is
+    used for content that did not come from typing (pre-history content, imports,
+    restores). `blob` is the note's blob when BLOB_STORE is on; a plaintext head
+    is then linked to it, not copied.
+    """
+    note_id = str(meta.get("id") or "")
+    note_dir = _history_note_dir(note_id)
+    if note_dir is None or len(content) > LARGE_NOTE_BYTES:
+        return
+    raw = content.encode("utf-8")
+    sha = hashlib.sha256(raw).hexdigest()
+    rev = int(meta.get("rev", 0))
+    encrypted = bool(meta.get("encrypted"))
+    now = time.time() if ts is None else ts
+    with _history_lock(note_id):
+        note_dir.mkdir(parents=True, exist_ok=True)
+        data = _history_load(note_dir)
+        entries: List[Dict[str, Any]] = data["entries"]
+        stale: List[str] = []
+        head = entries[-1] if entries else None
+        if head and head.get("sha") == sha:
+            # Unchanged content (e.g. an encryption toggle): just move the head forward
+            if rev > int(head.get("rev", 0)):
+                head["rev"] = rev
+                head["ts"] = now
+                save_json(note_dir / "index.json", data)
+            return
+
+        prev_text = _history_head_text(note_id, note_dir, entries) if head else ""
+        entry = {"rev": rev, "ts": now, "first_ts": now, "size": len(raw), "sha": sha,
+                 "kind": "key", "enc": encrypted}
+        name = f"{int(data['next']):06d}.key"
+        if blob is not None and not encrypted and link_into_place(blob, note_dir / name):
+            data["next"] = int(data["next"]) + 1
+            entry["raw"] = True
+        else:
+            name = _history_write(note_dir, data, "key", raw, encrypted)
+        entry["file"] = name
+        if sealed:
+            entry["sealed"] = True
+
+        merge = False
+        if head and not sealed and not head.get("sealed") and now - float(head.get("first_ts", 0)) < HISTORY_COALESCE_SECONDS:
+            p, s = _common_affixes(prev_text, content)
+            merge = max(len(prev_text), len(content)) - p - s <= HISTORY_COALESCE_CHARS
+
+        if merge:
+            entry["first_ts"] = head["first_ts"]
+            stale.append(head["file"])
+            entries[-1] = entry
+            # The delta below the head was taken against the text being replaced
+            if len(entries) > 1 and entries[-2].get("kind") == "delta":
+                below = _history_apply(prev_text, json.loads(_history_read_entry(note_dir, entries[-2])))
+                _history_to_delta(note_dir, data, entries[-2], below, content, stale)
+        else:
+            if head:
+                run = 0
+                for e in reversed(entries[:-1]):
+                    if e.get("kind") == "key":
+                        break
+                    run += 1
+                # Keep a key every HISTORY_KEYFRAME_INTERVAL entries to bound read cost
+                if run + 1 < HISTORY_KEYFRAME_INTERVAL:
+                    _history_to_delta(note_dir, data, head, prev_text, content, stale)
+                if head.get("raw"):
+                    # A kept key no longer matches the note's blob: compress it
+                    stale.append(head["file"])
+                    head["file"] = _history_write(note_dir, data, "key", prev_text.encode("utf-8"), bool(head.get("enc")))
+                    head.pop("raw", None)
+            entries.append(entry)
+
+        # Retention: entries only depend on newer ones, so trimming the oldest is safe
+        cutoff = now - HISTORY_KEEP_DAYS * 86400 if HISTORY_KEEP_DAYS > 0 else None
+        drop = 0
+        while len(entries) - drop > 1 and (
+            (HISTORY_MAX_REVISIONS > 0 and len(entries) - drop > HISTORY_MAX_REVISIONS)
+            or (cutoff is not None and float(entries[drop].get("ts", 0)) < cutoff)
+        ):
+            stale.append(entries[drop]["file"])
+            drop += 1
+        if drop:
+            del entries[:drop]
+
+        save_json(note_dir / "index.json", data)
+        _history_cache_head(note_id, name, content)
+        for fn in stale:
+            try:
+                (note_dir / fn).unlink()
+            except OSError:
+                pass
+
+
+def history_seed(meta: Dict[str, Any], content_path: Optional[Path], rev: int) -> None:
+    """Record a note's current on-disk content before its first recorded save."""
+    note_dir = _history_note_dir(str(meta.get("id") or ""))
+    if note_dir is None or (note_dir / "index.json").exists():
+        return
+    if content_path is None or not content_path.exists() or content_path.stat().st_size > LARGE_NOTE_BYTES:
+        return
+    try:
+        content = read_note_content(content_path, meta)
+        history_record(dict(meta, rev=rev), content, sealed=True, ts=content_path.stat().st_mtime)
+    except Exception:
+        log.warning("History seed failed", extra={"event": "history_seed_failed", "extra_data": {"note_id": meta.get("id")}}, exc_info=True)
+
+
+def history_list(note_id: str) -> List[Dict[str, Any]]:
+    note_dir = _history_note_dir(note_id)
+    if note_dir is None:
+        return []
+    with _history_lock(note_id):
+        return list(_history_load(note_dir)["entries"])
+
+
+def history_read(note_id: str, rev: int) -> Optional[Tuple[Dict[str, Any], str]]:
+    note_dir = _history_note_dir(note_id)
+    if note_dir is None:
+        return None
+    with _history_lock(note_id):
+        entries = _history_load(note_dir)["entries"]
+        for i, e in enumerate(entries):
+            if int(e.get("rev", -1)) == rev:
+                return e, _history_text_at(note_dir, entries, i)
+    return None
+
+
+def history_set_encrypted(note_id: str, encrypted: bool) -> None:
+    """Re-pack a note's history files to match its encryption state."""
+    note_dir = _history_note_dir(note_id)
+    if note_dir is None or not (note_dir / "index.json").exists():
+        return
+    with _history_lock(note_id):
+        data = _history_load(note_dir)
+        for e in data["entries"]:
+            if bool(e.get("enc")) == encrypted:
+                continue
+            payload = _history_read_entry(note_dir, e)
+            atomic_write_bytes(note_dir / e["file"], _history_pack(payload, encrypted))
+            e["enc"] = encrypted
+            e.pop("raw", None)
+        save_json(note_dir / "index.json", data)
+
+
+def _ts_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+# ---------- Three-way merge ----------
+# A save whose base_rev is older than the note's rev is merged with what was
+# saved in between: base = the content at base_rev, ours = the incoming content,
+# theirs = the current content. The algorithm is the classic diff3 over lines;
+# a conflicting hunk is retried word by word, since a Markdown paragraph is a
+# single line and two tabs often edit different words of it.
+#
+# Base contents come from a small in-memory cache of the revisions recently
+# handed out or written (history coalescing may drop intermediate revisions),
+# falling back to the revision history.
+MERGE_BASE_CACHE_CHARS = 32 * 1024 * 1024
+# Word-level retries are skipped for hunks with more tokens than this (diff cost)
+_MERGE_WORD_HUNK_MAX = 2000
+_MERGE_WORD_RE = re.compile(r"\w+|\s+|[^\w\s]")
+_MERGE_MARK_OURS = "<<<<<<< this tab"
+_MERGE_MARK_SEP = "======="
+_MERGE_MARK_THEIRS = ">>>>>>> saved version"
+
+_merge_bases_lock = threading.Lock()
+_merge_bases: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+_merge_bases_chars = 0
+
+
+def remember_merge_base(note_id: str, rev: int, content: str) -> None:
+    global _merge_bases_chars
+    if len(content) > MERGE_BASE_CACHE_CHARS // 4:
+        return
+    key = (note_id, rev)
+    with _merge_bases_lock:
+        old = _merge_bases.pop(key, None)
+        if old is not None:
+            _merge_bases_chars -= len(old)
+        _merge_bases[key] = content
+        _merge_bases_chars += len(content)
+        while _merge_bases_chars > MERGE_BASE_CACHE_CHARS and _merge_bases:
+            _, dropped = _merge_bases.popitem(last=False)
+            _merge_bases_chars -= len(dropped)
+
+
+def merge_base(note_id: str, rev: int) -> Optional[str]:
+    with _merge_bases_lock:
+        text = _merge_bases.get((note_id, rev))
+        if text is not None:
+            _merge_bases.move_to_end((note_id, rev))
+            return text
+    try:
+        found = history_read(note_id, rev)
+    except Exception:
+        return None
+    return found[1] if found else None
+
+
+def _merge3_regions(base: List[str], ours: List[str], theirs: List[str]):
+    """Yield ("same", seq) or ("conflict", base, ours, theirs) regions (diff3)."""
+    om = difflib.SequenceMatcher(None, base, ours, autojunk=False).get_matching_blocks()
+    tm = difflib.SequenceMatcher(None, base, theirs, autojunk=False).get_matching_blocks()
+    # Sync regions: stretches of base matched by both sides
+    sync = []
+    i = j = 0
+    while i < len(om) and j < len(tm):
+        ob, oo, olen = om[i]
+        tb, tt, tlen = tm[j]
+        lo = max(ob, tb)
+        hi = min(ob + olen, tb + tlen)
+        if lo < hi:
+            sync.append((lo, hi, oo + lo - ob, tt + lo - tb))
+        if ob + olen < tb + tlen:
+            i += 1
+        else:
+            j += 1
+    sync.append((len(base), len(base), len(ours), len(theirs)))
+
+    zb = zo = zt = 0
+    for sb, eb, so, st in sync:
+        b, o, t = base[zb:sb], ours[zo:so], theirs[zt:st]
+        if o or t:
+            if o == t:
+                yield ("same", o)
+            elif b == o:
+                yield ("same", t)
+            elif b == t:
+                yield ("same", o)
+            else:
+                yield ("conflict", b, o, t)
+        n = eb - sb
+        if n:
+            yield ("same", base[sb:eb])
+        zb, zo, zt = eb, so + n, st + n
+
+
+def merge3(base: str, ours: str, theirs: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Merge two edits of `base`. Returns (content, conflicts); conflicting hunks
+    are kept in the content with both sides between git-style markers."""
+    out: List[str] = []
+    conflicts: List[Dict[str, Any]] = []
+    line = 0
+    for region in _merge3_regions(base.splitlines(keepends=True), ours.splitlines(keepends=True),
+                                  theirs.splitlines(keepends=True)):
+        if region[0] == "same":
+            out.extend(region[1])
+            line += len(region[1])
+            continue
+        b, o, t = ("".join(x) for x in region[1:])
+        bw, ow, tw = (_MERGE_WORD_RE.findall(x) for x in (b, o, t))
+        if max(len(bw), len(ow), len(tw)) <= _MERGE_WORD_HUNK_MAX:
+            parts: List[str] = []
+            for r in _merge3_regions(bw, ow, tw):
+                if r[0] != "same":
+                    break
+                parts.extend(r[1])
+            else:
+                merged = "".join(parts)
+                out.append(merged)
+                line += merged.count("\n")
+                continue
+        o_nl = o if o.endswith("\n") or not o else o + "\n"
+        t_nl = t if t.endswith("\n") or not t else t + "\n"
+        conflicts.append({"line": line + 1, "base": b, "ours": o, "theirs": t})
+        block = f"{_MERGE_MARK_OURS}\n{o_nl}{_MERGE_MARK_SEP}\n{t_nl}{_MERGE_MARK_THEIRS}\n"
+        out.append(block)
+        line += block.count("\n")
+    return "".join(out), conflicts
 
 
 def atomic_write_text(path: Path, text: str) -> None:
@@ -487,6 +1560,25 @@ def atomic_write_text(path: Path, text: str) -> None:
                 os.unlink(tmp.name)
             except Exception:
                 pass
+    sync_mark_dirty(path)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = None
+    try:
+        tmp = NamedTemporaryFile("wb", dir=str(path.parent), delete=False)
+        tmp.write(data)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        os.replace(tmp.name, path)
+    finally:
+        if tmp is not None and os.path.exists(tmp.name):
+            try:
+                os.unlink(tmp.name)
+            except Exception:
+                pass
 
 
 def gen_id() -> str:
@@ -534,23 +1626,74 @@ def save_json(p: Path, obj: Dict[str, Any]) -> None:
     atomic_write_text(p, json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
 
 
+# Parsed index.json, reused while the file's (mtime_ns, inode, size) is unchanged so
+# searches and listings don't re-parse it per request. Other workers writing the
+# index replace the file atomically, which changes the key. Entries are shared
+# between callers and must be treated as read-only; replace dicts, don't mutate them.
+# Alongside the notes, index.json keeps "files": for every sidecar the
+# [mtime_ns, size, inode, note id] it was last parsed at, which rebuild_index
+# uses to re-read only sidecars that changed.
+_index_cache_lock = threading.Lock()
+_index_cache: Dict[str, Any] = {"key": None, "notes": None, "files": None}
+
+
+def _index_stat_key() -> Optional[Tuple[int, int, int]]:
+    try:
+        st = INDEX_PATH.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
 def load_index() -> Optional[List[Dict[str, Any]]]:
-    if not INDEX_PATH.exists():
+    key = _index_stat_key()
+    if key is None:
         return None
+    with _index_cache_lock:
+        if _index_cache["key"] == key:
+            return list(_index_cache["notes"])
+    files = None
     try:
         data = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
         if isinstance(data, dict) and isinstance(data.get("notes"), list):
-            return data["notes"]
-        if isinstance(data, list):
-            return data
+            notes = data["notes"]
+            if isinstance(data.get("files"), dict):
+                files = data["files"]
+        elif isinstance(data, list):
+            notes = data
+        else:
+            return None
     except Exception:
         return None
-    return None
+    with _index_cache_lock:
+        _index_cache["key"] = key
+        _index_cache["notes"] = notes
+        _index_cache["files"] = files
+    return list(notes)
 
 
-def save_index(metas: List[Dict[str, Any]]) -> None:
-    payload = {"version": 1, "notes": metas}
-    atomic_write_text(INDEX_PATH, json.dumps(payload, ensure_ascii=False, indent=2) + "\n")
+def load_index_files() -> Dict[str, List[Any]]:
+    """The sidecar stat map of the current index ({} if unknown)."""
+    if load_index() is None:
+        return {}
+    with _index_cache_lock:
+        return dict(_index_cache["files"] or {})
+
+
+def save_index(metas: List[Dict[str, Any]], files: Optional[Dict[str, List[Any]]] = None) -> None:
+    if files is None:
+        # Single-note updates keep the previous stat map; entries for sidecars
+        # written since no longer match their file and are re-read by the next rebuild
+        with _index_cache_lock:
+            files = _index_cache["files"] if _index_cache["key"] == _index_stat_key() else None
+    payload = {"version": 1, "notes": metas, "files": files or {}}
+    # Compact: indented output bypasses json's C encoder and is several times slower
+    atomic_write_text(INDEX_PATH, json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n")
+    key = _index_stat_key()
+    with _index_cache_lock:
+        _index_cache["key"] = key
+        _index_cache["notes"] = list(metas) if key else None
+        _index_cache["files"] = files if key else None
 
 
 def _default_pdf_meta() -> Dict[str, Any]:
@@ -593,23 +1736,16 @@ def _tlp_style(tlp: str):
     return (colors.HexColor("#f1c21b"), colors.black, None)
 
 
-_PDF_MIGRATION_DONE = False
-
-
-def _maybe_migrate_pdf_settings() -> None:
-    global _PDF_MIGRATION_DONE
-    if _PDF_MIGRATION_DONE:
-        return
-    _PDF_MIGRATION_DONE = True
-
+def _migrate_pdf_settings() -> int:
+    """Schema 1: copy the legacy global PDF settings into notes without a `pdf` block."""
     if not PDF_SETTINGS_PATH.exists():
-        return
+        return 0
     try:
         data = json.loads(PDF_SETTINGS_PATH.read_text(encoding="utf-8"))
     except Exception:
-        return
+        return 0
     if not isinstance(data, dict):
-        return
+        return 0
 
     base = _default_pdf_meta()
     base["author"] = str(data.get("author", "")).strip()
@@ -628,8 +1764,9 @@ def _maybe_migrate_pdf_settings() -> None:
         if needs_migration:
             break
     if not needs_migration:
-        return
+        return 0
 
+    migrated = 0
     for meta_path in list(NOTES_DIR.glob("*.json")) + list(JOURNAL_DIR.glob("*.json")):
         try:
             meta = load_json(meta_path)
@@ -639,6 +1776,61 @@ def _maybe_migrate_pdf_settings() -> None:
             continue
         meta["pdf"] = dict(base)
         save_json(meta_path, meta)
+        migrated += 1
+    return migrated
+
+
+# (schema version, migration); each runs once per data dir, in order
+def _migrate_unshare_note_files() -> int:
+    """Schema 2: give note files that were hard links to blobs (BLOB_STORE) their own inode.
+
+    copy2 keeps the mtime, so sync doesn't see the files as changed.
+    """
+    count = 0
+    for base_dir in (NOTES_DIR, JOURNAL_DIR, TRASH_DIR):
+        for p in base_dir.iterdir() if base_dir.exists() else ():
+            try:
+                if p.name.startswith(".") or p.suffix == ".json" or not p.is_file() or p.stat().st_nlink < 2:
+                    continue
+                tmp = p.with_name(f".{p.name}.unshare")
+                shutil.copy2(p, tmp)
+                os.replace(tmp, p)
+                count += 1
+            except OSError:
+                log.warning("Could not unshare note file", extra={"event": "migration_unshare_failed", "extra_data": {"file": str(p)}})
+    if count:
+        log.info("Note files unshared", extra={"event": "migration_unshare", "extra_data": {"files": count}})
+    # Content is unchanged: nothing for the index
+    return 0
+
+
+_MIGRATIONS = [
+    (1, _migrate_pdf_settings),
+    (2, _migrate_unshare_note_files),
+]
+
+
+def run_migrations() -> None:
+    """Run the migrations newer than the version recorded in SCHEMA_PATH."""
+    try:
+        current = int(json.loads(SCHEMA_PATH.read_text(encoding="utf-8")).get("schema", 0))
+    except FileNotFoundError:
+        current = 0
+    except Exception:
+        log.warning("Unreadable schema marker, re-running migrations", extra={"event": "schema_marker_invalid"})
+        current = 0
+    if current >= SCHEMA_VERSION:
+        return
+    changed = 0
+    for version, migrate in _MIGRATIONS:
+        if version <= current:
+            continue
+        changed += migrate() or 0
+        # Record each step, so a crash doesn't repeat finished migrations
+        atomic_write_text(SCHEMA_PATH, json.dumps({"schema": version, "migrated": utc_now_iso()}) + "\n")
+        log.info("Data migrated", extra={"event": "schema_migrated", "extra_data": {"schema": version}})
+    if changed and INDEX_PATH.exists():
+        rebuild_index()
 
 
 _INDEX_LOCK_PATH = DATA_DIR / ".index.lock"
@@ -658,23 +1850,148 @@ class _index_lock:
         return False
 
 
-def rebuild_index() -> List[Dict[str, Any]]:
-    with _index_lock():
-        metas = []
-        for base_dir, deleted in [(NOTES_DIR, False), (JOURNAL_DIR, False), (TRASH_DIR, True)]:
-            for meta in base_dir.glob("*.json"):
+INDEX_REBUILD_WORKERS = int(os.environ.get("INDEX_REBUILD_WORKERS", "8"))
+
+
+def _scan_sidecars() -> List[Tuple[str, str, bool, List[int]]]:
+    """(key, path, in trash, [mtime_ns, size, inode]) for every note sidecar."""
+    out = []
+    for base_dir, deleted in [(NOTES_DIR, False), (JOURNAL_DIR, False), (TRASH_DIR, True)]:
+        try:
+            it = os.scandir(base_dir)
+        except FileNotFoundError:
+            continue
+        with it:
+            for e in it:
+                if not e.name.endswith(".json") or not e.is_file():
+                    continue
                 try:
-                    m = load_json(meta)
-                except Exception:
+                    st = e.stat()
+                except FileNotFoundError:
                     continue
-                m["deleted"] = bool(m.get("deleted", deleted))
-                metas.append(m)
-        save_index(metas)
-        return metas
+                out.append((f"{base_dir.name}/{e.name}", e.path, deleted, [st.st_mtime_ns, st.st_size, st.st_ino]))
+    return out
 
 
-def update_index_meta(meta: Dict[str, Any]) -> None:
-    with _index_lock():
+def _read_sidecar(path: str, deleted: bool) -> Optional[Dict[str, Any]]:
+    try:
+        m = load_json(Path(path))
+    except Exception:
+        return None
+    m["deleted"] = bool(m.get("deleted", deleted))
+    return m
+
+
+def _index_reconcile(prev_metas: Optional[List[Dict[str, Any]]], prev_files: Dict[str, List[Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Any]], int]:
+    """Index entries for the sidecars on disk, re-reading only those whose stat changed.
+
+    Returns (metas, stat map, number of sidecars parsed).
+    """
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    dup_ids = set()
+    for m in prev_metas or []:
+        if m.get("id") in by_id:
+            dup_ids.add(m.get("id"))
+        by_id[m.get("id")] = m
+    entries = _scan_sidecars()
+    result: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+    files: Dict[str, List[Any]] = {}
+    todo = []
+    for i, (key, path, deleted, st) in enumerate(entries):
+        prev = prev_files.get(key)
+        if prev and prev[:3] == st and prev[3] in by_id and prev[3] not in dup_ids:
+            result[i] = by_id[prev[3]]
+            files[key] = prev
+        else:
+            todo.append(i)
+    if len(todo) > 64 and INDEX_REBUILD_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=INDEX_REBUILD_WORKERS, thread_name_prefix="index") as pool:
+            parsed = list(pool.map(lambda i: _read_sidecar(entries[i][1], entries[i][2]), todo))
+    else:
+        parsed = [_read_sidecar(entries[i][1], entries[i][2]) for i in todo]
+    for i, m in zip(todo, parsed):
+        if m is None:
+            continue
+        result[i] = m
+        files[entries[i][0]] = entries[i][3] + [m.get("id")]
+    return [m for m in result if m is not None], files, len(todo)
+
+
+def rebuild_index(full: bool = False) -> List[Dict[str, Any]]:
+    """Bring index.json in line with the sidecars on disk.
+
+    Sidecars whose (mtime, size, inode) match the stat map are taken from the
+    current index; the rest are parsed on a thread pool. The work happens
+    without the index lock, which is only taken to swap the result in. `full`
+    re-parses every sidecar.
+    """
+    started = time.time()
+    start_key = _index_stat_key()
+    prev = None if full else load_index()
+    prev_files = load_index_files() if prev is not None else {}
+    metas, files, parsed = _index_reconcile(prev, prev_files)
+    if prev is not None and not parsed and files.keys() == prev_files.keys() and len(metas) == len(prev):
+        return metas  # nothing changed on disk
+    with _index_lock():
+        if _index_stat_key() != start_key:
+            # A note was saved meanwhile and its sidecar may be newer than what
+            # was read above; one more pass picks up just those sidecars
+            metas, files, more = _index_reconcile(metas, files)
+            parsed += more
+        save_index(metas, files)
+    if parsed:
+        log.info("Index rebuilt", extra={"event": "index_rebuilt", "extra_data": {
+            "notes": len(metas), "parsed": parsed, "full": full, "seconds": round(time.time() - started, 3)}})
+    return metas
+
+
+def index_apply_sidecars(paths: List[Path]) -> Optional[List[Tuple[str, str]]]:
+    """Re-read just these sidecars (present or gone) into the index.
+
+    Returns (note id, "changed" | "removed") for entries whose meta actually
+    changed; sidecars the index already reflects, e.g. our own saves, yield
+    nothing. None if there is no index yet (the caller should rebuild).
+    """
+    with _index_lock():
+        metas = load_index()
+        if metas is None:
+            return None
+        files = load_index_files()
+        current = {m.get("id"): m for m in metas}
+        by_stem = {Path(m.get("filename") or "").stem: m.get("id") for m in metas}
+        updated: Dict[Any, Dict[str, Any]] = {}
+        removed = set()
+        for p in paths:
+            key = f"{p.parent.name}/{p.name}"
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                prev = files.pop(key, None)
+                note_id = prev[3] if prev else by_stem.get(p.stem)
+                # Renamed or moved to trash: still indexed under its other sidecar
+                if note_id and not any((d / p.name).exists() for d in (NOTES_DIR, JOURNAL_DIR, TRASH_DIR)):
+                    removed.add(note_id)
+                continue
+            m = _read_sidecar(str(p), p.parent == TRASH_DIR)
+            if m is None or not m.get("id"):
+                continue
+            files[key] = [st.st_mtime_ns, st.st_size, st.st_ino, m["id"]]
+            updated[m["id"]] = m
+        removed -= updated.keys()
+        changed = [i for i, m in updated.items() if current.get(i) != m]
+        if not changed and not (removed & current.keys()):
+            return []
+        out = [m for m in metas if m.get("id") not in removed]
+        for i, m in enumerate(out):
+            if m.get("id") in updated:
+                out[i] = updated.pop(m.get("id"))
+        out.extend(updated.values())
+        save_index(out, files)
+    return [(i, "changed") for i in changed] + [(i, "removed") for i in removed if i in current]
+
+
+def update_index_meta(meta: Dict[str, Any]) -> None:
+    with _index_lock():
         metas = load_index()
         if metas is None:
             # Fall through to rebuild (which acquires its own lock via reentrant path)
@@ -684,6 +2001,8 @@ def update_index_meta(meta: Dict[str, Any]) -> None:
             if not note_id:
                 return
             updated = False
+            # Copy: callers may keep mutating their meta, the cached index must not see it
+            meta = dict(meta)
             for i, m in enumerate(metas):
                 if m.get("id") == note_id:
                     metas[i] = meta
@@ -739,8 +2058,333 @@ def sort_metas(metas: List[Dict[str, Any]], sort_key: str) -> List[Dict[str, Any
     return sorted(by_updated, key=pinned_rank)
 
 
+def content_path_for_meta(meta: Dict[str, Any]) -> Optional[Path]:
+    """Resolve a note's content file from its meta without scanning every sidecar."""
+    fn = Path(meta.get("filename") or "").name
+    if fn:
+        dirs = [TRASH_DIR] if meta.get("deleted") else [NOTES_DIR, JOURNAL_DIR]
+        for d in dirs:
+            candidate = d / fn
+            if candidate.is_file():
+                return candidate
+    note_id = meta.get("id")
+    if not note_id:
+        return None
+    content_path, _, _ = find_note_files_by_id(note_id)
+    return content_path
+
+
+# ---------- Search ----------
+# Each browser tab sends a client id with its searches. Starting a new search bumps
+# the generation for that client, which makes any scan still running for it stop.
+_search_lock = threading.Lock()
+_search_generations: Dict[str, int] = {}
+
+
+def _search_begin(client_id: str) -> int:
+    with _search_lock:
+        gen = _search_generations.get(client_id, 0) + 1
+        _search_generations[client_id] = gen
+        if len(_search_generations) > 256:
+            _search_generations.pop(next(iter(_search_generations)))
+        return gen
+
+
+def _search_is_stale(client_id: str, gen: int) -> bool:
+    if not client_id:
+        return False
+    with _search_lock:
+        return _search_generations.get(client_id, gen) != gen
+
+
+SNIPPET_BEFORE = 40
+SNIPPET_AFTER = 80
+SNIPPET_MAX = 3
+SNIPPET_BOUNDED_READ = 64 * 1024
+_SEARCH_COUNT_LIMIT = 10_000
+
+
+def _utf16_index(text: str, idx: int) -> int:
+    """Convert a code point index into the UTF-16 index the browser uses."""
+    if text.isascii():
+        return idx
+    return idx + sum(1 for ch in text[:idx] if ord(ch) > 0xFFFF)
+
+
+def _find_spans(text: str, patterns: List["re.Pattern[str]"], limit: int = 50) -> List[List[int]]:
+    """Match spans of all patterns in text, sorted and with overlaps dropped."""
+    spans: List[Tuple[int, int]] = []
+    for pat in patterns:
+        n = 0
+        for m in pat.finditer(text):
+            if m.end() == m.start():
+                continue
+            spans.append((m.start(), m.end()))
+            n += 1
+            if n >= limit:
+                break
+    spans.sort()
+    out: List[List[int]] = []
+    for start, end in spans:
+        if out and start < out[-1][1]:
+            continue
+        out.append([start, end])
+        if len(out) >= limit:
+            break
+    return out
+
+
+_QUERY_TOKEN_RE = re.compile(
+    r'/(?P<regex>(?:\\.|[^/\\])+)/(?=\s|$)'
+    r'|(?:(?P<field>\w+):)?(?:"(?P<phrase>[^"]*)"?|(?P<word>\S+))'
+)
+_QUERY_DATE_RE = re.compile(r"^(>=|<=|>|<|=)?(\d{4}(?:-\d{2}(?:-\d{2})?)?)$")
+_QUERY_REGEX_MAX = 200
+
+
+def parse_search_query(q: str) -> Dict[str, Any]:
+    """Parse the sidebar query language.
+
+    Supported: ``subject:``, ``tlp:``, ``pinned:yes|no``, ``created:``/``updated:``
+    with an optional ``>``, ``>=``, ``<``, ``<=`` prefix and a (partial) ISO date,
+    ``word:`` for whole-word matches, ``"exact phrase"`` and ``/regex/``. Bare terms
+    are plain substrings. Everything is case-insensitive and AND-ed. Returns
+    ``{"filters": [callable(meta) -> bool], "patterns": [compiled regex],
+    "literals": {pattern: text}}``;
+    raises ValueError on malformed input.
+    """
+    filters: List[Any] = []
+    patterns: List["re.Pattern[str]"] = []
+    # Literal text behind each non-regex pattern, used to consult the token index
+    literals: Dict["re.Pattern[str]", str] = {}
+    for m in _QUERY_TOKEN_RE.finditer(q):
+        regex, field, phrase, word = m.group("regex"), m.group("field"), m.group("phrase"), m.group("word")
+        field = (field or "").lower()
+        value = phrase if phrase is not None else (word or "")
+        if regex is not None:
+            if len(regex) > _QUERY_REGEX_MAX:
+                raise ValueError("Regex too long")
+            try:
+                patterns.append(re.compile(regex, re.IGNORECASE))
+            except re.error as e:
+                raise ValueError(f"Invalid regex: {e}")
+        elif field in ("subject", "tlp"):
+            want = value.strip().lower()
+            if field == "subject":
+                filters.append(lambda meta, w=want: (meta.get("subject") or "").strip().lower() == w)
+            else:
+                filters.append(lambda meta, w=want: ((meta.get("pdf") or {}).get("tlp") or "AMBER").lower() == w)
+        elif field == "pinned":
+            want_pinned = value.lower() in ("1", "yes", "true", "y")
+            filters.append(lambda meta, w=want_pinned: bool(meta.get("pinned")) == w)
+        elif field in ("created", "updated"):
+            dm = _QUERY_DATE_RE.match(value)
+            if not dm:
+                raise ValueError(f"Invalid date in {field}:{value}")
+            filters.append(_date_filter(field, dm.group(1) or "=", dm.group(2)))
+        elif field == "word":
+            if value:
+                pat = re.compile(r"\b" + re.escape(value) + r"\b", re.IGNORECASE)
+                patterns.append(pat)
+                literals[pat] = value
+        else:
+            # Unknown field names are searched as plain text, e.g. "http://…"
+            text = m.group(0) if field else value
+            if text:
+                pat = re.compile(re.escape(text), re.IGNORECASE)
+                patterns.append(pat)
+                literals[pat] = text
+    return {"filters": filters, "patterns": patterns, "literals": literals}
+
+
+def _date_filter(field: str, op: str, date: str):
+    """Compare the ISO timestamp prefix of meta[field] against a (partial) date."""
+    n = len(date)
+
+    def check(meta: Dict[str, Any]) -> bool:
+        v = (meta.get(field) or "")[:n]
+        if not v:
+            return False
+        if op == ">":
+            return v > date
+        if op == ">=":
+            return v >= date
+        if op == "<":
+            return v < date
+        if op == "<=":
+            return v <= date
+        return v == date
+    return check
+
+
+def build_snippets(text: str, spans: List[List[int]], max_snippets: int = SNIPPET_MAX) -> List[Dict[str, Any]]:
+    """Cut context windows around match spans, merge overlapping ones and rank them.
+
+    Windows holding more matches rank first, earlier ones break ties. Offsets are
+    UTF-16 based: ``offset`` is the window start within the note content and
+    ``matches`` are relative to the snippet text.
+    """
+    windows: List[Dict[str, Any]] = []
+    for start, end in spans:
+        lo = max(0, start - SNIPPET_BEFORE)
+        hi = min(len(text), end + SNIPPET_AFTER)
+        if windows and lo <= windows[-1]["hi"]:
+            windows[-1]["hi"] = max(windows[-1]["hi"], hi)
+            windows[-1]["spans"].append((start, end))
+        else:
+            windows.append({"lo": lo, "hi": hi, "spans": [(start, end)]})
+    ranked = sorted(windows, key=lambda w: (-len(w["spans"]), w["lo"]))[:max_snippets]
+    out: List[Dict[str, Any]] = []
+    for w in ranked:
+        lo, hi = w["lo"], w["hi"]
+        chunk = text[lo:hi]
+        base16 = _utf16_index(text, lo)
+        out.append({
+            # Newlines become spaces so the snippet fits one row; lengths are unchanged
+            "text": chunk.replace("\r", " ").replace("\n", " "),
+            "offset": base16,
+            "matches": [[_utf16_index(chunk, s - lo), _utf16_index(chunk, e - lo)] for s, e in w["spans"]],
+            "ellipsis_before": lo > 0,
+            "ellipsis_after": hi < len(text),
+        })
+    return out
+
+
+def _read_note_prefix(meta: Dict[str, Any], limit: int = SNIPPET_BOUNDED_READ) -> Tuple[Optional[str], bool]:
+    """Bounded read of a plaintext note for snippet building.
+
+    Returns (text, truncated); text is None for encrypted or unreadable notes.
+    """
+    if meta.get("encrypted"):
+        return None, False
+    content_path = content_path_for_meta(meta)
+    if not content_path:
+        return None, False
+    try:
+        with open(content_path, "rb") as f:
+            raw = f.read(limit + 1)
+    except OSError:
+        return None, False
+    return raw[:limit].decode("utf-8", errors="ignore"), len(raw) > limit
+
+
+def _content_search_info(text: str, patterns: List["re.Pattern[str]"], snippets: bool,
+                         truncated: bool = False) -> Dict[str, Any]:
+    if "\r" in text:
+        # Offsets must match the editor, whose textarea turns CRLF and CR into LF
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    spans = _find_spans(text, patterns, limit=_SEARCH_COUNT_LIMIT)
+    info: Dict[str, Any] = {"match_count": len(spans)}
+    if truncated:
+        info["match_count_partial"] = True
+    if snippets:
+        info["snippets"] = build_snippets(text, spans)
+    return info
+
+
+def _search_display_title(meta: Dict[str, Any]) -> str:
+    return (meta.get("title") or "").strip() or meta.get("filename") or meta.get("id") or ""
+
+
+def _match_note_meta(meta: Dict[str, Any], patterns: List["re.Pattern[str]"]) -> Tuple[Dict[str, Any], List["re.Pattern[str]"]]:
+    """Match patterns against title and filename only.
+
+    Returns (search_info, remaining) where remaining lists the patterns that still
+    have to be found in the note content.
+    """
+    fn = meta.get("filename") or ""
+    title = meta.get("user_title") or meta.get("title") or ""
+    score = 0
+    fields: List[str] = []
+    remaining: List["re.Pattern[str]"] = []
+    for pat in patterns:
+        tm = pat.search(title) if title else None
+        fm = pat.search(fn)
+        if tm:
+            score += 100 if tm.start() == 0 else 50
+            if "title" not in fields:
+                fields.append("title")
+        if fm:
+            score += 20
+            if "filename" not in fields:
+                fields.append("filename")
+        if not (tm or fm):
+            remaining.append(pat)
+    display = _search_display_title(meta)
+    title_matches = [[_utf16_index(display, s), _utf16_index(display, e)] for s, e in _find_spans(display, patterns)]
+    return {"score": score, "fields": fields, "title_matches": title_matches}, remaining
+
+
+def _match_note_content(meta: Dict[str, Any], info: Dict[str, Any], remaining: List["re.Pattern[str]"],
+                        patterns: List["re.Pattern[str]"], snippets: bool = False) -> Optional[Dict[str, Any]]:
+    content_path = content_path_for_meta(meta)
+    if not content_path or not content_path.exists():
+        return None
+    try:
+        txt = read_note_content(content_path, meta)
+    except Exception:
+        return None
+    if not all(pat.search(txt) for pat in remaining):
+        return None
+    info = dict(info, fields=info["fields"] + ["content"])
+    info.update(_content_search_info(txt, patterns, snippets))
+    info["score"] += min(info["match_count"], 10)
+    return info
+
+
+def iter_search_hits(metas: List[Dict[str, Any]], query: Dict[str, Any], is_stale=lambda: False,
+                     snippets: bool = False):
+    """Yield (meta, search_info) for notes matching a parsed query.
+
+    Metadata predicates are checked against the index entries first, so only the
+    surviving candidates are matched against title/filename and then content. Notes
+    that match on title/filename alone are yielded first so callers can show them
+    before the slower content scan completes. Stops early as soon as is_stale()
+    returns True. With ``snippets``, content hits carry ranked snippets; metadata hits
+    get them from a bounded read of the file (plaintext notes only, so no decryption
+    is triggered). Encrypted notes are first checked against the token index and only
+    decrypted when it can't rule them out.
+    """
+    filters = query["filters"]
+    patterns = query["patterns"]
+    literals = query.get("literals", {})
+    enc_tokens: Dict["re.Pattern[str]", Optional[frozenset]] = {}
+    pending: List[Tuple[Dict[str, Any], Dict[str, Any], List["re.Pattern[str]"]]] = []
+    for m in metas:
+        if is_stale():
+            return
+        if not all(f(m) for f in filters):
+            continue
+        info, remaining = _match_note_meta(m, patterns)
+        if not remaining:
+            if snippets and patterns:
+                prefix, truncated = _read_note_prefix(m)
+                if prefix and any(pat.search(prefix) for pat in patterns):
+                    info.update(_content_search_info(prefix, patterns, True, truncated=truncated))
+                    info["fields"].append("content")
+            yield m, info
+        else:
+            pending.append((m, info, remaining))
+    for m, info, remaining in pending:
+        if is_stale():
+            return
+        if m.get("encrypted"):
+            for pat in remaining:
+                if pat not in enc_tokens:
+                    enc_tokens[pat] = enc_query_tokens(literals.get(pat))
+            if not enc_index_may_match(m, [enc_tokens[pat] for pat in remaining]):
+                continue
+        hit = _match_note_content(m, info, remaining, patterns, snippets=snippets)
+        if hit is not None:
+            yield m, hit
+
+
+def rank_search_results(metas: List[Dict[str, Any]], sort_key: str) -> List[Dict[str, Any]]:
+    ordered = sort_metas(metas, sort_key)
+    return sorted(ordered, key=lambda m: -(m.get("search") or {}).get("score", 0))
+
+
 # ---------- Frontend ----------
-from flask import send_file
 
 @app.route("/")
 def index():
@@ -757,43 +2401,45 @@ def health():
 @app.route("/api/notes", methods=["GET"])
 def api_list_notes():
     ensure_dirs()
-    if load_index() is None:
-        rebuild_index()
     include_deleted = request.args.get("include_deleted", "false").lower() == "true"
     sort_key = request.args.get("sort", "updated")
-    q = request.args.get("q", "").strip().lower()
+    q = request.args.get("q", "").strip()
+    stream = request.args.get("stream", "").lower() in ("1", "true")
+    snippets = request.args.get("snippets", "").lower() in ("1", "true")
+    client_id = request.args.get("client", "").strip()[:64]
 
     metas = list_metas(include_deleted=include_deleted)
 
-    if q:
-        filtered: List[Dict[str, Any]] = []
-        for m in metas:
-            fn = (m.get("filename") or "").lower()
-            title = (m.get("user_title") or m.get("title") or "").lower()
-            if q in fn or (title and q in title):
-                filtered.append(m)
-                continue
-            note_id = m.get("id")
-            if not note_id:
-                continue
-            content_path, _, _ = find_note_files_by_id(note_id)
-            if content_path and content_path.exists():
-                try:
-                    txt = read_note_content(content_path, m).lower()
-                    if q in txt:
-                        filtered.append(m)
-                except Exception:
-                    pass
-        metas = filtered
+    if not q:
+        return jsonify(sort_metas(metas, sort_key))
+
+    try:
+        query = parse_search_query(q)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    gen = _search_begin(client_id) if client_id else 0
+    is_stale = lambda: _search_is_stale(client_id, gen)
 
-    metas = sort_metas(metas, sort_key)
-    return jsonify(metas)
+    if stream:
+        def generate():
+            count = 0
+            for m, info in iter_search_hits(metas, query, is_stale, snippets=snippets):
+                count += 1
+                yield json.dumps({"note": {**m, "search": info}}, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "count": count, "cancelled": is_stale()}) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+    hits = [{**m, "search": info} for m, info in iter_search_hits(metas, query, is_stale, snippets=snippets)]
+    if is_stale():
+        return jsonify({"error": "superseded"}), 409
+    return jsonify(rank_search_results(hits, sort_key))
 
 
 @app.route("/api/index/rebuild", methods=["POST"])
 def api_rebuild_index():
     ensure_dirs()
-    metas = rebuild_index()
+    metas = rebuild_index(full=request.args.get("full", "").lower() in ("1", "true"))
     return jsonify({"ok": True, "count": len(metas)})
 
 
@@ -857,6 +2503,169 @@ def api_preview_yaml():
     return jsonify({"ok": True, "pretty": pretty})
 
 
+# ---------- HTML preview ----------
+# Markdown is rendered with the same python-markdown setup as PDF export, with raw
+# HTML escaped. Rendering goes block by block: top-level blocks (split at blank
+# lines outside fences, keeping lists and quotes together) are cached by content,
+# so after an edit only the changed blocks are converted again. Heading ids follow
+# slugifyHeading() in app.js so the TOC can jump into server-rendered previews.
+HTML_BLOCK_CACHE_CHARS = 16 * 1024 * 1024
+HTML_NOTE_CACHE_SIZE = 64
+_MD_FENCE_RE = re.compile(r"^(`{3,}|~{3,})")
+_MD_REF_DEF_RE = re.compile(r"^ {0,3}\[[^\]]+\]:\s*\S", re.M)
+_HTML_HEADING_RE = re.compile(r"<h([1-6])>(.*?)</h\1>", re.S)
+_html_block_cache: "OrderedDict[bytes, Tuple[int, str]]" = OrderedDict()
+_html_block_cache_chars = 0
+_html_note_cache: "OrderedDict[str, Tuple[Any, str]]" = OrderedDict()
+_html_cache_lock = threading.Lock()
+
+
+def slugify_heading(s: str) -> str:
+    s = re.sub(r"</?[^>]+>", "", (s or "").lower())
+    s = re.sub(r"[^a-z0-9\s_-]+", "", s).strip()
+    return re.sub(r"\s+", "-", s)[:48] or "section"
+
+
+def _add_heading_ids(html: str) -> str:
+    counters: Dict[str, int] = {}
+
+    def repl(m: re.Match) -> str:
+        base = slugify_heading(htmllib.unescape(re.sub(r"</?[^>]+>", "", m.group(2))))
+        n = counters.get(base, 0) + 1
+        counters[base] = n
+        hid = f"{base}-{n}" if n > 1 else base
+        return f'<h{m.group(1)} id="{hid}">{m.group(2)}</h{m.group(1)}>'
+    return _HTML_HEADING_RE.sub(repl, html)
+
+
+def _split_md_blocks(text: str) -> List[str]:
+    """Split Markdown into top-level blocks that render independently."""
+    blocks: List[str] = []
+    cur: List[str] = []
+    fence = ""
+    after_blank = False
+    first = ""
+    # Lists and quotes continue across blank lines, so a block that contains one
+    # absorbs following items; merging is always safe, splitting is not
+    has_list = has_quote = False
+    for line in text.split("\n"):
+        if fence:
+            cur.append(line)
+            if line.startswith(fence) and not line[len(fence):].strip():
+                fence = ""
+            continue
+        if not line.strip():
+            cur.append(line)
+            after_blank = bool(first)
+            continue
+        is_list = bool(_MD_LIST_ITEM_RE.match(line))
+        is_quote = line.lstrip().startswith(">")
+        if after_blank and not line[0].isspace():
+            if not ((is_list and has_list) or (is_quote and has_quote)):
+                blocks.append("\n".join(cur))
+                cur = []
+                first = ""
+                has_list = has_quote = False
+        if not first:
+            first = line
+        has_list = has_list or is_list
+        has_quote = has_quote or is_quote
+        after_blank = False
+        cur.append(line)
+        fm = _MD_FENCE_RE.match(line)
+        if fm:
+            fence = fm.group(1)
+    if cur:
+        blocks.append("\n".join(cur))
+    return blocks
+
+
+def _render_md_block(block: str) -> str:
+    global _html_block_cache_chars
+    key = hashlib.sha1(block.encode("utf-8")).digest()
+    with _html_cache_lock:
+        cached = _html_block_cache.get(key)
+        if cached is not None:
+            _html_block_cache.move_to_end(key)
+            return cached[1]
+    html = _render_context().markdown_to_html(block, safe=True)
+    size = len(block) + len(html)
+    with _html_cache_lock:
+        if key not in _html_block_cache:
+            _html_block_cache[key] = (size, html)
+            _html_block_cache_chars += size
+        while _html_block_cache_chars > HTML_BLOCK_CACHE_CHARS and _html_block_cache:
+            _, (old_size, _old) = _html_block_cache.popitem(last=False)
+            _html_block_cache_chars -= old_size
+    return html
+
+
+def render_markdown_html(md_text: str) -> str:
+    text = _normalize_md_lists((md_text or "").replace("\r\n", "\n"))
+    if _MD_REF_DEF_RE.search(text):
+        # Reference-style links resolve across blocks; render the whole document
+        html = _render_context().markdown_to_html(text, safe=True)
+    else:
+        html = "\n".join(h for h in (_render_md_block(b) for b in _split_md_blocks(text)) if h)
+    return _add_heading_ids(html)
+
+
+def _find_meta_by_id(note_id: str) -> Optional[Dict[str, Any]]:
+    for m in list_metas(include_deleted=True):
+        if m.get("id") == note_id:
+            return m
+    _, meta_path, _ = find_note_files_by_id(note_id)
+    return load_json(meta_path) if meta_path else None
+
+
+@app.route("/api/notes/<note_id>/html", methods=["GET"])
+def api_note_html(note_id: str):
+    """Rendered Markdown preview of the saved note, cached per revision."""
+    ensure_dirs()
+    if mdlib is None:
+        return jsonify({"error": "markdown not installed"}), 501
+    meta = _find_meta_by_id(note_id)
+    if not meta:
+        return jsonify({"error": "Not found"}), 404
+    content_path = content_path_for_meta(meta)
+    stat_key = _content_stat_key(content_path) if content_path else None
+    rev = int(meta.get("rev", 0))
+    etag = f"{note_id}-{rev}-{stat_key[0] if stat_key else 0}"
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    cache_key = (rev, stat_key)
+    with _html_cache_lock:
+        cached = _html_note_cache.get(note_id)
+        if cached is not None and cached[0] == cache_key:
+            _html_note_cache.move_to_end(note_id)
+            html = cached[1]
+        else:
+            html = None
+    if html is None:
+        content = read_note_content(content_path, meta) if content_path else ""
+        html = render_markdown_html(content)
+        with _html_cache_lock:
+            _html_note_cache[note_id] = (cache_key, html)
+            _html_note_cache.move_to_end(note_id)
+            while len(_html_note_cache) > HTML_NOTE_CACHE_SIZE:
+                _html_note_cache.popitem(last=False)
+
+    resp = jsonify({"id": note_id, "rev": rev, "html": html})
+    resp.headers["ETag"] = f'"{etag}"'
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@app.route("/api/preview/markdown", methods=["POST"])
+def api_preview_markdown():
+    """Render unsaved Markdown; unchanged blocks come from the block cache."""
+    if mdlib is None:
+        return jsonify({"error": "markdown not installed"}), 501
+    body = request.get_json(silent=True) or {}
+    return jsonify({"html": render_markdown_html(str(body.get("text", "")))})
+
+
 @app.route("/api/notes/<note_id>/pdf-settings", methods=["GET"])
 def api_get_note_pdf_settings(note_id: str):
     ensure_dirs()
@@ -948,7 +2757,6 @@ def api_import_notes():
             errors.append({"file": safe_name, "error": "Failed to allocate note id"})
             continue
 
-        atomic_write_text(content_path, text)
         created_iso = created_dt.isoformat().replace("+00:00", "Z")
         meta = {
             "id": note_id,
@@ -963,6 +2771,8 @@ def api_import_notes():
             "deleted": False,
             "encrypted": False,
         }
+        # Through the blob store, so re-importing the same file shares its storage
+        write_note_content(content_path, text, meta, history_sealed=True)
         save_json(meta_path, meta)
         update_index_meta(meta)
         created.append(meta)
@@ -984,10 +2794,57 @@ def api_get_note(note_id: str):
     meta["deleted"] = bool(meta.get("deleted", deleted))
     content = ""
     if content_path and content_path.exists():
+        size = content_path.stat().st_size
+        if size > LARGE_NOTE_BYTES and request.args.get("full") != "1":
+            # Too big to ship whole: the client pages it via GET .../content
+            return jsonify({"meta": meta, "content": "", "large": True, "size": size})
         content = read_note_content(content_path, meta)
+    # Kept so a later save based on this rev can be merged
+    remember_merge_base(note_id, int(meta.get("rev", 0)), content)
     return jsonify({"meta": meta, "content": content})
 
 
+@app.route("/api/notes/<note_id>/meta", methods=["GET"])
+def api_get_note_meta(note_id: str):
+    """Meta only (no content read); used by clients polling for new revisions."""
+    ensure_dirs()
+    _content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    meta = load_json(meta_path)
+    meta["deleted"] = bool(meta.get("deleted", deleted))
+    return jsonify(meta)
+
+
+@app.route("/api/notes/<note_id>/content", methods=["GET"])
+def api_get_content_range(note_id: str):
+    """A byte range of the note content, for paging through very large notes."""
+    ensure_dirs()
+    content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    try:
+        offset = int(request.args.get("offset", "0"))
+        length = int(request.args.get("length", str(CONTENT_RANGE_DEFAULT)))
+    except ValueError:
+        return jsonify({"error": "offset and length must be integers"}), 400
+    if offset < 0 or length <= 0:
+        return jsonify({"error": "offset must be >= 0 and length > 0"}), 400
+
+    meta = load_json(meta_path)
+    text, start, end, size = "", 0, 0, 0
+    if content_path and content_path.exists():
+        text, start, end, size = read_note_range(content_path, meta, offset, min(length, CONTENT_RANGE_MAX))
+    return jsonify({
+        "id": note_id,
+        "rev": int(meta.get("rev", 0)),
+        "offset": start,
+        "end": end,
+        "size": size,
+        "content": text,
+    })
+
+
 @app.route("/api/notes/<note_id>/content", methods=["PUT"])
 def api_save_content(note_id: str):
     ensure_dirs()
@@ -1001,20 +2858,85 @@ def api_save_content(note_id: str):
     if deleted:
         return jsonify({"error": "Note is deleted"}), 400
 
-    meta = load_json(meta_path)
-    meta["rev"] = int(meta.get("rev", 0)) + 1
-    meta["updated"] = utc_now_iso()
+    with _content_lock:
+        meta = load_json(meta_path)
+        rev = int(meta.get("rev", 0))
+        if content_path is None:
+            fn = meta.get("filename")
+            if not fn:
+                return jsonify({"error": "Corrupt note (missing filename)"}), 500
+            content_path = meta_path.parent / fn
+
+        merged = False
+        if 0 < base_rev < rev:
+            # Saved elsewhere since this client loaded the note: merge instead of overwriting
+            current = read_note_content(content_path, meta) if content_path.exists() else ""
+            base = merge_base(note_id, base_rev)
+            # Without the base every difference is a conflict (both sides kept)
+            result, conflicts = merge3(base if base is not None else "", content, current)
+            if conflicts:
+                log.info("Save conflict", extra={"event": "save_conflict", "extra_data": {"note_id": note_id, "base_rev": base_rev, "rev": rev, "hunks": len(conflicts)}})
+                return jsonify({"error": "Conflicting changes", "rev": rev, "base_rev": base_rev,
+                                "content": result, "conflicts": conflicts}), 409
+            content = result
+            merged = True
+
+        # The first recorded save keeps what was on disk before it
+        history_seed(meta, content_path, rev)
+        meta["rev"] = rev + 1
+        meta["updated"] = utc_now_iso()
+        write_note_content(content_path, content, meta)
+        save_json(meta_path, meta)
+        update_index_meta(meta)
+        remember_merge_base(note_id, meta["rev"], content)
+    # Carry the full meta so clients can patch their list without a refetch
+    res: Dict[str, Any] = {"rev": meta["rev"], "updated": meta["updated"], "base_rev": base_rev, "meta": meta}
+    if merged:
+        log.info("Save merged", extra={"event": "save_merged", "extra_data": {"note_id": note_id, "base_rev": base_rev, "rev": meta["rev"]}})
+        res["merged"] = True
+        res["content"] = content
+    return jsonify(res)
+
+
+@app.route("/api/notes/<note_id>/content", methods=["PATCH"])
+def api_splice_content(note_id: str):
+    """Apply one edit to a large note: replace `delete` bytes at byte `offset` with `insert`."""
+    ensure_dirs()
+    body = request.get_json(silent=True) or {}
+    try:
+        offset = int(body.get("offset", 0))
+        delete = int(body.get("delete", 0))
+        base_rev = int(body.get("base_rev", -1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset, delete and base_rev must be integers"}), 400
+    insert = _normalize_citations(str(body.get("insert", "")))
 
-    if content_path is None:
-        fn = meta.get("filename")
-        if not fn:
-            return jsonify({"error": "Corrupt note (missing filename)"}), 500
-        content_path = meta_path.parent / fn
+    content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    if deleted:
+        return jsonify({"error": "Note is deleted"}), 400
 
-    write_note_content(content_path, content, meta)
-    save_json(meta_path, meta)
-    update_index_meta(meta)
-    return jsonify({"rev": meta["rev"], "updated": meta["updated"], "base_rev": base_rev})
+    with _content_lock:
+        meta = load_json(meta_path)
+        rev = int(meta.get("rev", 0))
+        if base_rev != rev:
+            # Byte offsets are only meaningful against the revision they came from
+            return jsonify({"error": "Note changed since base_rev", "rev": rev}), 409
+        if content_path is None:
+            fn = meta.get("filename")
+            if not fn:
+                return jsonify({"error": "Corrupt note (missing filename)"}), 500
+            content_path = meta_path.parent / fn
+        meta["rev"] = rev + 1
+        meta["updated"] = utc_now_iso()
+        try:
+            size = splice_note_content(content_path, meta, offset, delete, insert)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        save_json(meta_path, meta)
+        update_index_meta(meta)
+    return jsonify({"rev": meta["rev"], "updated": meta["updated"], "base_rev": base_rev, "size": size, "meta": meta})
 
 
 @app.route("/api/notes/<note_id>/meta", methods=["PUT"])
@@ -1061,6 +2983,7 @@ def api_update_meta(note_id: str):
         if content_path and content_path.exists():
             content_path.rename(new_content)
         meta_path.rename(new_meta)
+        sync_mark_dirty(content_path, meta_path, new_content)
 
         meta_path = new_meta
         content_path = new_content
@@ -1103,6 +3026,7 @@ def api_delete_note(note_id: str):
     if content_path and content_path.exists():
         shutil.move(str(content_path), str(target_content))
     shutil.move(str(meta_path), str(target_meta))
+    sync_mark_dirty(content_path, meta_path)
     save_json(target_meta, meta)
     update_index_meta(meta)
     log.info("Note deleted", extra={"event": "note_deleted", "extra_data": {"note_id": note_id}})
@@ -1131,6 +3055,7 @@ def api_restore_note(note_id: str):
     if content_path and content_path.exists():
         shutil.move(str(content_path), str(target_content))
     shutil.move(str(meta_path), str(target_meta))
+    sync_mark_dirty(target_content)
     save_json(target_meta, meta)
     update_index_meta(meta)
     log.info("Note restored", extra={"event": "note_restored", "extra_data": {"note_id": note_id}})
@@ -1139,6 +3064,76 @@ def api_restore_note(note_id: str):
 
 
 
+# ---------- Revision history ----------
+@app.route("/api/notes/<note_id>/history", methods=["GET"])
+def api_note_history(note_id: str):
+    ensure_dirs()
+    content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    meta = load_json(meta_path)
+    revisions = [{
+        "rev": int(e.get("rev", 0)),
+        "ts": _ts_iso(float(e.get("ts", 0))),
+        "first_ts": _ts_iso(float(e.get("first_ts", e.get("ts", 0)))),
+        "size": int(e.get("size", 0)),
+    } for e in reversed(history_list(note_id))]
+    return jsonify({"id": note_id, "rev": int(meta.get("rev", 0)), "revisions": revisions})
+
+
+@app.route("/api/notes/<note_id>/history/<int:rev>", methods=["GET"])
+def api_note_revision(note_id: str, rev: int):
+    ensure_dirs()
+    content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    try:
+        found = history_read(note_id, rev)
+    except Exception:
+        log.warning("History read failed", extra={"event": "history_read_failed", "extra_data": {"note_id": note_id, "rev": rev}}, exc_info=True)
+        return jsonify({"error": "Revision could not be read"}), 500
+    if found is None:
+        return jsonify({"error": "Revision not found"}), 404
+    entry, content = found
+    return jsonify({"id": note_id, "rev": rev, "ts": _ts_iso(float(entry.get("ts", 0))), "content": content})
+
+
+@app.route("/api/notes/<note_id>/history/<int:rev>/restore", methods=["POST"])
+def api_restore_revision(note_id: str, rev: int):
+    """Write an old revision back as a new one; the current content stays in history."""
+    ensure_dirs()
+    content_path, meta_path, deleted = find_note_files_by_id(note_id)
+    if not meta_path:
+        return jsonify({"error": "Not found"}), 404
+    if deleted:
+        return jsonify({"error": "Note is deleted"}), 400
+    try:
+        found = history_read(note_id, rev)
+    except Exception:
+        log.warning("History read failed", extra={"event": "history_read_failed", "extra_data": {"note_id": note_id, "rev": rev}}, exc_info=True)
+        return jsonify({"error": "Revision could not be read"}), 500
+    if found is None:
+        return jsonify({"error": "Revision not found"}), 404
+    content = found[1]
+
+    meta = load_json(meta_path)
+    history_seed(meta, content_path, int(meta.get("rev", 0)))
+    meta["rev"] = int(meta.get("rev", 0)) + 1
+    meta["updated"] = utc_now_iso()
+    if content_path is None:
+        fn = meta.get("filename")
+        if not fn:
+            return jsonify({"error": "Corrupt note (missing filename)"}), 500
+        content_path = meta_path.parent / fn
+
+    write_note_content(content_path, content, meta, history_sealed=True)
+    save_json(meta_path, meta)
+    update_index_meta(meta)
+    remember_merge_base(note_id, meta["rev"], content)
+    log.info("Note revision restored", extra={"event": "note_revision_restored", "extra_data": {"note_id": note_id, "from_rev": rev, "rev": meta["rev"]}})
+    return jsonify({"rev": meta["rev"], "updated": meta["updated"], "restored_from": rev, "content": content, "meta": meta})
+
+
 @app.route("/api/notes/<note_id>/download", methods=["GET"])
 def api_download_note(note_id: str):
     ensure_dirs()
@@ -1147,10 +3142,6 @@ def api_download_note(note_id: str):
         return jsonify({"error": "Not found"}), 404
     meta = load_json(meta_path)
 
-    content = ""
-    if content_path and content_path.exists():
-        content = read_note_content(content_path, meta)
-
     title = (meta.get("title") or "").strip()
     if title:
         safe = SAFE_TITLE_RE.sub("-", _transliterate(title)).strip("-")[:80] or "note"
@@ -1160,9 +3151,25 @@ def api_download_note(note_id: str):
         if not dl_name.endswith(".md"):
             dl_name = dl_name.rsplit(".", 1)[0] + ".md"
 
+    mimetype = "text/markdown; charset=utf-8"
+    if content_path and content_path.exists() and not meta.get("encrypted"):
+        # Plaintext is served straight from disk
+        return send_file(content_path, mimetype=mimetype, as_attachment=True, download_name=dl_name)
+    content = read_note_content(content_path, meta) if content_path and content_path.exists() else ""
     buf = io.BytesIO(content.encode("utf-8"))
-    buf.seek(0)
-    return send_file(buf, mimetype="text/markdown; charset=utf-8", as_attachment=True, download_name=dl_name)
+    return send_file(buf, mimetype=mimetype, as_attachment=True, download_name=dl_name)
+
+
+# Export ZIPs are built in a scratch file that moves from memory to disk (under
+# EXPORTS_DIR) once it grows past EXPORT_SPOOL_BYTES. Exports that contain
+# decrypted notes stay in memory so plaintext never reaches the disk.
+EXPORT_SPOOL_BYTES = 16 * 1024 * 1024
+
+
+def _export_buffer(has_encrypted: bool):
+    if has_encrypted:
+        return io.BytesIO()
+    return SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES, dir=str(EXPORTS_DIR))
 
 
 @app.route("/api/export/all", methods=["GET"])
@@ -1170,7 +3177,8 @@ def api_export_all():
     ensure_dirs()
     include_deleted = request.args.get("include_deleted", "false").lower() == "true"
 
-    buf = io.BytesIO()
+    has_encrypted = any(m.get("encrypted") for m in list_metas(include_deleted=include_deleted))
+    buf = _export_buffer(has_encrypted)
     with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
         for base_dir, folder in [(NOTES_DIR, "notes"), (JOURNAL_DIR, "journal"), (TRASH_DIR, "trash")]:
             if base_dir == TRASH_DIR and not include_deleted:
@@ -1216,7 +3224,9 @@ def api_export_selected():
     if not isinstance(ids, list):
         return jsonify({"error": "ids must be a list"}), 400
 
-    mem = io.BytesIO()
+    wanted = {str(i) for i in ids}
+    has_encrypted = any(m.get("encrypted") for m in list_metas(include_deleted=True) if m.get("id") in wanted)
+    mem = _export_buffer(has_encrypted)
     with zipfile.ZipFile(mem, "w", compression=zipfile.ZIP_DEFLATED) as zf:
         for note_id in ids:
             note_id = str(note_id)
@@ -1266,6 +3276,7 @@ def _default_sync_settings():
         "mode": "push",
         "interval_s": 60,
         "no_deletes": True,
+        "engine": "native",
     }
 
 @app.route("/api/sync/settings", methods=["GET"])
@@ -1310,12 +3321,14 @@ def api_set_sync_settings():
             "mode": str(payload.get("mode","push")).strip() or "push",
             "interval_s": int(payload.get("interval_s", 60) or 60),
             "no_deletes": bool(payload.get("no_deletes", True)),
+            "engine": "rclone" if str(payload.get("engine", "native")).strip() == "rclone" else "native",
         })
         if d["interval_s"] < 10:
             d["interval_s"] = 10
         with open(SYNC_SETTINGS, "w", encoding="utf-8") as f:
             json.dump(d, f, indent=2)
-        log.info("Sync settings saved", extra={"event": "sync_settings_saved", "extra_data": {"enabled": d["enabled"], "mode": d["mode"], "webdav_url": d["webdav_url"]}})
+        log.info("Sync settings saved", extra={"event": "sync_settings_saved", "extra_data": {"enabled": d["enabled"], "mode": d["mode"], "engine": d["engine"], "webdav_url": d["webdav_url"]}})
+        sync_request_full()
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
@@ -1323,21 +3336,43 @@ def api_set_sync_settings():
 @app.route("/api/sync/status", methods=["GET"])
 def api_get_sync_status():
     _ensure_sync_dirs()
+    status = {"last_result": "idle", "last_time": "never"}
     if os.path.exists(SYNC_STATUS):
         try:
             with open(SYNC_STATUS, "r", encoding="utf-8") as f:
-                return jsonify(json.load(f))
+                status = json.load(f)
         except Exception:
             pass
-    return jsonify({"last_result": "idle", "last_time": "never"})
+    try:
+        limit = max(0, min(int(request.args.get("runs", "20")), SYNC_RUNS_KEEP))
+    except ValueError:
+        limit = 20
+    # Aggregate over the retained history, return the newest `limit` runs
+    runs = sync_recent_runs(SYNC_RUNS_KEEP)
+    if runs:
+        durations = sorted(r.get("duration_ms", 0) for r in runs)
+        status["summary"] = {
+            "runs": len(runs),
+            "since": runs[-1].get("time"),
+            "error_runs": sum(1 for r in runs if r.get("result") == "error"),
+            "files_transferred": sum(r.get("files_transferred", 0) for r in runs),
+            "bytes_up": sum(r.get("bytes_up", 0) for r in runs),
+            "bytes_down": sum(r.get("bytes_down", 0) for r in runs),
+            "requests": sum(r.get("requests", 0) for r in runs),
+            "duration_ms_median": durations[len(durations) // 2],
+            "duration_ms_max": durations[-1],
+        }
+    status["runs"] = runs[:limit]
+    return jsonify(status)
 
 @app.route("/api/sync/run", methods=["POST"])
 def api_sync_run():
     _ensure_sync_dirs()
     try:
         now = int(time.time())
-        with open(SYNC_RUN_ONCE, "w", encoding="utf-8") as f:
-            f.write(str(now))
+        if _load_sync_settings().get("engine") == "rclone":
+            with open(SYNC_RUN_ONCE, "w", encoding="utf-8") as f:
+                f.write(str(now))
 
         # Immediately write a status marker so the UI reflects the request
         status = {
@@ -1349,6 +3384,7 @@ def api_sync_run():
                 json.dump(status, f)
         except Exception:
             pass
+        sync_request_full()
 
         return jsonify({"ok": True})
     except Exception as e:
@@ -1368,6 +3404,7 @@ def api_sync_pause():
         s["paused"] = paused
         with open(SYNC_SETTINGS, "w", encoding="utf-8") as f:
             json.dump(s, f, indent=2)
+        sync_request_full()
         return jsonify({"ok": True, "paused": paused})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
@@ -1413,6 +3450,756 @@ def api_sync_test():
         return jsonify({"ok": False, "error": str(e)}), 400
 
 
+# ---------- Native WebDAV sync ----------
+# With engine "native" (the default) the backend syncs NOTES_DIR to
+# <remote_path> and JOURNAL_DIR to <remote_path>/journal itself, instead of the
+# rclone sidecar re-transferring both trees every interval. Every write path
+# marks the files it touched (sync_mark_dirty); the sync thread wakes on that and
+# transfers only those files. SYNC_STATE records, per synced file, the local
+# (size, mtime_ns) and the remote etag seen at the last transfer, plus the etag of
+# each remote folder at its last listing:
+#  - a full reconcile (on start, "Sync now", and every interval_s as a safety
+#    net) compares local files against it, so unchanged files cost one stat;
+#  - pull/bisync first ask for the remote folder's etag (PROPFIND depth 0) and
+#    only list the folder when it changed (start and "Sync now" always list, in
+#    case the server doesn't propagate child changes to folder etags).
+# Conflicting bisync edits keep the newer side; the other copy is saved under
+# SYNC_DIR/conflicts/.
+# Marks are debounced: a sync starts once no file has been marked for
+# SYNC_DEBOUNCE_SECONDS, but at the latest SYNC_MAX_DELAY_SECONDS after the
+# first pending mark, so continuous typing still reaches the remote. "Sync now"
+# skips the wait. With engine "rclone" the same debounced trigger drops the
+# run_once file, which the sidecar polls every second.
+SYNC_STATE = os.path.join(SYNC_DIR, "state.json")
+SYNC_CONFLICTS_DIR = os.path.join(SYNC_DIR, "conflicts")
+SYNC_DEBOUNCE_SECONDS = float(os.environ.get("SYNC_DEBOUNCE_SECONDS", "2"))
+SYNC_MAX_DELAY_SECONDS = float(os.environ.get("SYNC_MAX_DELAY_SECONDS", "15"))
+SYNC_HTTP_TIMEOUT = 30
+# Per-run metrics, one JSON object per line (see /api/sync/status)
+SYNC_RUNS = os.path.join(SYNC_DIR, "runs.jsonl")
+SYNC_RUNS_KEEP = int(os.environ.get("SYNC_RUNS_KEEP", "500"))
+_SYNC_ROOTS = ("notes", "journal")
+
+_sync_lock = threading.Lock()
+_sync_dirty: set = set()
+_sync_wake = threading.Event()
+# Set by start-up, "Sync now" and settings changes: full reconcile plus fresh remote listings
+_sync_full_requested = True
+# time.monotonic() of the first and the latest mark not yet handed to a run
+_sync_first_mark: Optional[float] = None
+_sync_last_mark: Optional[float] = None
+_sync_thread: Optional[threading.Thread] = None
+_sync_runs_lock = threading.Lock()
+_sync_runs_lines: Optional[int] = None
+
+
+def _load_sync_settings() -> Dict[str, Any]:
+    d = _default_sync_settings()
+    if os.path.exists(SYNC_SETTINGS):
+        try:
+            with open(SYNC_SETTINGS, "r", encoding="utf-8") as f:
+                d.update(json.load(f) or {})
+        except Exception:
+            pass
+    return d
+
+
+def _sync_root_dir(root: str) -> Path:
+    return NOTES_DIR if root == "notes" else JOURNAL_DIR
+
+
+def sync_mark_dirty(*paths: Optional[Path]) -> None:
+    """Queue note/journal files for the next sync (no-op for other paths)."""
+    global _sync_first_mark, _sync_last_mark
+    marked = False
+    for p in paths:
+        if p is None:
+            continue
+        p = Path(p)
+        if p.name.startswith("."):
+            continue
+        if p.parent == NOTES_DIR:
+            root = "notes"
+        elif p.parent == JOURNAL_DIR:
+            root = "journal"
+        else:
+            continue
+        with _sync_lock:
+            _sync_dirty.add((root, p.name))
+            _sync_last_mark = time.monotonic()
+            if _sync_first_mark is None:
+                _sync_first_mark = _sync_last_mark
+        marked = True
+    if marked:
+        _sync_wake.set()
+
+
+def _sync_take_dirty() -> Tuple[set, bool]:
+    """Hand the pending marks to a run: (dirty files, full reconcile requested)."""
+    global _sync_full_requested, _sync_first_mark, _sync_last_mark
+    with _sync_lock:
+        dirty = set(_sync_dirty)
+        _sync_dirty.clear()
+        requested = _sync_full_requested
+        _sync_full_requested = False
+        _sync_first_mark = _sync_last_mark = None
+    return dirty, requested
+
+
+def sync_request_full() -> None:
+    global _sync_full_requested
+    with _sync_lock:
+        _sync_full_requested = True
+    _sync_wake.set()
+
+
+class WebDAVError(Exception):
+    pass
+
+
+class _WebDAVClient:
+    """Minimal WebDAV client over one keep-alive connection (http.client)."""
+
+    _PROPFIND_BODY = (
+        b'<?xml version="1.0" encoding="utf-8"?>'
+        b'<d:propfind xmlns:d="DAV:"><d:prop><d:getetag/><d:getcontentlength/>'
+        b'<d:getlastmodified/><d:resourcetype/></d:prop></d:propfind>'
+    )
+
+    def __init__(self, url: str, username: str, password: str, remote_path: str):
+        u = urllib.parse.urlsplit(url)
+        if u.scheme not in ("http", "https") or not u.netloc:
+            raise WebDAVError("Invalid WebDAV URL")
+        self.https = u.scheme == "https"
+        self.netloc = u.netloc
+        self.prefix = u.path.rstrip("/")
+        self.base = (self.prefix + "/" + remote_path.strip("/")).rstrip("/")
+        token = base64.b64encode(f"{username}:{password}".encode("utf-8")).decode("ascii")
+        self.auth = f"Basic {token}"
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.requests = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+
+    def close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def _url_path(self, rel: str) -> str:
+        path = self.base + ("/" + rel.strip("/") if rel.strip("/") else "")
+        return urllib.parse.quote(path or "/")
+
+    def request(self, method: str, rel: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Any, bytes]:
+        h = {"Authorization": self.auth}
+        h.update(headers or {})
+        path = self._url_path(rel)
+        for attempt in (0, 1):
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = cls(self.netloc, timeout=SYNC_HTTP_TIMEOUT)
+            try:
+                self.conn.request(method, path, body=body, headers=h)
+                resp = self.conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError):
+                # A keep-alive connection the server dropped: retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+                continue
+            self.requests += 1
+            self.bytes_up += len(body or b"")
+            self.bytes_down += len(data)
+            if resp.getheader("Connection", "").lower() == "close":
+                self.close()
+            return resp.status, resp, data
+        raise WebDAVError("unreachable")
+
+    def propfind(self, rel: str, depth: int) -> Dict[str, Dict[str, Any]]:
+        """Entries of a collection keyed by name ("" is the collection itself)."""
+        status, _, data = self.request("PROPFIND", rel, self._PROPFIND_BODY,
+                                       {"Depth": str(depth), "Content-Type": "application/xml"})
+        if status == 404:
+            raise FileNotFoundError(rel)
+        if status != 207:
+            raise WebDAVError(f"PROPFIND {rel or '/'}: HTTP {status}")
+        base = urllib.parse.unquote(self._url_path(rel)).rstrip("/")
+        out: Dict[str, Dict[str, Any]] = {}
+        for resp in ET.fromstring(data).iter("{DAV:}response"):
+            href = urllib.parse.unquote(urllib.parse.urlsplit(resp.findtext("{DAV:}href", "")).path).rstrip("/")
+            name = "" if href == base else href.rsplit("/", 1)[-1]
+            info: Dict[str, Any] = {"dir": False, "etag": None, "size": None, "mtime": None}
+            for ps in resp.iter("{DAV:}propstat"):
+                if " 200 " not in (ps.findtext("{DAV:}status", "") + " "):
+                    continue
+                prop = ps.find("{DAV:}prop")
+                if prop is None:
+                    continue
+                if prop.find("{DAV:}resourcetype/{DAV:}collection") is not None:
+                    info["dir"] = True
+                etag = prop.findtext("{DAV:}getetag")
+                if etag:
+                    info["etag"] = etag.strip()
+                size = prop.findtext("{DAV:}getcontentlength")
+                if size and size.strip().isdigit():
+                    info["size"] = int(size)
+                modified = prop.findtext("{DAV:}getlastmodified")
+                if modified:
+                    try:
+                        info["mtime"] = email.utils.parsedate_to_datetime(modified).timestamp()
+                    except (TypeError, ValueError):
+                        pass
+            out[name] = info
+        return out
+
+    def get(self, rel: str) -> Tuple[bytes, Optional[str]]:
+        status, resp, data = self.request("GET", rel)
+        if status != 200:
+            raise WebDAVError(f"GET {rel}: HTTP {status}")
+        return data, resp.getheader("ETag")
+
+    def put(self, rel: str, data: bytes, mtime: Optional[float] = None) -> Optional[str]:
+        headers = {"Content-Type": "application/octet-stream"}
+        if mtime is not None:
+            # Nextcloud/ownCloud keep the local modification time
+            headers["X-OC-Mtime"] = str(int(mtime))
+        status, resp, _ = self.request("PUT", rel, data, headers)
+        if status not in (200, 201, 204):
+            raise WebDAVError(f"PUT {rel}: HTTP {status}")
+        return resp.getheader("OC-ETag") or resp.getheader("ETag")
+
+    def delete(self, rel: str) -> None:
+        status, _, _ = self.request("DELETE", rel)
+        if status not in (200, 204, 404):
+            raise WebDAVError(f"DELETE {rel}: HTTP {status}")
+
+    def mkcol(self, rel: str) -> None:
+        status, _, _ = self.request("MKCOL", rel)
+        if status not in (201, 405):  # 405: already exists
+            raise WebDAVError(f"MKCOL {rel or '/'}: HTTP {status}")
+
+
+def _sync_remote_rel(root: str, name: str = "") -> str:
+    prefix = "" if root == "notes" else "journal"
+    return "/".join(x for x in (prefix, name) if x)
+
+
+def _sync_local_scan(root: str) -> Dict[str, Tuple[int, int]]:
+    out: Dict[str, Tuple[int, int]] = {}
+    d = _sync_root_dir(root)
+    if not d.exists():
+        return out
+    with os.scandir(d) as it:
+        for e in it:
+            if e.name.startswith(".") or not e.is_file():
+                continue
+            st = e.stat()
+            out[e.name] = (st.st_size, st.st_mtime_ns)
+    return out
+
+
+def _sync_local_stat(root: str, name: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = (_sync_root_dir(root) / name).stat()
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class _SyncRun:
+    """One pass of the native engine over the dirty set (or everything, if full)."""
+
+    def __init__(self, settings: Dict[str, Any], state: Dict[str, Any], dirty: set, full: bool, relist: bool):
+        self.s = settings
+        self.mode = settings.get("mode", "push")
+        self.no_deletes = bool(settings.get("no_deletes", True))
+        self.state = state
+        self.dirty = dirty
+        self.full = full
+        self.relist = relist
+        self.dav = _WebDAVClient(settings["webdav_url"], settings["username"], settings["password"], settings["remote_path"])
+        self.pushed = 0
+        self.pulled = 0
+        self.deleted = 0
+        self.conflicts = 0
+        self.checked = 0
+        self.errors = 0
+        self.bytes_pushed = 0
+        self.bytes_pulled = 0
+        # PUTs and DELETEs we sent; each one changes the remote folder's etag
+        self.remote_writes = 0
+        self.failed: set = set()
+        self.last_error = ""
+
+    def file_failed(self, root: str, name: str, e: Exception) -> None:
+        # An HTTP error for one file doesn't abort the run; the file is retried
+        # next time and the folder re-listed
+        self.errors += 1
+        self.failed.add((root, name))
+        self.last_error = str(e)
+        self.state.setdefault("folders", {}).pop(root, None)
+        log.warning("Sync file failed", extra={"event": "sync_file_failed", "extra_data": {"file": f"{root}/{name}", "error": str(e)}})
+
+    def files(self, root: str) -> Dict[str, Dict[str, Any]]:
+        return self.state["files"].setdefault(root, {})
+
+    def ensure_collections(self) -> None:
+        if self.state.get("collections_ok"):
+            return
+        parts = [p for p in self.s["remote_path"].strip("/").split("/") if p]
+        # Create the remote folder chain relative to the server URL
+        saved_base = self.dav.base
+        self.dav.base = self.dav.prefix
+        try:
+            for i in range(1, len(parts) + 1):
+                self.dav.mkcol("/".join(parts[:i]))
+        finally:
+            self.dav.base = saved_base
+        self.dav.mkcol("journal")
+        self.state["collections_ok"] = True
+
+    def remote_listing(self, root: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Remote files of a root, or None when the folder etag says nothing changed."""
+        rel = _sync_remote_rel(root)
+        folders = self.state.setdefault("folders", {})
+        try:
+            if not self.relist and folders.get(root):
+                top = self.dav.propfind(rel, 0).get("", {})
+                if top.get("etag") and top["etag"] == folders[root]:
+                    return None
+            listing = self.dav.propfind(rel, 1)
+        except FileNotFoundError:
+            self.state["collections_ok"] = False
+            return {}
+        folders[root] = listing.get("", {}).get("etag")
+        return {k: v for k, v in listing.items() if k and not v["dir"] and not k.startswith(".")}
+
+    def remember_folder_etag(self, root: str) -> None:
+        """Record the folder etag after our own uploads, so they don't force a re-list.
+
+        Only while the cached etag is still trusted: this run's start check matched
+        it or the folder was listed, and no file failed (which drops it). Remote
+        changes made by others while this run was writing are caught by the next
+        re-list (start, "Sync now", or any failure).
+        """
+        folders = self.state.setdefault("folders", {})
+        if not folders.get(root):
+            return
+        try:
+            etag = self.dav.propfind(_sync_remote_rel(root), 0).get("", {}).get("etag")
+        except (WebDAVError, FileNotFoundError):
+            etag = None
+        if etag:
+            folders[root] = etag
+        else:
+            folders.pop(root, None)
+
+    def push(self, root: str, name: str) -> None:
+        path = _sync_root_dir(root) / name
+        try:
+            data = path.read_bytes()
+            st = path.stat()
+        except FileNotFoundError:
+            return
+        try:
+            etag = self.dav.put(_sync_remote_rel(root, name), data, st.st_mtime)
+        except WebDAVError as e:
+            self.file_failed(root, name, e)
+            return
+        self.files(root)[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "etag": etag}
+        self.pushed += 1
+        self.remote_writes += 1
+        self.bytes_pushed += len(data)
+
+    def pull(self, root: str, name: str) -> None:
+        try:
+            data, etag = self.dav.get(_sync_remote_rel(root, name))
+        except WebDAVError as e:
+            self.file_failed(root, name, e)
+            return
+        self.bytes_pulled += len(data)
+        path = _sync_root_dir(root) / name
+        atomic_write_bytes(path, data)
+        st = path.stat()
+        self.files(root)[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "etag": etag}
+        self.pulled += 1
+
+    def delete_remote(self, root: str, name: str) -> None:
+        try:
+            self.dav.delete(_sync_remote_rel(root, name))
+        except WebDAVError as e:
+            self.file_failed(root, name, e)
+            return
+        self.files(root).pop(name, None)
+        self.deleted += 1
+        self.remote_writes += 1
+
+    def delete_local(self, root: str, name: str) -> None:
+        try:
+            (_sync_root_dir(root) / name).unlink()
+        except FileNotFoundError:
+            pass
+        self.files(root).pop(name, None)
+        self.deleted += 1
+
+    def forget_local(self, root: str, name: str) -> None:
+        # no_deletes: the remote copy stays, and stays known, so it isn't pulled back
+        k = self.files(root).get(name)
+        if k is not None:
+            k["size"] = k["mtime_ns"] = None
+
+    def forget_remote(self, root: str, name: str) -> None:
+        # no_deletes: the local copy stays and isn't pushed back unless edited
+        k = self.files(root).get(name)
+        if k is not None:
+            k["etag"] = ""
+
+    def keep_conflict_copy(self, root: str, name: str, data: bytes, side: str) -> None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        dest = Path(SYNC_CONFLICTS_DIR) / root / f"{name}.{side}-{stamp}"
+        atomic_write_bytes(dest, data)
+        self.conflicts += 1
+        log.warning("Sync conflict", extra={"event": "sync_conflict", "extra_data": {"file": f"{root}/{name}", "kept": str(dest)}})
+
+    def local_changes(self, root: str) -> set:
+        known = self.files(root)
+        if self.full:
+            local = _sync_local_scan(root)
+            self.checked += len(local)
+            changed = {n for n, (size, mtime) in local.items()
+                       if n not in known or (known[n].get("size"), known[n].get("mtime_ns")) != (size, mtime)}
+            changed |= {n for n in known if n not in local and known[n].get("size") is not None}
+            return changed
+        changed = set()
+        for r, n in self.dirty:
+            if r != root:
+                continue
+            self.checked += 1
+            cur = _sync_local_stat(root, n)
+            k = known.get(n)
+            if cur is None:
+                if k is not None and k.get("size") is not None:
+                    changed.add(n)
+            elif k is None or (k.get("size"), k.get("mtime_ns")) != cur:
+                changed.add(n)
+        return changed
+
+    def remote_changes(self, root: str, listing: Dict[str, Dict[str, Any]]) -> set:
+        known = self.files(root)
+        changed = set()
+        self.checked += len(listing)
+        for n, info in listing.items():
+            k = known.get(n)
+            if k is None:
+                changed.add(n)
+            elif k.get("etag") is None and info.get("size") == k.get("size"):
+                # Our own upload; the server didn't return its etag on PUT
+                k["etag"] = info.get("etag")
+            elif info.get("etag") != k.get("etag"):
+                changed.add(n)
+        changed |= {n for n in known if n not in listing and known[n].get("etag") != ""}
+        return changed
+
+    def run_root(self, root: str) -> None:
+        local_changed = self.local_changes(root) if self.mode in ("push", "bisync") else set()
+        writes = self.remote_writes
+        listing = None
+        if self.mode in ("pull", "bisync") or root not in self.state.setdefault("folders", {}):
+            listing = self.remote_listing(root)
+        remote_changed = self.remote_changes(root, listing) if listing is not None else set()
+        local_dir = _sync_root_dir(root)
+
+        if self.mode == "push":
+            if listing is not None:
+                # First run against this remote: skip files that are already there
+                for n in list(local_changed):
+                    cur = _sync_local_stat(root, n)
+                    info = listing.get(n)
+                    if cur and info and info.get("size") == cur[0] and not self.files(root).get(n):
+                        self.files(root)[n] = {"size": cur[0], "mtime_ns": cur[1], "etag": info.get("etag")}
+                        local_changed.discard(n)
+                if not self.no_deletes:
+                    local_changed |= {n for n in listing if not (local_dir / n).exists()}
+            for n in sorted(local_changed):
+                if (local_dir / n).exists():
+                    self.push(root, n)
+                elif not self.no_deletes:
+                    self.delete_remote(root, n)
+                else:
+                    self.forget_local(root, n)
+            return
+
+        if self.mode == "pull":
+            for n in sorted(remote_changed):
+                if n in listing:
+                    self.pull(root, n)
+                elif not self.no_deletes:
+                    self.delete_local(root, n)
+                else:
+                    self.forget_remote(root, n)
+            return
+
+        # bisync
+        for n in sorted(local_changed | remote_changed):
+            local_exists = (local_dir / n).exists()
+            known = self.files(root).get(n)
+            remote_exists = (n in listing) if listing is not None else bool(known) and known.get("etag") != ""
+            if n in local_changed and n not in remote_changed:
+                if local_exists:
+                    self.push(root, n)
+                elif not self.no_deletes:
+                    self.delete_remote(root, n)
+                else:
+                    self.forget_local(root, n)
+            elif n in remote_changed and n not in local_changed:
+                if remote_exists:
+                    self.pull(root, n)
+                elif not self.no_deletes:
+                    self.delete_local(root, n)
+                else:
+                    self.forget_remote(root, n)
+            elif local_exists and remote_exists:
+                # Changed on both sides: the newer copy wins, the other is kept aside
+                try:
+                    data, _ = self.dav.get(_sync_remote_rel(root, n))
+                except WebDAVError as e:
+                    self.file_failed(root, n, e)
+                    continue
+                self.bytes_pulled += len(data)
+                local_data = (local_dir / n).read_bytes()
+                if data == local_data:
+                    st = (local_dir / n).stat()
+                    self.files(root)[n] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "etag": listing[n].get("etag")}
+                    continue
+                remote_mtime = listing[n].get("mtime") or 0
+                if (local_dir / n).stat().st_mtime >= remote_mtime:
+                    self.keep_conflict_copy(root, n, data, "remote")
+                    self.push(root, n)
+                else:
+                    self.keep_conflict_copy(root, n, local_data, "local")
+                    atomic_write_bytes(local_dir / n, data)
+                    st = (local_dir / n).stat()
+                    self.files(root)[n] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "etag": listing[n].get("etag")}
+                    self.pulled += 1
+            elif local_exists:
+                self.push(root, n)
+            elif remote_exists:
+                self.pull(root, n)
+            else:
+                self.files(root).pop(n, None)
+        if self.remote_writes > writes:
+            self.remember_folder_etag(root)
+
+    def run(self) -> None:
+        try:
+            self.ensure_collections()
+            for root in _SYNC_ROOTS:
+                self.run_root(root)
+        finally:
+            self.dav.close()
+
+
+def _sync_state_key(s: Dict[str, Any]) -> str:
+    return "|".join([s.get("webdav_url", ""), s.get("remote_path", ""), s.get("username", "")])
+
+
+def _load_sync_state(s: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        with open(SYNC_STATE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception:
+        state = {}
+    if state.get("key") != _sync_state_key(s):
+        # Different remote: nothing is known to be in sync
+        state = {"key": _sync_state_key(s), "files": {}, "folders": {}}
+    state.setdefault("files", {})
+    return state
+
+
+def _write_sync_status(status: Dict[str, Any]) -> None:
+    _ensure_sync_dirs()
+    status["engine"] = "native"
+    atomic_write_text(Path(SYNC_STATUS), json.dumps(status))
+
+
+def _sync_record_run(record: Dict[str, Any]) -> None:
+    """Append one run to SYNC_RUNS, keeping the newest SYNC_RUNS_KEEP records."""
+    global _sync_runs_lines
+    _ensure_sync_dirs()
+    with _sync_runs_lock:
+        if _sync_runs_lines is None:
+            try:
+                with open(SYNC_RUNS, "r", encoding="utf-8") as f:
+                    _sync_runs_lines = sum(1 for _ in f)
+            except FileNotFoundError:
+                _sync_runs_lines = 0
+        with open(SYNC_RUNS, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        _sync_runs_lines += 1
+        # Trim in batches so appends stay cheap
+        if _sync_runs_lines > 2 * SYNC_RUNS_KEEP:
+            with open(SYNC_RUNS, "r", encoding="utf-8") as f:
+                lines = f.readlines()[-SYNC_RUNS_KEEP:]
+            atomic_write_text(Path(SYNC_RUNS), "".join(lines))
+            _sync_runs_lines = len(lines)
+
+
+def sync_recent_runs(limit: int) -> List[Dict[str, Any]]:
+    """Newest first; also includes runs recorded by the rclone sidecar."""
+    try:
+        with open(SYNC_RUNS, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    runs = []
+    for line in reversed(lines):
+        if len(runs) >= limit:
+            break
+        try:
+            runs.append(json.loads(line))
+        except ValueError:
+            continue
+    return runs
+
+
+def sync_run_once(full: bool = False) -> Dict[str, Any]:
+    """Run the native engine once; returns the status it wrote."""
+    global _sync_full_requested
+    s = _load_sync_settings()
+    if s.get("engine", "native") != "native":
+        return {}
+    dirty, relist = _sync_take_dirty()
+    full = full or relist
+    if not s.get("enabled") or s.get("paused"):
+        # Changes made meanwhile are found by the full reconcile on resume
+        with _sync_lock:
+            _sync_full_requested = True
+        status = {"last_result": "paused" if s.get("paused") else "idle", "last_time": utc_now_iso()}
+        _write_sync_status(status)
+        return status
+    if not (s.get("webdav_url") and s.get("remote_path") and s.get("username") and s.get("password")):
+        status = {"last_result": "error", "last_time": utc_now_iso(), "last_error": "missing settings"}
+        _write_sync_status(status)
+        return status
+    if not dirty and not full and s.get("mode") == "push":
+        return {}
+
+    state = _load_sync_state(s)
+    started = time.time()
+    run = None
+    error = ""
+    try:
+        run = _SyncRun(s, state, dirty, full, relist)
+        run.run()
+        if run.errors:
+            with _sync_lock:
+                _sync_dirty.update(run.failed)
+            error = f"{run.errors} file(s) failed: {run.last_error}"
+            status = {"last_result": "error", "last_time": utc_now_iso(), "last_error": error}
+        else:
+            status = {"last_result": "ok", "last_time": utc_now_iso()}
+    except Exception as e:
+        # Retry the same files next time
+        with _sync_lock:
+            _sync_dirty.update(dirty)
+            if relist:
+                _sync_full_requested = True
+        error = str(e) or e.__class__.__name__
+        status = {"last_result": "error", "last_time": utc_now_iso(), "last_error": error}
+        log.warning("Sync failed", extra={"event": "sync_failed", "extra_data": {"mode": s.get("mode"), "error": str(e)}})
+    finally:
+        _ensure_sync_dirs()
+        atomic_write_text(Path(SYNC_STATE), json.dumps(state))
+    if run is not None and run.pulled + run.deleted:
+        rebuild_index()
+    record = {
+        "time": status["last_time"],
+        "engine": "native",
+        "mode": s.get("mode"),
+        "full": full,
+        "result": status["last_result"],
+        "duration_ms": int((time.time() - started) * 1000),
+        "files_checked": run.checked if run else 0,
+        "files_transferred": run.pushed + run.pulled if run else 0,
+        "pushed": run.pushed if run else 0,
+        "pulled": run.pulled if run else 0,
+        "deleted": run.deleted if run else 0,
+        "conflicts": run.conflicts if run else 0,
+        "bytes_transferred": run.bytes_pushed + run.bytes_pulled if run else 0,
+        "bytes_up": run.dav.bytes_up if run else 0,
+        "bytes_down": run.dav.bytes_down if run else 0,
+        "requests": run.dav.requests if run else 0,
+        # Per-file failures, or 1 for a run that was aborted
+        "errors": (run.errors if run else 0) or int(status["last_result"] == "error"),
+    }
+    if error:
+        record["error"] = error
+    _sync_record_run(record)
+    if record["files_transferred"] + record["deleted"] + record["conflicts"]:
+        log.info("Sync done", extra={"event": "sync_done", "extra_data": record})
+    status["last_run"] = record
+    _write_sync_status(status)
+    return status
+
+
+def _sync_debounce() -> None:
+    """Wait until the pending marks have been quiet long enough, or waited too long."""
+    while True:
+        with _sync_lock:
+            if _sync_full_requested or _sync_first_mark is None:
+                return
+            due = min(_sync_last_mark + SYNC_DEBOUNCE_SECONDS, _sync_first_mark + SYNC_MAX_DELAY_SECONDS)
+        delay = due - time.monotonic()
+        if delay <= 0:
+            return
+        # Woken early by every new mark (or by "Sync now"); re-evaluate then
+        _sync_wake.wait(delay)
+        _sync_wake.clear()
+
+
+def _sync_trigger_rclone(s: Dict[str, Any]) -> None:
+    _sync_take_dirty()
+    if not s.get("enabled") or s.get("paused"):
+        return
+    _ensure_sync_dirs()
+    with open(SYNC_RUN_ONCE, "w", encoding="utf-8") as f:
+        f.write(str(int(time.time())))
+
+
+def _sync_loop() -> None:
+    while True:
+        s = _load_sync_settings()
+        interval = max(10, int(s.get("interval_s") or 60))
+        woke = _sync_wake.wait(interval)
+        _sync_wake.clear()
+        try:
+            if woke:
+                _sync_debounce()
+            s = _load_sync_settings()
+            if s.get("engine", "native") == "rclone":
+                # The sidecar keeps its own interval; only forward change triggers
+                if woke:
+                    _sync_trigger_rclone(s)
+                continue
+            sync_run_once(full=not woke)  # a timeout is the safety-net reconcile
+        except Exception:
+            log.warning("Sync loop error", extra={"event": "sync_loop_error"}, exc_info=True)
+
+
+def start_sync_engine() -> None:
+    global _sync_thread
+    if _sync_thread is not None:
+        return
+    _sync_thread = threading.Thread(target=_sync_loop, name="webdav-sync", daemon=True)
+    _sync_thread.start()
+    _sync_wake.set()  # initial full reconcile
+
+
 # ---------- Encryption settings API ----------
 @app.route("/api/encryption/settings", methods=["GET"])
 def api_get_encryption_settings():
@@ -1441,6 +4228,8 @@ def api_set_encryption_settings():
     key_changed = had_key and old_passphrase != passphrase
     _save_encryption_settings({"passphrase": passphrase})
     _invalidate_fernet_cache()
+    if key_changed:
+        enc_index_reset()
     log.info("Encryption passphrase saved", extra={"event": "encryption_settings_saved"})
     result: Dict[str, Any] = {"ok": True}
     if key_changed:
@@ -1490,6 +4279,11 @@ def api_delete_encryption_settings():
                     decrypted += 1
                 except Exception:
                     errors += 1
+                    continue
+                try:
+                    history_set_encrypted(note_id, False)
+                except Exception:
+                    log.warning("History decryption failed", extra={"event": "history_reencrypt_failed", "extra_data": {"note_id": note_id}}, exc_info=True)
             else:
                 meta["encrypted"] = False
                 save_json(meta_path, meta)
@@ -1498,6 +4292,7 @@ def api_delete_encryption_settings():
     # Remove the key
     _save_encryption_settings({})
     _invalidate_fernet_cache()
+    enc_index_reset()
     log.info("Encryption disabled", extra={"event": "encryption_disabled", "extra_data": {"decrypted": decrypted, "errors": errors}})
     result: Dict[str, Any] = {"ok": True, "decrypted": decrypted}
     if errors:
@@ -1547,14 +4342,137 @@ def api_toggle_encryption(note_id: str):
     write_note_content(content_path, content, meta)
     save_json(meta_path, meta)
     update_index_meta(meta)
+    try:
+        history_set_encrypted(note_id, want_encrypted)
+    except Exception:
+        log.warning("History re-encryption failed", extra={"event": "history_reencrypt_failed", "extra_data": {"note_id": note_id}}, exc_info=True)
     log.info("Note encryption toggled", extra={"event": "note_encrypt_toggle", "extra_data": {"note_id": note_id, "encrypted": want_encrypted}})
     return jsonify({"ok": True, "encrypted": want_encrypted, "meta": meta})
 
 
+# ---------- PDF export ----------
+# Rendered PDFs are cached in PDF_CACHE_DIR so repeat downloads of an unchanged
+# note are a plain file send. The key covers everything that affects the output;
+# eviction is LRU by file mtime (touched on every hit) under PDF_CACHE_MAX_BYTES.
+# Encrypted notes are never cached, since the PDF would be plaintext on disk.
+PDF_CACHE_DIR = EXPORTS_DIR / "pdf-cache"
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+_PDF_RENDER_VERSION = 3
+_pdf_cache_lock = threading.Lock()
+
+
+def _pdf_safe_name(display: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', "_", _transliterate(display))[:120].strip("_") or "note"
+
+
+def _pdf_header_date(pdf_meta: Dict[str, Any]) -> str:
+    if bool(pdf_meta.get("use_export_date", True)):
+        return datetime.now().date().isoformat()
+    return (pdf_meta.get("date") or "").strip()
+
+
+def _render_note_pdf(content: str, display: str, pdf_meta: Dict[str, Any], fmt: str, header_date: str) -> bytes:
+    author = (pdf_meta.get("author") or "").strip()
+    company = (pdf_meta.get("company") or "").strip()
+    version = (pdf_meta.get("version") or "").strip()
+    tlp = (pdf_meta.get("tlp") or "AMBER").strip().upper()
+    header_left = display
+    header_right_parts: List[str] = []
+    if company:
+        header_right_parts.append(company)
+    if author:
+        header_right_parts.append(author)
+    if version:
+        header_right_parts.append(version if version.lower().startswith("v") else f"v{version}")
+    if header_date:
+        header_right_parts.append(header_date)
+    header_right = " • ".join([p for p in header_right_parts if p])
+    tlp_label = f"TLP: {tlp}"
+    tlp_fill, tlp_text, tlp_border = _tlp_style(tlp)
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+        topMargin=24 * mm,
+        bottomMargin=20 * mm,
+        title=display,
+    )
+    flow: List[Any] = []
+    ctx = _render_context()
+    flow.append(Paragraph(xml_escape(display), ctx.title))
+    if fmt == "txt":
+        code_style = ctx.code
+        max_width = A4[0] - (18 * mm * 2)
+        wrapped = "\n".join(_pdf_wrap_lines(content or "", None, max_width, code_style.fontName, code_style.fontSize))
+        flow.append(Preformatted(wrapped, code_style))
+    else:
+        flow.extend(_markdown_to_flowables(content or ""))
+    canvas_maker = _make_numbered_canvas(
+        header_left,
+        header_right,
+        "Page {page} of {pages}",
+        footer_left_label=tlp_label,
+        footer_left_fill=tlp_fill,
+        footer_left_text=tlp_text,
+        footer_left_border=tlp_border,
+    )
+    doc.build(flow, canvasmaker=canvas_maker)
+    return buf.getvalue()
+
+
+def _pdf_cache_path(meta: Dict[str, Any], content_path: Optional[Path], display: str,
+                    pdf_meta: Dict[str, Any], fmt: str, header_date: str) -> Path:
+    stat_key = _content_stat_key(content_path) if content_path else None
+    key = json.dumps({
+        "v": _PDF_RENDER_VERSION,
+        "display": display,
+        "pdf": pdf_meta,
+        "fmt": fmt,
+        "date": header_date,
+        # Guards against edits made behind the app's back (e.g. sync) without a rev bump
+        "stat": list(stat_key) if stat_key else None,
+    }, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+    return PDF_CACHE_DIR / f"{Path(str(meta.get('id'))).name}-{int(meta.get('rev', 0))}-{digest}.pdf"
+
+
+def _pdf_cache_store(path: Path, data: bytes) -> None:
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    note_id, rev, _ = path.stem.rsplit("-", 2)
+    with _pdf_cache_lock:
+        entries = []
+        total = 0
+        for p in PDF_CACHE_DIR.glob("*.pdf"):
+            try:
+                p_id, p_rev, _ = p.stem.rsplit("-", 2)
+                st = p.stat()
+            except (ValueError, OSError):
+                continue
+            if p_id == note_id and int(p_rev) < int(rev):
+                # Older revisions of this note can't be requested again
+                p.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()
+        for _, size, p in entries:
+            if total <= PDF_CACHE_MAX_BYTES or p == path:
+                continue
+            p.unlink(missing_ok=True)
+            total -= size
+
+
 @app.get("/api/notes/<note_id>/pdf")
 def api_note_pdf(note_id: str):
     """
     Generate a simple PDF for a note and return it as a download.
+    Served from the PDF cache when the note and its PDF settings are unchanged.
     """
     ensure_dirs()
     content_path, meta_path, deleted = find_note_files_by_id(note_id)
@@ -1568,85 +4486,322 @@ def api_note_pdf(note_id: str):
     filename = (meta.get("filename") or f"{note_id}.md").strip()
     display = title if title else filename
 
-    safe_base = re.sub(r'[^A-Za-z0-9._-]+', "_", _transliterate(display))[:120].strip("_") or "note"
-    out_name = safe_base + ".pdf"
-
-    content = ""
-    if content_path and content_path.exists():
-        content = read_note_content(content_path, meta)
+    out_name = _pdf_safe_name(display) + ".pdf"
 
     fmt = (request.args.get("format") or "md").strip().lower()
     if fmt not in ("md", "txt"):
         fmt = "md"
 
     pdf_meta = _normalize_pdf_meta(meta.get("pdf", {}))
-    author = (pdf_meta.get("author") or "").strip()
-    company = (pdf_meta.get("company") or "").strip()
-    version = (pdf_meta.get("version") or "").strip()
-    date_str = (pdf_meta.get("date") or "").strip()
-    use_export_date = bool(pdf_meta.get("use_export_date", True))
-    tlp = (pdf_meta.get("tlp") or "AMBER").strip().upper()
-    header_left = display
-    header_right_parts: List[str] = []
-    if company:
-        header_right_parts.append(company)
-    if author:
-        header_right_parts.append(author)
-    if version:
-        header_right_parts.append(version if version.lower().startswith("v") else f"v{version}")
-    if use_export_date:
-        header_right_parts.append(datetime.now().date().isoformat())
-    elif date_str:
-        header_right_parts.append(date_str)
-    header_right = " • ".join([p for p in header_right_parts if p])
-    tlp_label = f"TLP: {tlp}"
-    tlp_fill, tlp_text, tlp_border = _tlp_style(tlp)
+    header_date = _pdf_header_date(pdf_meta)
+
+    cache_path = None
+    if not meta.get("encrypted") and PDF_CACHE_MAX_BYTES > 0:
+        cache_path = _pdf_cache_path(meta, content_path, display, pdf_meta, fmt, header_date)
+        try:
+            os.utime(cache_path)
+            log.info("PDF served from cache", extra={"event": "pdf_cache_hit", "extra_data": {"note_id": note_id}})
+            return send_file(cache_path, mimetype="application/pdf", as_attachment=True, download_name=out_name)
+        except FileNotFoundError:
+            pass
+
+    content = ""
+    if content_path and content_path.exists():
+        content = read_note_content(content_path, meta)
 
-    buf = io.BytesIO()
     try:
-        doc = SimpleDocTemplate(
-            buf,
-            pagesize=A4,
-            leftMargin=18 * mm,
-            rightMargin=18 * mm,
-            topMargin=24 * mm,
-            bottomMargin=20 * mm,
-            title=display,
-        )
-        flow: List[Any] = []
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle("PdfTitle", parent=styles["Heading1"], fontSize=16, spaceAfter=10)
-        flow.append(Paragraph(display, title_style))
-        if fmt == "txt":
-            code_style = styles["Code"]
-            max_width = A4[0] - (18 * mm * 2)
-            wrapped = "\n".join(_pdf_wrap_lines(content or "", None, max_width, code_style.fontName, code_style.fontSize))
-            flow.append(Preformatted(wrapped, code_style))
-        else:
-            flow.extend(_markdown_to_flowables(content or ""))
-        canvas_maker = _make_numbered_canvas(
-            header_left,
-            header_right,
-            "Page {page} of {pages}",
-            footer_left_label=tlp_label,
-            footer_left_fill=tlp_fill,
-            footer_left_text=tlp_text,
-            footer_left_border=tlp_border,
-        )
-        doc.build(flow, canvasmaker=canvas_maker)
-        buf.seek(0)
+        data = _render_note_pdf(content, display, pdf_meta, fmt, header_date)
     except Exception as e:
         log.warning("PDF generation failed", extra={"event": "pdf_failed", "extra_data": {"note_id": note_id, "error": str(e)}})
         return jsonify({"error": "pdf_failed", "detail": str(e)}), 500
 
+    if cache_path is not None:
+        try:
+            _pdf_cache_store(cache_path, data)
+        except OSError as e:
+            log.warning("PDF cache write failed", extra={"event": "pdf_cache_error", "extra_data": {"note_id": note_id, "error": str(e)}})
+
     log.info("PDF generated", extra={"event": "pdf_generated", "extra_data": {"note_id": note_id, "title": display}})
     return send_file(
-        buf,
+        io.BytesIO(data),
         mimetype="application/pdf",
         as_attachment=True,
         download_name=out_name,
     )
 
+# ---------- Bulk PDF export ----------
+# Layout is CPU-bound and holds the GIL, so bulk exports render in a process pool.
+# The spawn context keeps workers free of the server's threads and file locks.
+PDF_EXPORT_WORKERS = int(os.environ.get("PDF_EXPORT_WORKERS", "0")) or (os.cpu_count() or 2)
+_TLP_ORDER = ["CLEAR", "GREEN", "AMBER", "AMBER+STRICT", "RED"]
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _reset_pdf_pool() -> None:
+    """Drop a pool whose worker died so the next export starts a fresh one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+
+class _TocDocTemplate(SimpleDocTemplate):
+    """Registers flowables tagged with ``_toc_level`` in the TOC and the PDF outline."""
+
+    def afterFlowable(self, flowable):
+        level = getattr(flowable, "_toc_level", None)
+        if level is None:
+            return
+        text = flowable.getPlainText()
+        key = f"toc-{id(flowable)}"
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(text, key, level=level, closed=level > 0)
+        # The outline takes plain text; TOC entries are parsed as Paragraph markup
+        self.notify("TOCEntry", (level, xml_escape(text), self.page, key))
+
+
+def _render_combined_pdf(label: str, groups: List[Tuple[str, List[Tuple[str, str]]]], fmt: str,
+                         header_date: str, tlp: str) -> bytes:
+    """One PDF with a table of contents; groups are (heading, [(note title, content)])."""
+    ctx = _render_context()
+    title_style, group_style, note_style, code_style = ctx.title, ctx.group, ctx.note, ctx.code
+    max_width = A4[0] - (18 * mm * 2)
+
+    toc = TableOfContents()
+    toc.levelStyles = ctx.toc_levels
+    flow: List[Any] = [Paragraph(xml_escape(label), title_style), Paragraph("Contents", ctx.styles["Heading2"]), toc]
+    for heading, notes in groups:
+        flow.append(PageBreak())
+        p = Paragraph(xml_escape(heading), group_style)
+        p._toc_level = 0
+        flow.append(p)
+        for i, (display, content) in enumerate(notes):
+            if i:
+                flow.append(PageBreak())
+            p = Paragraph(xml_escape(display), note_style)
+            p._toc_level = 1
+            flow.append(p)
+            if fmt == "txt":
+                wrapped = "\n".join(_pdf_wrap_lines(content or "", None, max_width, code_style.fontName, code_style.fontSize))
+                flow.append(Preformatted(wrapped, code_style))
+            else:
+                flow.extend(_markdown_to_flowables(content or ""))
+
+    tlp_fill, tlp_text, tlp_border = _tlp_style(tlp)
+    buf = io.BytesIO()
+    doc = _TocDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=18 * mm,
+        rightMargin=18 * mm,
+        topMargin=24 * mm,
+        bottomMargin=20 * mm,
+        title=label,
+    )
+    canvas_maker = _make_numbered_canvas(
+        label,
+        header_date,
+        "Page {page} of {pages}",
+        footer_left_label=f"TLP: {tlp}",
+        footer_left_fill=tlp_fill,
+        footer_left_text=tlp_text,
+        footer_left_border=tlp_border,
+    )
+    doc.multiBuild(flow, canvasmaker=canvas_maker)
+    return buf.getvalue()
+
+
+def _select_pdf_export(body: Dict[str, Any]) -> Tuple[str, List[Tuple[str, List[Dict[str, Any]]]]]:
+    """Resolve a bulk export request to (label, [(group heading, [meta])]).
+
+    Accepts ``ids`` (grouped by subject), ``subject`` or ``journal: {year, month?}``
+    (grouped by month). Raises ValueError for a malformed request.
+    """
+    metas = list_metas(include_deleted=False)
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    if body.get("journal"):
+        period = body.get("journal") or {}
+        year = str(period.get("year", "")).strip() if isinstance(period, dict) else ""
+        month = str(period.get("month", "")).strip() if isinstance(period, dict) else ""
+        if not re.fullmatch(r"\d{4}", year) or (month and not re.fullmatch(r"\d{2}", month)):
+            raise ValueError("journal needs year (YYYY) and optional month (MM)")
+        dated = []
+        for m in metas:
+            match = _JOURNAL_DATE_RE.match(m.get("title") or "")
+            if (m.get("subject") or "") != "Journal" or not match:
+                continue
+            if match.group(1) != year or (month and match.group(2) != month):
+                continue
+            dated.append((match.group(0), m))
+        for title, m in sorted(dated, key=lambda x: x[0]):
+            groups.setdefault(title[:7], []).append(m)
+        label = f"Journal {year}-{month}" if month else f"Journal {year}"
+        return label, list(groups.items())
+
+    if body.get("subject"):
+        want = str(body.get("subject")).strip().lower()
+        picked = [m for m in metas if (m.get("subject") or "").strip().lower() == want]
+        label = (picked[0].get("subject") or "").strip() if picked else str(body.get("subject")).strip()
+    elif isinstance(body.get("ids"), list):
+        by_id = {m.get("id"): m for m in metas}
+        picked = [by_id[str(i)] for i in body["ids"] if str(i) in by_id]
+        label = "Notes"
+    else:
+        raise ValueError("Provide ids, subject or journal")
+    for m in sorted(picked, key=lambda m: ((m.get("subject") or "").lower(), _search_display_title(m).lower())):
+        groups.setdefault((m.get("subject") or "").strip() or "No subject", []).append(m)
+    return label, list(groups.items())
+
+
+def _pdf_export_job(meta: Dict[str, Any], fmt: str) -> Dict[str, Any]:
+    content_path = content_path_for_meta(meta)
+    content = ""
+    if content_path and content_path.exists():
+        content = read_note_content(content_path, meta)
+    pdf_meta = _normalize_pdf_meta(meta.get("pdf", {}))
+    return {
+        "meta": meta,
+        "content_path": content_path,
+        "display": _search_display_title(meta),
+        "content": content,
+        "pdf_meta": pdf_meta,
+        "header_date": _pdf_header_date(pdf_meta),
+    }
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink for zipfile; the response generator drains it after each entry."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _stream_pdf_zip(label: str, groups: List[Tuple[str, List[Dict[str, Any]]]], fmt: str):
+    stream = _ZipStream()
+    zf = zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED)
+    used: set = set()
+
+    def arcname(group: str, display: str, ext: str) -> str:
+        base = f"{_pdf_safe_name(group)}/{_pdf_safe_name(display)}"
+        name, n = base + ext, 1
+        while name in used:
+            n += 1
+            name = f"{base}-{n}{ext}"
+        used.add(name)
+        return name
+
+    pool = _get_pdf_pool()
+    futures = {}
+    try:
+        for group, metas in groups:
+            for meta in metas:
+                job = _pdf_export_job(meta, fmt)
+                cache_path = None
+                if not meta.get("encrypted") and PDF_CACHE_MAX_BYTES > 0:
+                    cache_path = _pdf_cache_path(meta, job["content_path"], job["display"], job["pdf_meta"], fmt, job["header_date"])
+                    try:
+                        data = cache_path.read_bytes()
+                        os.utime(cache_path)
+                        zf.writestr(arcname(group, job["display"], ".pdf"), data)
+                        yield stream.drain()
+                        continue
+                    except FileNotFoundError:
+                        pass
+                fut = pool.submit(_render_note_pdf, job["content"], job["display"], job["pdf_meta"], fmt, job["header_date"])
+                futures[fut] = (group, job, cache_path)
+        for fut in as_completed(futures):
+            group, job, cache_path = futures[fut]
+            try:
+                data = fut.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _reset_pdf_pool()
+                log.warning("PDF generation failed", extra={"event": "pdf_failed", "extra_data": {"note_id": job["meta"].get("id"), "error": str(e)}})
+                zf.writestr(arcname(group, job["display"], ".error.txt"), f"PDF generation failed: {e}\n")
+                yield stream.drain()
+                continue
+            if cache_path is not None:
+                try:
+                    _pdf_cache_store(cache_path, data)
+                except OSError:
+                    pass
+            zf.writestr(arcname(group, job["display"], ".pdf"), data)
+            yield stream.drain()
+    finally:
+        for fut in futures:
+            fut.cancel()
+    zf.close()
+    yield stream.drain()
+    log.info("Bulk PDF export finished", extra={"event": "pdf_bulk_export", "extra_data": {"label": label, "mode": "zip", "count": len(used)}})
+
+
+@app.route("/api/export/pdf", methods=["POST"])
+def api_export_pdf():
+    """
+    Bulk PDF export of selected notes, a subject or a journal period.
+    mode=zip streams a ZIP of per-note PDFs as they finish rendering;
+    mode=combined returns one PDF with a table of contents.
+    """
+    ensure_dirs()
+    body = request.get_json(silent=True) or {}
+    mode = str(body.get("mode", "zip")).strip().lower()
+    if mode not in ("zip", "combined"):
+        return jsonify({"error": "mode must be zip or combined"}), 400
+    fmt = str(body.get("format", "md")).strip().lower()
+    if fmt not in ("md", "txt"):
+        fmt = "md"
+    try:
+        label, groups = _select_pdf_export(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not groups:
+        return jsonify({"error": "No matching notes"}), 404
+
+    ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    if mode == "zip":
+        return Response(
+            _stream_pdf_zip(label, groups, fmt),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{_pdf_safe_name(label)}_pdf_{ts}.zip"'},
+        )
+
+    jobs = [(heading, [_pdf_export_job(m, fmt) for m in metas]) for heading, metas in groups]
+    tlp = max((j["pdf_meta"]["tlp"] for _, js in jobs for j in js), key=_TLP_ORDER.index, default="AMBER")
+    header_date = datetime.now().date().isoformat()
+    payload = [(heading, [(j["display"], j["content"]) for j in js]) for heading, js in jobs]
+    try:
+        data = _get_pdf_pool().submit(_render_combined_pdf, label, payload, fmt, header_date, tlp).result()
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reset_pdf_pool()
+        log.warning("PDF generation failed", extra={"event": "pdf_failed", "extra_data": {"label": label, "error": str(e)}})
+        return jsonify({"error": "pdf_failed", "detail": str(e)}), 500
+    log.info("Bulk PDF export finished", extra={"event": "pdf_bulk_export", "extra_data": {"label": label, "mode": "combined", "count": sum(len(js) for _, js in jobs)}})
+    return send_file(io.BytesIO(data), mimetype="application/pdf", as_attachment=True, download_name=f"{_pdf_safe_name(label)}_{ts}.pdf")
+
+
 # ---------- Journal endpoints ----------
 import calendar
 
@@ -1755,6 +4910,229 @@ def api_journal_aggregate():
     return jsonify({"period": period, "entries": entries})
 
 
+# ---------- Filesystem watcher ----------
+# Files can change behind the app's back: the rclone sidecar pulls into
+# NOTES_DIR, the native engine writes pulled files, people edit notes by hand.
+# A thread watches NOTES_DIR, JOURNAL_DIR and TRASH_DIR with inotify (Linux,
+# through libc; elsewhere the watcher is simply off), collects events until the
+# directories have been quiet for WATCH_DEBOUNCE_SECONDS and then:
+#  - re-reads only the sidecars named in the batch into the index
+#    (index_apply_sidecars); the app's own saves are already in the index and
+#    yield nothing;
+#  - refreshes the encrypted search index for changed content files;
+#  - records a change event per affected note, which clients poll through
+#    GET /api/changes?since=<seq>.
+# A content file changed without its sidecar (a manual edit) gets a new rev, so
+# clients with pending edits merge with it, and is reported as a "content" change. On queue overflow the batch
+# falls back to an incremental rebuild_index() and a "rescan" event.
+WATCH_FS = os.environ.get("WATCH_FS", "1") == "1"
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get("WATCH_DEBOUNCE_SECONDS", "0.5"))
+WATCH_CHANGES_KEEP = 1000
+_WATCH_EXTS = (".json", ".md", ".txt", ".yaml", ".yml")
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+_changes_lock = threading.Lock()
+_changes: "deque[Dict[str, Any]]" = deque(maxlen=WATCH_CHANGES_KEEP)
+_changes_seq = 0
+_watch_thread: Optional[threading.Thread] = None
+
+
+def record_change(note_id: Optional[str], kind: str) -> None:
+    global _changes_seq
+    with _changes_lock:
+        _changes_seq += 1
+        ev: Dict[str, Any] = {"seq": _changes_seq, "kind": kind, "time": utc_now_iso()}
+        if note_id:
+            ev["id"] = note_id
+        _changes.append(ev)
+
+
+def changes_since(since: int) -> Dict[str, Any]:
+    """Events after `since`; `reset` when some were already dropped (or seq restarted)."""
+    with _changes_lock:
+        oldest = _changes[0]["seq"] if _changes else _changes_seq + 1
+        events = [e for e in _changes if e["seq"] > since]
+        return {"seq": _changes_seq, "changes": events, "reset": since > _changes_seq or since + 1 < oldest}
+
+
+class _Inotify:
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, Path] = {}
+
+    def add(self, path: Path) -> None:
+        import ctypes
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {path} failed")
+        self.dirs[wd] = path
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[Optional[Path], int]]:
+        """(file path, mask) per event; path None for queue events. [] on timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        buf = os.read(self.fd, 64 * 1024)
+        out = []
+        off = 0
+        while off + 16 <= len(buf):
+            wd, mask, _cookie, n = struct.unpack_from("iIII", buf, off)
+            name = buf[off + 16:off + 16 + n].rstrip(b"\0")
+            off += 16 + n
+            base = self.dirs.get(wd)
+            if mask & _IN_IGNORED:
+                self.dirs.pop(wd, None)
+                log.warning("Watched directory gone", extra={"event": "watch_dir_gone", "extra_data": {"dir": str(base)}})
+                continue
+            out.append((base / os.fsdecode(name) if base is not None and name else None, mask))
+        return out
+
+
+def watch_apply(paths: set) -> int:
+    """Apply one quiet batch of changed note files; returns how many change events it recorded."""
+    sidecars = {p.with_suffix(".json") for p in paths}
+    changed = index_apply_sidecars(sorted(sidecars))
+    if changed is None:
+        rebuild_index()
+        record_change(None, "rescan")
+        return 1
+    for note_id, kind in changed:
+        record_change(note_id, kind)
+    seen = {i for i, _ in changed}
+    events = len(changed)
+    for p in paths:
+        if p.suffix == ".json" or p.parent == TRASH_DIR:
+            continue
+        sidecar = p.with_suffix(".json")
+        try:
+            meta = load_json(sidecar)
+        except Exception:
+            continue
+        if not p.exists():
+            continue
+        enc_index_refresh(meta, p)
+        if sidecar not in paths and meta.get("id") not in seen and _watch_bump_rev(p, sidecar):
+            record_change(meta.get("id"), "content")
+            events += 1
+    return events
+
+
+def _watch_bump_rev(content_path: Path, meta_path: Path) -> bool:
+    """Give a content file edited outside the app a new rev, like a save would.
+
+    Without it, a tab with unsaved edits would save against the unchanged rev
+    and overwrite the outside edit instead of merging with it. The previous
+    revision is recorded first (when still known), so it serves as merge base.
+    False if the content is what the current rev already holds (our own write).
+    """
+    with _content_lock:
+        try:
+            meta = load_json(meta_path)
+            content = read_note_content(content_path, meta) if content_path.stat().st_size <= LARGE_NOTE_BYTES else None
+        except Exception:
+            return False
+        note_id = str(meta.get("id") or "")
+        rev = int(meta.get("rev", 0))
+        base = merge_base(note_id, rev) if content is not None else None
+        if content is not None and base == content:
+            return False
+        meta["rev"] = rev + 1
+        meta["updated"] = utc_now_iso()
+        save_json(meta_path, meta)
+        update_index_meta(meta)
+        if content is not None:
+            try:
+                if base is not None:
+                    history_record(dict(meta, rev=rev), base, sealed=True)
+                history_record(meta, content, sealed=True, ts=content_path.stat().st_mtime)
+            except Exception:
+                log.warning("History record failed", extra={"event": "history_record_failed", "extra_data": {"note_id": note_id}}, exc_info=True)
+            remember_merge_base(note_id, rev + 1, content)
+    return True
+
+
+def _watch_loop(ino: _Inotify) -> None:
+    pending: set = set()
+    overflow = False
+    quiet_at = 0.0
+    while True:
+        timeout = None if not (pending or overflow) else max(0.0, quiet_at - time.monotonic())
+        events = ino.read(timeout)
+        if events:
+            for path, mask in events:
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                elif path is not None and not path.name.startswith(".") and path.suffix in _WATCH_EXTS:
+                    pending.add(path)
+            quiet_at = time.monotonic() + WATCH_DEBOUNCE_SECONDS
+            continue
+        batch, pending = pending, set()
+        try:
+            if overflow:
+                overflow = False
+                rebuild_index()
+                record_change(None, "rescan")
+            elif batch and watch_apply(batch):
+                log.info("External changes applied", extra={"event": "watch_applied", "extra_data": {"files": len(batch)}})
+        except Exception:
+            log.warning("Watcher batch failed", extra={"event": "watch_error"}, exc_info=True)
+
+
+def start_watcher() -> None:
+    global _watch_thread
+    if _watch_thread is not None or not WATCH_FS:
+        return
+    try:
+        ino = _Inotify()
+        for d in (NOTES_DIR, JOURNAL_DIR, TRASH_DIR):
+            ino.add(d)
+    except (OSError, AttributeError) as e:
+        # No inotify (not Linux, limits reached): external changes are picked up by rebuilds only
+        log.warning("Filesystem watcher unavailable", extra={"event": "watch_unavailable", "extra_data": {"error": str(e)}})
+        return
+    _watch_thread = threading.Thread(target=_watch_loop, args=(ino,), name="fs-watch", daemon=True)
+    _watch_thread.start()
+
+
+@app.route("/api/changes", methods=["GET"])
+def api_changes():
+    try:
+        since = int(request.args.get("since", "0"))
+    except ValueError:
+        return jsonify({"error": "Invalid since"}), 400
+    return jsonify(changes_since(since))
+
+
+def _warm_index() -> None:
+    try:
+        if load_index() is None:
+            rebuild_index()
+    except Exception:
+        log.warning("Index warm-up failed", extra={"event": "index_warm_failed"}, exc_info=True)
+
+
+def startup() -> None:
+    """One-time process start: directories and migrations, then background work."""
+    ensure_dirs()
+    # Parse (or rebuild) the index off the request path, so the first listing is served from memory
+    threading.Thread(target=_warm_index, name="index-warm", daemon=True).start()
+    start_sync_engine()
+    start_watcher()
+
+
 if __name__ == "__main__":
+    startup()
     port = int(os.environ.get("PORT", "8060"))
     app.run(host="0.0.0.0", port=port)
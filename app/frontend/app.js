@@ -73,6 +73,7 @@ function renderTabsSafe(){
   const elSelectAll = $("selectAll");
   const elSelectNone = $("selectNone");
   const elDownloadSelected = $("downloadSelected");
+  const elPdfSelected = $("pdfSelected");
   const elDeleteSelected = $("deleteSelected");
   const elPreviewToggle = $("previewToggle");
   const elPreviewFormat = $("previewFormat");
@@ -86,6 +87,10 @@ function renderTabsSafe(){
   const elFileView = $("fileViewToggle");
   const elUndo = $("undoBtn");
   const elRedo = $("redoBtn");
+  const elLargeBar = $("largeNoteBar");
+  const elLargeRange = $("largeRange");
+  const elLargePrev = $("largePrev");
+  const elLargeNext = $("largeNext");
 
   const elPreview = $("preview");
   const elEditor = $("editor");
@@ -98,6 +103,9 @@ function renderTabsSafe(){
   const elSaveState = $("saveState");
   const elSaveTime = $("saveTime");
 
+  const SNCore = window.SNCore;
+  const { escapeHtml } = SNCore;
+
   let notes = [];
 
   // Tabs: ALWAYS open a new tab when clicking a note in the list.
@@ -112,6 +120,7 @@ function renderTabsSafe(){
   let isTyping = false;
   let saveTimer = null;
   let pollTimer = null;
+  let changesSeq = null;
 
   let previewMode = false;
   let previewFormat = (localStorage.getItem("sn_preview_format") || "md");
@@ -169,10 +178,6 @@ let deleteInProgress = false;
     updateToc();
   }
 
-  function escapeRegExp(s){
-    return (s || "").replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
-  }
-
   function isWordChar(ch){
     return /[A-Za-z0-9_]/.test(ch || "");
   }
@@ -217,6 +222,16 @@ let deleteInProgress = false;
 
   function updateEditorValueAndSchedule(value){
     elEditor.value = value;
+    editorChangedProgrammatically();
+  }
+
+  // Replace text[start:end] as a single edit, leaving the rest of the value alone.
+  function spliceEditorAndSchedule(start, end, insert){
+    elEditor.setRangeText(insert, start, end, "end");
+    editorChangedProgrammatically();
+  }
+
+  function editorChangedProgrammatically(){
     if(previewMode && elPreview){ renderPreview(); }
     const t = getActiveTab();
     if(!t) return;
@@ -236,100 +251,311 @@ let deleteInProgress = false;
     return { matchCase, wholeWord, query };
   }
 
-  function computeMatches(text, query, matchCase, wholeWord){
-    if(!query) return [];
-    const flags = matchCase ? "g" : "gi";
-    const pattern = wholeWord ? `\\b${escapeRegExp(query)}\\b` : escapeRegExp(query);
-    const re = new RegExp(pattern, flags);
-    const matches = [];
-    let m;
-    while((m = re.exec(text)) !== null){
-      if(m[0].length === 0){
-        re.lastIndex += 1;
-        continue;
+  // The highlight layers mirror the editor text in block chunks cut at line
+  // breaks. Edits only rebuild the chunks they touch, and match spans are only
+  // rendered into the chunks around the viewport; the rest stay plain text.
+  const HL_CHUNK_LINES = 200;
+  let hlText = null;
+  let hlChunks = [];
+  let hlMarked = new Set();
+  let hlRange = [0, 0];
+
+  function splitHlChunks(text, from, to){
+    const out = [];
+    let start = from;
+    let lines = 0;
+    let i = from;
+    while(i < to){
+      const nl = text.indexOf("\n", i);
+      i = (nl === -1 || nl >= to) ? to : nl + 1;
+      lines++;
+      if(lines >= HL_CHUNK_LINES || i >= to){
+        out.push({ start, end: i });
+        start = i;
+        lines = 0;
       }
-      matches.push({ start: m.index, end: m.index + m[0].length });
     }
-    return matches;
+    if(!out.length) out.push({ start: from, end: to });
+    return out;
   }
 
-  function escapeForHighlight(s){
-    return (s || "").replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+  function makeHlChunk(c, text){
+    const plain = text.slice(c.start, c.end);
+    c.bottom = document.createElement("div");
+    c.bottom.textContent = plain;
+    c.top = document.createElement("div");
+    c.top.textContent = plain;
+    return c;
+  }
+
+  function hlChunkAt(pos){
+    let lo = 0;
+    let hi = hlChunks.length - 1;
+    while(lo < hi){
+      const mid = (lo + hi + 1) >> 1;
+      if(hlChunks[mid].start <= pos) lo = mid; else hi = mid - 1;
+    }
+    return lo;
+  }
+
+  function clearHighlightOverlay(){
+    if(hlText === null) return;
+    hlText = null;
+    hlChunks = [];
+    hlMarked = new Set();
+    hlRange = [0, 0];
+    elEditorHighlight.innerHTML = "";
+    if(elEditorHighlightTop) elEditorHighlightTop.innerHTML = "";
+  }
+
+  function syncHighlightText(text){
+    if(hlText === text) return;
+    if(hlText === null){
+      hlChunks = splitHlChunks(text, 0, text.length).map(c => makeHlChunk(c, text));
+      const inner = document.createElement("div");
+      inner.className = "editor-highlight-inner";
+      const topInner = document.createElement("div");
+      topInner.className = "editor-highlight-top-inner";
+      for(const c of hlChunks){
+        inner.appendChild(c.bottom);
+        topInner.appendChild(c.top);
+      }
+      elEditorHighlight.replaceChildren(inner);
+      if(elEditorHighlightTop) elEditorHighlightTop.replaceChildren(topInner);
+      hlText = text;
+      hlMarked = new Set();
+      syncEditorHighlightScroll();
+      return;
+    }
+    const old = hlText;
+    const pre = commonPrefixLength(old, text);
+    const suf = commonSuffixLength(old, text, Math.min(old.length, text.length) - pre);
+    const delta = text.length - old.length;
+    const a = hlChunkAt(pre);
+    const b = hlChunkAt(old.length - suf);
+    const fresh = splitHlChunks(text, hlChunks[a].start, hlChunks[b].end + delta).map(c => makeHlChunk(c, text));
+    const before = hlChunks[b + 1] || null;
+    const parentBottom = hlChunks[a].bottom.parentNode;
+    const parentTop = hlChunks[a].top.parentNode;
+    for(const c of fresh){
+      parentBottom.insertBefore(c.bottom, before ? before.bottom : null);
+      if(parentTop) parentTop.insertBefore(c.top, before ? before.top : null);
+    }
+    for(let i = a; i <= b; i++){
+      hlChunks[i].bottom.remove();
+      hlChunks[i].top.remove();
+      hlMarked.delete(hlChunks[i]);
+    }
+    for(let i = b + 1; i < hlChunks.length; i++){
+      hlChunks[i].start += delta;
+      hlChunks[i].end += delta;
+    }
+    hlChunks.splice(a, b - a + 1, ...fresh);
+    hlText = text;
+  }
+
+  // Chunk index range [lo, hi) covering the viewport plus a screen either side.
+  function visibleHlRange(){
+    const view = elEditor.clientHeight || 600;
+    const top = elEditor.scrollTop - view;
+    const bottom = elEditor.scrollTop + 2 * view;
+    let lo = 0;
+    let hi = hlChunks.length - 1;
+    while(lo < hi){
+      const mid = (lo + hi + 1) >> 1;
+      if(hlChunks[mid].bottom.offsetTop <= top) lo = mid; else hi = mid - 1;
+    }
+    let end = lo + 1;
+    while(end < hlChunks.length && hlChunks[end].bottom.offsetTop < bottom) end++;
+    return [lo, end];
+  }
+
+  function applyHighlights(st, range){
+    const keep = new Set();
+    for(let i = range[0]; i < range[1]; i++){
+      const c = hlChunks[i];
+      c.bottom.innerHTML = SNCore.buildHighlightSlice(hlText, c.start, c.end, st.ranges, st.current, false);
+      if(elEditorHighlightTop){
+        c.top.innerHTML = SNCore.buildHighlightSlice(hlText, c.start, c.end, st.ranges, st.current, true);
+      }
+      keep.add(c);
+    }
+    for(const c of hlMarked){
+      if(keep.has(c)) continue;
+      const plain = hlText.slice(c.start, c.end);
+      c.bottom.textContent = plain;
+      c.top.textContent = plain;
+    }
+    hlMarked = keep;
+    hlRange = range;
   }
 
-  function buildTopHighlightHtml(text, matches, currentIdx){
-    if(!matches.length) return "";
-    let out = "";
-    let last = 0;
-    for(let i = 0; i < matches.length; i++){
-      const m = matches[i];
-      out += escapeForHighlight(text.slice(last, m.start));
-      const cls = i === currentIdx ? "hl-current-text" : "hl-text";
-      out += `<span class="${cls}">${escapeForHighlight(text.slice(m.start, m.end))}</span>`;
-      last = m.end;
-    }
-    out += escapeForHighlight(text.slice(last));
-    return out;
+  let hlViewportCheckQueued = false;
+  function checkHighlightViewport(){
+    if(hlText === null || hlViewportCheckQueued) return;
+    hlViewportCheckQueued = true;
+    requestAnimationFrame(() => {
+      hlViewportCheckQueued = false;
+      if(hlText === null) return;
+      const range = visibleHlRange();
+      if(range[0] !== hlRange[0] || range[1] !== hlRange[1]) requestFindRefresh();
+    });
+  }
+
+  // Preview, TOC and find jobs for large notes run in editor-worker.js so typing
+  // never waits on them; the worker keeps its own copy of the text and receives
+  // only the changed range per edit. Small notes, and browsers without workers,
+  // compute synchronously with the same editor-core.js functions.
+  const CORE_WORKER_MIN_CHARS = 20000;
+  let coreWorker = null;
+  let coreWorkerBroken = false;
+  let coreWorkerText = null;
+  const coreJobSeq = {};
+  const coreJobPending = {};
+
+  const coreSyncCache = {};
+  function runCoreJobSync(kind, args, text){
+    return SNCore.jobs[kind](text, args, coreSyncCache);
   }
 
-  function buildHighlightHtml(text, matches, currentIdx){
-    if(!matches.length){
-      return escapeForHighlight(text);
+  function getCoreWorker(){
+    if(coreWorker || coreWorkerBroken) return coreWorker;
+    if(typeof Worker === "undefined"){
+      coreWorkerBroken = true;
+      return null;
     }
-    let out = "";
-    let last = 0;
-    for(let i = 0; i < matches.length; i++){
-      const m = matches[i];
-      out += escapeForHighlight(text.slice(last, m.start));
-      const cls = i === currentIdx ? "hl-current" : "hl";
-      const id = i === currentIdx ? ' id="hl-active"' : "";
-      out += `<span class="${cls}"${id}>${escapeForHighlight(text.slice(m.start, m.end))}</span>`;
-      last = m.end;
-    }
-    out += escapeForHighlight(text.slice(last));
-    return out;
+    try{
+      coreWorker = new Worker("/static/editor-worker.js");
+    }catch(e){
+      coreWorkerBroken = true;
+      return null;
+    }
+    coreWorker.onmessage = (e) => {
+      const msg = e.data || {};
+      const job = coreJobPending[msg.kind];
+      if(!job || job.seq !== msg.seq) return;
+      delete coreJobPending[msg.kind];
+      if(msg.error){
+        dlog("editor worker job failed", msg.kind, msg.error);
+        job.onResult(runCoreJobSync(msg.kind, job.args, job.text));
+        return;
+      }
+      job.onResult(msg.result);
+    };
+    coreWorker.onerror = (e) => {
+      dlog("editor worker failed", e && e.message);
+      coreWorkerBroken = true;
+      try{ coreWorker.terminate(); }catch(_e){}
+      coreWorker = null;
+      coreWorkerText = null;
+      // Finish whatever was in flight on the main thread
+      for(const kind of Object.keys(coreJobPending)){
+        const job = coreJobPending[kind];
+        delete coreJobPending[kind];
+        job.onResult(runCoreJobSync(kind, job.args, job.text));
+      }
+    };
+    return coreWorker;
   }
 
-  function getCurrentMatchIndex(matches){
-    const selStart = elEditor.selectionStart || 0;
-    const selEnd = elEditor.selectionEnd || 0;
-    let idx = matches.findIndex(m => m.start === selStart && m.end === selEnd);
-    if(idx === -1){
-      idx = matches.findIndex(m => m.start >= selStart);
+  function commonPrefixLength(a, b){
+    const max = Math.min(a.length, b.length);
+    let i = 0;
+    // Skip equal chunks first; slice comparison is far cheaper than a char loop
+    while(i + 4096 <= max && a.slice(i, i + 4096) === b.slice(i, i + 4096)) i += 4096;
+    while(i < max && a.charCodeAt(i) === b.charCodeAt(i)) i++;
+    return i;
+  }
+
+  function commonSuffixLength(a, b, max){
+    let i = 0;
+    while(i + 4096 <= max && a.slice(a.length - i - 4096, a.length - i) === b.slice(b.length - i - 4096, b.length - i)) i += 4096;
+    while(i < max && a.charCodeAt(a.length - 1 - i) === b.charCodeAt(b.length - 1 - i)) i++;
+    return i;
+  }
+
+  function pushCoreText(w, text){
+    if(text === coreWorkerText) return;
+    if(coreWorkerText === null){
+      w.postMessage({ type: "set", text });
+    } else {
+      const old = coreWorkerText;
+      const pre = commonPrefixLength(old, text);
+      const suf = commonSuffixLength(old, text, Math.min(old.length, text.length) - pre);
+      w.postMessage({ type: "splice", start: pre, end: old.length - suf, insert: text.slice(pre, text.length - suf) });
+    }
+    coreWorkerText = text;
+  }
+
+  // Run a job against `text`; onResult only fires for the newest job of a kind.
+  function runCoreJob(kind, args, text, onResult){
+    const seq = (coreJobSeq[kind] || 0) + 1;
+    coreJobSeq[kind] = seq;
+    const w = text.length >= CORE_WORKER_MIN_CHARS ? getCoreWorker() : null;
+    if(!w){
+      delete coreJobPending[kind];
+      onResult(runCoreJobSync(kind, args, text));
+      return;
     }
-    return idx === -1 ? 0 : idx;
+    pushCoreText(w, text);
+    coreJobPending[kind] = { seq, args, text, onResult };
+    w.postMessage({ type: "job", kind, seq, args });
   }
 
-  function setHighlightContent(html, topHtml){
-    elEditorHighlight.innerHTML = `<div class="editor-highlight-inner">${html}</div>`;
-    if(elEditorHighlightTop){
-      elEditorHighlightTop.innerHTML = topHtml
-        ? `<div class="editor-highlight-top-inner">${topHtml}</div>`
-        : "";
+  function cancelCoreJob(kind){
+    coreJobSeq[kind] = (coreJobSeq[kind] || 0) + 1;
+    if(coreJobPending[kind]){
+      delete coreJobPending[kind];
+      if(coreWorker) coreWorker.postMessage({ type: "cancel", kind });
     }
-    syncEditorHighlightScroll();
   }
 
-  function updateEditorHighlight(){
-    if(!elEditorHighlight) return;
+  // Match count and highlight layers are refreshed together, once per task.
+  let findRefreshQueued = false;
+  function requestFindRefresh(){
+    if(findRefreshQueued) return;
+    findRefreshQueued = true;
+    queueMicrotask(() => {
+      findRefreshQueued = false;
+      refreshFindState();
+    });
+  }
+
+  function refreshFindState(){
+    const countEl = document.getElementById("replace-count");
     const text = elEditor.value || "";
-    const status = document.getElementById("replace-status");
-    if(text.length > 50000){
-      setHighlightContent(escapeForHighlight(text));
-      if(status) status.textContent = "Highlight disabled for large notes.";
-      return;
-    }
     const { matchCase, wholeWord, query } = getReplaceOptions();
     if(!query){
-      setHighlightContent(escapeForHighlight(text));
+      cancelCoreJob("find");
+      if(elEditorHighlight) clearHighlightOverlay();
+      if(countEl) countEl.textContent = "0 matches";
       return;
     }
-    const matches = computeMatches(text, query, matchCase, wholeWord);
-    const curIdx = matches.length ? getCurrentMatchIndex(matches) : -1;
-    setHighlightContent(
-      buildHighlightHtml(text, matches, curIdx),
-      buildTopHighlightHtml(text, matches, curIdx)
-    );
+    let range = [0, 0];
+    let from = 0;
+    let to = 0;
+    if(elEditorHighlight){
+      syncHighlightText(text);
+      range = visibleHlRange();
+      from = hlChunks[range[0]].start;
+      to = hlChunks[range[1] - 1].end;
+    }
+    const args = {
+      query, matchCase, wholeWord, from, to,
+      selStart: elEditor.selectionStart || 0,
+      selEnd: elEditor.selectionEnd || 0,
+    };
+    runCoreJob("find", args, text, (st) => {
+      if(countEl){
+        countEl.textContent = st.total ? `${st.countIdx + 1} of ${st.total} matches` : "0 matches";
+      }
+      if(elEditorHighlight && hlText === text) applyHighlights(st, range);
+    });
+  }
+
+  function updateEditorHighlight(){
+    if(!elEditorHighlight) return;
+    requestFindRefresh();
   }
 
   function syncHighlightGeometry(){
@@ -342,6 +568,7 @@ let deleteInProgress = false;
   function syncEditorHighlightScroll(){
     if(!elEditorHighlight) return;
     syncHighlightGeometry();
+    checkHighlightViewport();
     const tx = `translate(${-elEditor.scrollLeft}px, ${-elEditor.scrollTop}px)`;
     requestAnimationFrame(() => {
       const inner = elEditorHighlight.firstElementChild;
@@ -356,11 +583,17 @@ let deleteInProgress = false;
   function updateToc(){
     if(!elTocPanel || !elTocList) return;
     if(tocOpen !== "on"){
+      cancelCoreJob("toc");
       elTocList.innerHTML = "";
       return;
     }
     const depth = parseInt(elTocDepth?.value || "3", 10);
-    const headings = buildHeadingIndex(elEditor.value || "").filter(h => h.level <= depth);
+    runCoreJob("toc", {}, elEditor.value || "", (index) => {
+      renderTocItems(index.filter(h => h.level <= depth));
+    });
+  }
+
+  function renderTocItems(headings){
     elTocList.innerHTML = "";
     for(const h of headings){
       const item = document.createElement("button");
@@ -382,24 +615,8 @@ let deleteInProgress = false;
   }
 
   function updateReplaceCount(){
-    const countEl = document.getElementById("replace-count");
-    if(!countEl) return;
-    const { matchCase, wholeWord, query } = getReplaceOptions();
-    const text = elEditor.value || "";
-    const matches = computeMatches(text, query, matchCase, wholeWord);
-    const total = matches.length;
-    if(total === 0){
-      countEl.textContent = "0 matches";
-      return;
-    }
-    const selStart = elEditor.selectionStart || 0;
-    const selEnd = elEditor.selectionEnd || 0;
-    let idx = matches.findIndex(m => m.start === selStart && m.end === selEnd);
-    if(idx === -1){
-      idx = matches.findIndex(m => m.start >= selEnd);
-      if(idx === -1) idx = 0;
-    }
-    countEl.textContent = `${idx + 1} of ${total} matches`;
+    if(!document.getElementById("replace-count")) return;
+    requestFindRefresh();
   }
 
   function searchInCurrentNote(fromNext){
@@ -518,10 +735,8 @@ let deleteInProgress = false;
     let didReplace = false;
     if(cmpSelected === cmpQuery && selected.length){
       const replacement = withInput ? withInput.value : "";
-      const newText = text.slice(0, selStart) + replacement + text.slice(selEnd);
-      updateEditorValueAndSchedule(newText);
+      spliceEditorAndSchedule(selStart, selEnd, replacement);
       const caret = selStart + replacement.length;
-      elEditor.setSelectionRange(caret, caret);
       nextStart = caret;
       didReplace = true;
     }
@@ -551,18 +766,27 @@ let deleteInProgress = false;
     if(!query){ if(status) status.textContent = "Enter text to find."; return; }
     const replacement = withInput ? withInput.value : "";
 
-    const flags = matchCase ? "g" : "gi";
-    const pattern = wholeWord ? `\\b${escapeRegExp(query)}\\b` : escapeRegExp(query);
-    const re = new RegExp(pattern, flags);
+    // One scan builds the replaced text between the first and last match, which
+    // then goes into the editor as a single splice. The replacement is literal.
+    const re = SNCore.matchRegExp(query, matchCase, wholeWord);
     const text = elEditor.value || "";
-    const matches = text.match(re);
-    const count = matches ? matches.length : 0;
+    const parts = [];
+    let first = -1;
+    let last = 0;
+    let count = 0;
+    let m;
+    while((m = re.exec(text)) !== null){
+      if(first === -1) first = m.index;
+      else parts.push(text.slice(last, m.index));
+      parts.push(replacement);
+      last = m.index + m[0].length;
+      count++;
+    }
     if(count === 0){
       if(status) status.textContent = "No matches found.";
       return;
     }
-    const newText = text.replace(re, replacement);
-    updateEditorValueAndSchedule(newText);
+    spliceEditorAndSchedule(first, last, parts.join(""));
     if(status) status.textContent = `Replaced ${count} match${count === 1 ? "" : "es"}.`;
     updateReplaceCount();
     updateEditorHighlight();
@@ -744,7 +968,7 @@ let deleteInProgress = false;
       t.rev = meta.rev || t.rev;
     setFileName(meta);
       setStatus("Idle");
-      await loadNotes();
+      patchNoteMeta(meta);
       renderTabs();
       closeRenameModal();
     }catch(e){
@@ -785,6 +1009,131 @@ let deleteInProgress = false;
     });
   }
 
+  // Revision history: list the server-side revisions of the active note, preview
+  // one, and restore it as a new revision.
+  let historyNoteId = null;
+  let historyRev = null;
+
+  async function openHistoryModal(){
+    closeDropdowns();
+    const modal = document.getElementById("history-modal");
+    const t = getActiveTab();
+    if(!modal || !t || t.isAggregate) return;
+    historyNoteId = t.noteId;
+    historyRev = null;
+    const list = document.getElementById("history-list");
+    const preview = document.getElementById("history-preview");
+    const restore = document.getElementById("history-restore");
+    const info = document.getElementById("history-info");
+    list.innerHTML = "";
+    preview.textContent = "Loading...";
+    restore.disabled = true;
+    info.textContent = "";
+    modal.classList.remove("hidden");
+    modal.setAttribute("aria-hidden","false");
+    try{
+      const data = await apiGet(`/api/notes/${encodeURIComponent(t.noteId)}/history`);
+      if(historyNoteId !== t.noteId) return;
+      const revs = data.revisions || [];
+      preview.textContent = revs.length ? "Select a revision." : "No revisions recorded yet.";
+      for(const r of revs){
+        const item = document.createElement("button");
+        item.className = "history-item";
+        item.dataset.rev = String(r.rev);
+        item.textContent = `${fmtTime(r.ts)} · rev ${r.rev} · ${formatBytes(r.size)}`;
+        item.addEventListener("click", () => showHistoryRevision(r.rev));
+        list.appendChild(item);
+      }
+    }catch(e){
+      console.error(e);
+      preview.textContent = "Could not load history.";
+    }
+  }
+
+  function closeHistoryModal(){
+    const modal = document.getElementById("history-modal");
+    if(!modal) return;
+    modal.classList.add("hidden");
+    modal.setAttribute("aria-hidden","true");
+    historyNoteId = null;
+    historyRev = null;
+  }
+
+  async function showHistoryRevision(rev){
+    const noteId = historyNoteId;
+    if(!noteId) return;
+    historyRev = rev;
+    document.querySelectorAll("#history-list .history-item").forEach(el => {
+      el.classList.toggle("active", el.dataset.rev === String(rev));
+    });
+    const preview = document.getElementById("history-preview");
+    const restore = document.getElementById("history-restore");
+    const info = document.getElementById("history-info");
+    restore.disabled = true;
+    preview.textContent = "Loading...";
+    try{
+      const data = await apiGet(`/api/notes/${encodeURIComponent(noteId)}/history/${rev}`);
+      if(historyNoteId !== noteId || historyRev !== rev) return;
+      preview.textContent = data.content || "";
+      info.textContent = `Revision ${rev} · ${fmtTime(data.ts)}`;
+      const t = getActiveTab();
+      restore.disabled = !t || t.noteId !== noteId || rev === t.rev;
+    }catch(e){
+      console.error(e);
+      preview.textContent = "Could not load this revision.";
+    }
+  }
+
+  async function restoreHistoryRevision(){
+    const t = getActiveTab();
+    const rev = historyRev;
+    if(!t || t.noteId !== historyNoteId || rev == null) return;
+    if(elEditor.value !== t.lastLoadedContent && !confirm("Discard unsaved changes and restore this revision?")) return;
+    if(saveTimer){ clearTimeout(saveTimer); saveTimer = null; }
+    isTyping = false;
+    setStatus("Restoring...");
+    try{
+      const res = await apiPost(`/api/notes/${encodeURIComponent(t.noteId)}/history/${rev}/restore`, {});
+      t.rev = res.rev;
+      t.meta = res.meta || t.meta;
+      if(t.large){
+        await loadLargeWindow(t, t.large.offset);
+      } else {
+        t.content = res.content || "";
+        t.lastLoadedContent = t.content;
+        if(t.tabId === activeTabId){
+          elEditor.value = t.content;
+          if(previewMode && elPreview){ renderPreview(); }
+          updateEditorHighlight();
+          updateToc();
+        }
+      }
+      setSaveState("Saved", res.updated);
+      setFileName(t.meta);
+      patchNoteMeta(t.meta);
+      renderTabs();
+      setStatus("Idle");
+      closeHistoryModal();
+    }catch(e){
+      console.error(e);
+      setStatus("Error restoring revision");
+    }
+  }
+
+  function bindHistoryModal(){
+    const modal = document.getElementById("history-modal");
+    if(!modal) return;
+    if(modal.dataset.bound === "1") return;
+    modal.dataset.bound = "1";
+    modal.addEventListener("click", (ev) => {
+      if(ev.target === modal) closeHistoryModal();
+    });
+    const closeBtn = document.getElementById("history-close");
+    if(closeBtn) closeBtn.addEventListener("click", closeHistoryModal);
+    const restoreBtn = document.getElementById("history-restore");
+    if(restoreBtn) restoreBtn.addEventListener("click", restoreHistoryRevision);
+  }
+
   function bindReplaceModal(){
     const panel = document.getElementById("replace-panel");
     if(!panel) return;
@@ -882,10 +1231,6 @@ function fmtTime(iso){
   }
 
   
-  function escapeHtml(s){
-    return s.replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/>/g,"&gt;");
-  }
-
   const CITE_START = "\uE200";
   const CITE_END = "\uE201";
   const CITE_SEP = "\uE202";
@@ -899,181 +1244,6 @@ function fmtTime(iso){
     return replaced.replace(new RegExp(`[${CITE_START}${CITE_SEP}${CITE_END}]`, "g"), "");
   }
 
-  function slugifyHeading(s){
-    return (s || "")
-      .toLowerCase()
-      .replace(/<\/?[^>]+>/g, "")
-      .replace(/[^a-z0-9\s_-]+/g, "")
-      .trim()
-      .replace(/\s+/g, "-")
-      .slice(0, 48) || "section";
-  }
-
-  function buildHeadingIndex(md){
-    const lines = (md || "").replace(/\r\n/g,"\n").split("\n");
-    const counters = {};
-    const out = [];
-    let idx = 0;
-    for(const raw of lines){
-      const line = raw;
-      const m = line.match(/^(#{1,6})\s+(.*)$/);
-      if(m){
-        const level = m[1].length;
-        const text = m[2].trim();
-        const base = slugifyHeading(text);
-        const n = (counters[base] || 0) + 1;
-        counters[base] = n;
-        const id = n > 1 ? `${base}-${n}` : base;
-        out.push({ level, text, id, index: idx });
-      }
-      idx += line.length + 1;
-    }
-    return out;
-  }
-
-  function renderMarkdown(md){
-    const lines = (md || "").replace(/\r\n/g,"\n").split("\n");
-    let out = "";
-    let inCode = false;
-    let codeBuf = [];
-    let listMode = null;
-    const headingCounters = {};
-
-    const flushList = () => { if(listMode){ out += `</${listMode}>`; listMode=null; } };
-    const flushCode = () => {
-      if(inCode){
-        out += `<pre><code>${escapeHtml(codeBuf.join("\n"))}</code></pre>`;
-        inCode = false; codeBuf = [];
-      }
-    };
-    const inlineMd = (s) => {
-      const parts = String(s || "").split("`");
-      let x = "";
-      for(let i = 0; i < parts.length; i++){
-        const seg = parts[i];
-        if(i % 2 === 1){
-          x += `<code>${escapeHtml(seg)}</code>`;
-        } else {
-          x += escapeHtml(seg);
-        }
-      }
-      x = x.replace(/\*\*([\s\S]+?)\*\*/g, (m, inner) => {
-        const safe = String(inner || "").replace(/\*/g, "&#42;");
-        return `<strong>${safe}</strong>`;
-      });
-      x = x.replace(/(^|[^*])\*([^\s*][^*]*?[^\s*])\*([^*]|$)/g, "$1<em>$2</em>$3");
-      return x;
-    };
-
-    const splitTableRow = (line) => {
-      let s = (line || "").trim();
-      if(s.startsWith("|")) s = s.slice(1);
-      if(s.endsWith("|")) s = s.slice(0, -1);
-      return s.split("|").map(c => c.trim());
-    };
-    const isTableSep = (line) => {
-      if(!line || !line.includes("|")) return false;
-      let s = line.trim();
-      if(s.startsWith("|")) s = s.slice(1);
-      if(s.endsWith("|")) s = s.slice(0, -1);
-      if(!s.trim()) return false;
-      const parts = s.split("|").map(c => c.trim());
-      return parts.every(p => /^:?-{3,}:?$/.test(p));
-    };
-    const cellAlign = (cell) => {
-      const c = (cell || "").trim();
-      const left = c.startsWith(":");
-      const right = c.endsWith(":");
-      if(left && right) return "center";
-      if(right) return "right";
-      return "left";
-    };
-
-    for(let i = 0; i < lines.length; i++){
-      const line = lines[i];
-
-      if(line.trim().startsWith("```")){
-        if(inCode) flushCode();
-        else { flushList(); inCode = true; }
-        continue;
-      }
-      if(inCode){ codeBuf.push(line); continue; }
-
-      const next = lines[i + 1];
-      if(next && isTableSep(next) && line.includes("|")){
-        flushList();
-        const headers = splitTableRow(line);
-        const aligns = splitTableRow(next).map(cellAlign);
-        const rows = [];
-        i += 2;
-        for(; i < lines.length; i++){
-          const rowLine = lines[i];
-          if(!rowLine || !rowLine.includes("|")) break;
-          if(rowLine.trim() === "") break;
-          rows.push(splitTableRow(rowLine));
-        }
-        i -= 1;
-
-        out += "<table><thead><tr>";
-        for(let c = 0; c < headers.length; c++){
-          const a = aligns[c] || "left";
-          out += `<th style="text-align:${a}">${inlineMd(headers[c] || "")}</th>`;
-        }
-        out += "</tr></thead><tbody>";
-        for(const row of rows){
-          out += "<tr>";
-          for(let c = 0; c < headers.length; c++){
-            const a = aligns[c] || "left";
-            out += `<td style="text-align:${a}">${inlineMd(row[c] || "")}</td>`;
-          }
-          out += "</tr>";
-        }
-        out += "</tbody></table>";
-        continue;
-      }
-
-      if(/^---\s*$/.test(line) || /^\*\*\*\s*$/.test(line)){ flushList(); out += "<hr/>"; continue; }
-
-      const h = line.match(/^(#{1,6})\s+(.*)$/);
-      if(h){
-        flushList();
-        const lvl = h[1].length;
-        const text = h[2].trim();
-        const base = slugifyHeading(text);
-        const n = (headingCounters[base] || 0) + 1;
-        headingCounters[base] = n;
-        const id = n > 1 ? `${base}-${n}` : base;
-        out += `<h${lvl} id="${id}">${inlineMd(text)}</h${lvl}>`;
-        continue;
-      }
-
-      const bq = line.match(/^>\s?(.*)$/);
-      if(bq){ flushList(); out += `<blockquote>${inlineMd(bq[1])}</blockquote>`; continue; }
-
-      const ol = line.match(/^\s*\d+\.\s+(.*)$/);
-      if(ol){
-        if(listMode !== "ol"){ flushList(); listMode="ol"; out += "<ol>"; }
-        out += `<li>${inlineMd(ol[1])}</li>`;
-        continue;
-      }
-
-      const ul = line.match(/^\s*[-*]\s+(.*)$/);
-      if(ul){
-        if(listMode !== "ul"){ flushList(); listMode="ul"; out += "<ul>"; }
-        out += `<li>${inlineMd(ul[1])}</li>`;
-        continue;
-      }
-
-      if(line.trim() === ""){ flushList(); continue; }
-
-      flushList();
-      out += `<p>${inlineMd(line)}</p>`;
-    }
-
-    flushCode(); flushList();
-    return out;
-  }
-
   function setPreviewFormat(fmt){
     previewFormat = (fmt === "json" || fmt === "yaml" || fmt === "md" || fmt === "txt") ? fmt : "md";
     localStorage.setItem("sn_preview_format", previewFormat);
@@ -1082,9 +1252,12 @@ function fmtTime(iso){
   }
 
   let previewToken = 0;
+  const PREVIEW_SERVER_MIN_CHARS = 20000;
   async function renderPreview(){
     if(!previewMode || !elPreview) return;
     const text = elEditor.value || "";
+    cancelCoreJob("preview");
+    ++previewToken;
 
     if(previewFormat === "yaml"){
       const token = ++previewToken;
@@ -1142,8 +1315,39 @@ function fmtTime(iso){
       return;
     }
 
-    elPreview.innerHTML = renderMarkdown(text);
-    injectCopyButtons();
+    if(text.length >= PREVIEW_SERVER_MIN_CHARS){
+      // Large notes render server-side: the saved revision is cached per rev,
+      // unsaved edits only re-render the blocks that changed.
+      const token = previewToken;
+      const t = getActiveTab();
+      try{
+        let r;
+        if(t && t.noteId && text === t.lastLoadedContent){
+          r = await fetch(`/api/notes/${encodeURIComponent(t.noteId)}/html`, {headers: {"Accept":"application/json"}});
+        } else {
+          r = await fetch("/api/preview/markdown", {
+            method: "POST",
+            headers: {"Content-Type":"application/json","Accept":"application/json"},
+            body: JSON.stringify({text})
+          });
+        }
+        if(token !== previewToken) return;
+        const data = r.ok ? await r.json().catch(() => null) : null;
+        if(token !== previewToken) return;
+        if(data && typeof data.html === "string"){
+          elPreview.innerHTML = data.html;
+          injectCopyButtons();
+          return;
+        }
+      }catch(e){
+        if(token !== previewToken) return;
+      }
+    }
+
+    runCoreJob("preview", {}, text, (html) => {
+      elPreview.innerHTML = html;
+      injectCopyButtons();
+    });
   }
 
   function copyToClipboard(text){
@@ -1348,6 +1552,112 @@ function enableActions(enabled){
     elFileName.textContent = displayFilenameWithPin(meta);
     setTlpBadge(meta);
     setEncryptedBadge(meta);
+    updateLargeNoteBar();
+  }
+
+  // Large notes (server-side LARGE_NOTE_BYTES) are never loaded whole: the tab
+  // holds one window of about LARGE_WINDOW_BYTES, fetched from the range
+  // endpoint, and saves send only the edited range as a byte splice.
+  const LARGE_WINDOW_BYTES = 1024 * 1024;
+  const utf8Encoder = new TextEncoder();
+
+  function utf8Length(s){
+    return utf8Encoder.encode(s).length;
+  }
+
+  function formatBytes(n){
+    if(n < 1024) return `${n} B`;
+    if(n < 1024 * 1024) return `${(n / 1024).toFixed(1)} KB`;
+    return `${(n / (1024 * 1024)).toFixed(1)} MB`;
+  }
+
+  function updateLargeNoteBar(){
+    if(!elLargeBar) return;
+    const t = getActiveTab();
+    const lg = t && t.large;
+    elLargeBar.classList.toggle("hidden", !lg);
+    if(!lg) return;
+    elLargeRange.textContent = `${formatBytes(lg.offset)}–${formatBytes(lg.end)} of ${formatBytes(lg.size)}`;
+    elLargePrev.disabled = lg.offset <= 0;
+    elLargeNext.disabled = lg.end >= lg.size;
+  }
+
+  async function loadLargeWindow(t, offset, length){
+    const d = await apiGet(`/api/notes/${encodeURIComponent(t.noteId)}/content?offset=${offset}&length=${length || LARGE_WINDOW_BYTES}`);
+    t.large = { offset: d.offset, end: d.end, size: d.size };
+    t.rev = d.rev;
+    if(t.meta) t.meta.rev = d.rev;
+    t.content = d.content;
+    t.lastLoadedContent = d.content;
+    if(t.tabId === activeTabId){
+      elEditor.value = d.content;
+      elEditor.setSelectionRange(0, 0);
+      elEditor.scrollTop = 0;
+      updateReplaceCount();
+      updateEditorHighlight();
+      updateToc();
+      if(previewMode && elPreview){ renderPreview(); }
+    }
+    updateLargeNoteBar();
+  }
+
+  async function moveLargeWindow(dir){
+    const t = getActiveTab();
+    if(!t || !t.large) return;
+    if(elEditor.value !== t.lastLoadedContent){
+      if(saveTimer){ clearTimeout(saveTimer); saveTimer = null; }
+      isTyping = false;
+      await saveContentNow();
+      if(elEditor.value !== t.lastLoadedContent) return;
+    }
+    const lg = t.large;
+    setStatus("Loading note...");
+    try{
+      if(dir > 0){
+        await loadLargeWindow(t, lg.end);
+      } else {
+        const start = Math.max(0, lg.offset - LARGE_WINDOW_BYTES);
+        await loadLargeWindow(t, start, lg.offset - start);
+      }
+      setStatus("Idle");
+    }catch(e){
+      console.error(e);
+      setStatus("Error loading note");
+    }
+  }
+
+  // Save a large-note window as one splice against the revision it was loaded
+  // from. Returns null when there was nothing to send or the note moved on.
+  async function saveLargeWindow(t, content){
+    const old = t.lastLoadedContent || "";
+    let pre = commonPrefixLength(old, content);
+    let suf = commonSuffixLength(old, content, Math.min(old.length, content.length) - pre);
+    // Keep surrogate pairs whole so byte offsets stay exact
+    if(pre > 0 && (old.charCodeAt(pre - 1) & 0xFC00) === 0xD800) pre--;
+    if(suf > 0 && (old.charCodeAt(old.length - suf) & 0xFC00) === 0xDC00) suf--;
+    if(pre === old.length && old.length === content.length) return null;
+    const del = utf8Length(old.slice(pre, old.length - suf));
+    const insert = content.slice(pre, content.length - suf);
+    const r = await fetch(`/api/notes/${encodeURIComponent(t.noteId)}/content`, {
+      method: "PATCH",
+      headers: {"Content-Type":"application/json","Accept":"application/json"},
+      body: JSON.stringify({
+        base_rev: t.rev || 0,
+        offset: t.large.offset + utf8Length(old.slice(0, pre)),
+        delete: del,
+        insert,
+      })
+    });
+    if(r.status === 409){
+      setSaveState("Changed elsewhere, not saved", "");
+      return null;
+    }
+    if(!r.ok) throw new Error(await r.text());
+    const res = await r.json();
+    t.large.end += utf8Length(insert) - del;
+    t.large.size = res.size;
+    updateLargeNoteBar();
+    return res;
   }
 
   function setTlpBadge(meta){
@@ -1394,12 +1704,29 @@ function enableActions(enabled){
         t.meta.encrypted = res.meta.encrypted;
         setEncryptedBadge(t.meta);
       }
+      if(res && res.rev) t.rev = res.rev;
+      if(res && res.meta) patchNoteMeta(res.meta);
       setTlpBadge(t.meta);
     }catch(e){
       console.error("TLP update failed:", e);
     }
   }
 
+  // Append text to el, wrapping the server-provided [start, end] spans in <mark>.
+  function appendHighlighted(el, text, spans){
+    let last = 0;
+    for(const [start, end] of spans){
+      if(start < last || end > text.length) continue;
+      if(start > last) el.appendChild(document.createTextNode(text.slice(last, start)));
+      const mark = document.createElement("mark");
+      mark.className = "search-hit";
+      mark.textContent = text.slice(start, end);
+      el.appendChild(mark);
+      last = end;
+    }
+    if(last < text.length) el.appendChild(document.createTextNode(text.slice(last)));
+  }
+
   function makeNoteRow(meta, isActive){
     const row = document.createElement("div");
     row.className = "note-row" + (meta.pinned ? " pinned" : "") + (isActive ? " active" : "");
@@ -1422,7 +1749,13 @@ function enableActions(enabled){
 
     const title = document.createElement("div");
     title.className = "title";
-    title.textContent = displayTitleWithPin(meta);
+    const spans = meta.search && meta.search.title_matches;
+    if(spans && spans.length){
+      title.appendChild(document.createTextNode(pinPrefix(meta)));
+      appendHighlighted(title, displayTitle(meta), spans);
+    } else {
+      title.textContent = displayTitleWithPin(meta);
+    }
 
     const sub = document.createElement("div");
     sub.className = "sub";
@@ -1435,6 +1768,10 @@ function enableActions(enabled){
 
     content.appendChild(title);
     content.appendChild(sub);
+    const snippets = (meta.search && meta.search.snippets) || [];
+    for(const sn of snippets){
+      content.appendChild(makeSnippetRow(meta, sn));
+    }
 
     row.appendChild(cb);
     row.appendChild(content);
@@ -1443,7 +1780,30 @@ function enableActions(enabled){
     return row;
   }
 
-  
+  function makeSnippetRow(meta, sn){
+    const el = document.createElement("div");
+    el.className = "snippet";
+    if(sn.ellipsis_before) el.appendChild(document.createTextNode("…"));
+    appendHighlighted(el, sn.text, sn.matches || []);
+    if(sn.ellipsis_after) el.appendChild(document.createTextNode("…"));
+    el.addEventListener("click", (e) => {
+      e.stopPropagation();
+      const first = (sn.matches || [])[0] || [0, 0];
+      openNoteAtRange(meta.id, sn.offset + first[0], sn.offset + first[1]);
+    });
+    return el;
+  }
+
+  // Open (or focus) a note and select a range, e.g. the match behind a search snippet.
+  async function openNoteAtRange(noteId, start, end){
+    await openNoteInNewTab(noteId);
+    const t = getActiveTab();
+    if(!t || t.noteId !== noteId) return;
+    if(previewMode) setPreviewMode(false);
+    elEditor.focus();
+    elEditor.setSelectionRange(start, end);
+  }
+
   function toggleSelected(id, on){
     if(on) selectedIds.add(id);
     else selectedIds.delete(id);
@@ -1868,6 +2228,7 @@ function renderTabs(){
         content: data.content || "",
         lastLoadedContent: data.content || "",
       };
+      if(data.large) await loadLargeWindow(tab, 0);
       tabs.push(tab);
       activeTabId = tab.tabId;
       renderTabs();
@@ -1880,27 +2241,152 @@ function renderTabs(){
     }
   }
 
+  // Sidebar search: keystrokes are debounced, and each new query aborts the previous
+  // request. The server also stops scanning when it sees a newer query for this client id.
+  const SEARCH_CLIENT_ID = Math.random().toString(16).slice(2);
+  let searchTimer = null;
+  let searchAbort = null;
+
+  function scheduleSearch(){
+    if(searchTimer) clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => { searchTimer = null; loadNotes(); }, 200);
+  }
+
   async function loadNotes(){
+    if(searchTimer){ clearTimeout(searchTimer); searchTimer = null; }
+    if(searchAbort){ searchAbort.abort(); searchAbort = null; }
     const q = encodeURIComponent(elSearch.value.trim());
     const sort = encodeURIComponent(elSort.value);
-    const url = q ? `/api/notes?sort=${sort}&q=${q}` : `/api/notes?sort=${sort}`;
     setStatus("Loading...");
     try{
-      notes = await apiGet(url);
-      renderNotesList();
+      if(q){
+        await loadSearchResults(`/api/notes?sort=${sort}&q=${q}&stream=1&snippets=1&client=${SEARCH_CLIENT_ID}`);
+      } else {
+        notes = await apiGet(`/api/notes?sort=${sort}`);
+        renderNotesList();
+      }
       setStatus("Idle");
     }catch(e){
+      if(e && e.name === "AbortError") return;
+      if(e && e.queryError){
+        setStatus(`Search: ${e.message}`);
+        return;
+      }
       console.error(e);
       setStatus("Error loading notes");
     }
   }
 
+  // Reads the NDJSON search stream and renders matches as they arrive
+  // (title/filename hits first, content hits after).
+  async function loadSearchResults(url){
+    const ctrl = new AbortController();
+    searchAbort = ctrl;
+    const r = await fetch(url, {headers: {"Accept": "application/x-ndjson"}, signal: ctrl.signal});
+    if(!r.ok){
+      let msg = await r.text();
+      try{ msg = JSON.parse(msg).error || msg; }catch(e){}
+      const err = new Error(msg);
+      // 400 means the query itself is malformed, e.g. an invalid /regex/
+      err.queryError = r.status === 400;
+      throw err;
+    }
+    notes = [];
+    let renderQueued = false;
+    const flush = () => {
+      renderQueued = false;
+      if(searchAbort !== ctrl) return;
+      sortNotesLocal();
+      renderNotesList();
+    };
+    flush();
+    const reader = r.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    for(;;){
+      const { value, done } = await reader.read();
+      if(done) break;
+      buf += decoder.decode(value, {stream: true});
+      let nl;
+      while((nl = buf.indexOf("\n")) >= 0){
+        const line = buf.slice(0, nl);
+        buf = buf.slice(nl + 1);
+        if(!line.trim()) continue;
+        const msg = JSON.parse(line);
+        if(msg.note){
+          notes.push(msg.note);
+          if(!renderQueued){ renderQueued = true; requestAnimationFrame(flush); }
+        }
+      }
+    }
+    flush();
+    if(searchAbort === ctrl) searchAbort = null;
+  }
+
+  // Mirrors sort_metas() on the backend: sort key first, then pinned on top (stable).
+  function sortNotesLocal(){
+    const key = elSort.value;
+    const cmpDesc = (field) => (a, b) => {
+      const x = a[field] || "", y = b[field] || "";
+      return x < y ? 1 : (x > y ? -1 : 0);
+    };
+    if(key === "created"){
+      notes.sort(cmpDesc("created"));
+    } else if(key === "filename"){
+      notes.sort((a, b) => {
+        const x = a.filename || "", y = b.filename || "";
+        return x < y ? -1 : (x > y ? 1 : 0);
+      });
+    } else {
+      notes.sort(cmpDesc("updated"));
+    }
+    notes.sort((a, b) => (a.pinned ? 0 : 1) - (b.pinned ? 0 : 1));
+    if(elSearch.value.trim()){
+      // Search results: relevance first, selected sort as tie-breaker (like rank_search_results)
+      const score = (n) => (n.search && n.search.score) || 0;
+      notes.sort((a, b) => score(b) - score(a));
+    }
+  }
+
+  // Patch the local list from a meta returned by a write, instead of refetching.
+  // A search-filtered list is only updated in place; membership changes need a new query.
+  function patchNoteMeta(meta){
+    if(!meta || !meta.id) return;
+    const idx = notes.findIndex(n => String(n.id) === String(meta.id));
+    if(meta.deleted){
+      if(idx >= 0) notes.splice(idx, 1);
+    } else if(idx >= 0){
+      const prev = notes[idx];
+      notes[idx] = Object.assign({}, prev, meta);
+      if(prev.search && displayTitle(prev) !== displayTitle(meta)){
+        // Offsets refer to the old title
+        notes[idx].search = Object.assign({}, notes[idx].search, {title_matches: []});
+      }
+      if(prev.search && prev.rev !== meta.rev){
+        // Snippet offsets refer to the old content
+        notes[idx].search = Object.assign({}, notes[idx].search, {snippets: []});
+      }
+    } else if(!elSearch.value.trim()){
+      notes.push(meta);
+    } else {
+      return;
+    }
+    sortNotesLocal();
+    renderNotesList();
+  }
+
+  function removeNotesLocal(ids){
+    const drop = new Set((ids || []).map(x => String(x)));
+    notes = notes.filter(n => !drop.has(String(n.id)));
+    renderNotesList();
+  }
+
   async function createNote(){
     setStatus("Creating...");
     try{
       const meta = await apiPost("/api/notes", {ext: "md"});
       initSidebarResizer();
-    await loadNotes();
+    patchNoteMeta(meta);
     updateSortModeLabel();
       await openNoteInNewTab(meta.id);
     }catch(e){
@@ -1929,21 +2415,61 @@ function renderTabs(){
     setSaveState("Saving...", "");
 
     try{
-      const res = await apiPut(`/api/notes/${encodeURIComponent(t.noteId)}/content`, {
-        content,
-        base_rev: t.rev || 0
-      });
+      let res;
+      if(t.large){
+        if(t._splicing){ scheduleSave(); return; }
+        t._splicing = true;
+        try{
+          res = await saveLargeWindow(t, content);
+        }finally{
+          t._splicing = false;
+        }
+        if(!res){
+          if(content === t.lastLoadedContent) setSaveState("Saved", t.meta?.updated || "");
+          return;
+        }
+      } else {
+        const r = await fetch(`/api/notes/${encodeURIComponent(t.noteId)}/content`, {
+          method: "PUT",
+          headers: {"Content-Type":"application/json","Accept":"application/json"},
+          body: JSON.stringify({content, base_rev: t.rev || 0})
+        });
+        res = await r.json().catch(() => ({}));
+        if(r.status === 409 && typeof res.content === "string"){
+          applySaveConflict(t, content, res);
+          return;
+        }
+        if(!r.ok) throw new Error(res.error || `HTTP ${r.status}`);
+      }
+
+      let saved = content;
+      if(res.merged && typeof res.content === "string"){
+        // The server merged in changes saved elsewhere since our base_rev
+        if(localTabText(t) !== content){
+          // Edited while the save was in flight: keep the old base rev, so the
+          // next save is merged against it again and carries both sides over
+          scheduleSave();
+          return;
+        }
+        saved = res.content;
+        if(t.tabId === activeTabId){
+          replaceEditorText(content, saved);
+          refreshEditorViews();
+        }
+        setStatus("Merged with changes saved elsewhere");
+      }
 
       t.rev = res.rev || (t.rev + 1);
+      if(res.meta) t.meta = res.meta;
       t.meta.updated = res.updated;
       t.meta.rev = t.rev;
-      t.content = content;
-      t.lastLoadedContent = content;
+      t.content = saved;
+      t.lastLoadedContent = saved;
 
       setSaveState("Saved", res.updated);
       setFileName(t.meta);
       saveCursorPos(t.noteId, elEditor.selectionStart, elEditor.scrollTop);
-      await loadNotes();
+      patchNoteMeta(t.meta);
       renderTabs();
     }catch(e){
       console.error(e);
@@ -1951,6 +2477,47 @@ function renderTabs(){
     }
   }
 
+  function localTabText(t){
+    return t.tabId === activeTabId ? elEditor.value : t.content;
+  }
+
+  // Swap the editor text from `from` to `to` with a single splice, so the cursor
+  // and scroll position outside the changed range stay where they were.
+  function replaceEditorText(from, to){
+    const pre = commonPrefixLength(from, to);
+    const suf = commonSuffixLength(from, to, Math.min(from.length, to.length) - pre);
+    elEditor.setRangeText(to.slice(pre, to.length - suf), pre, from.length - suf, "preserve");
+  }
+
+  function refreshEditorViews(){
+    if(previewMode && elPreview){ renderPreview(); }
+    updateReplaceCount();
+    updateEditorHighlight();
+    updateToc();
+  }
+
+  // A save was refused because it conflicts with changes saved elsewhere. The
+  // server sent the merge with both sides of each conflict between markers; it
+  // replaces the editor text and is saved as the next revision.
+  function applySaveConflict(t, sent, res){
+    if(localTabText(t) !== sent){
+      // Still editing: retry with the newer text once typing pauses
+      scheduleSave();
+      return;
+    }
+    t.rev = res.rev;
+    if(t.tabId === activeTabId){
+      replaceEditorText(sent, res.content);
+      const at = res.content.indexOf("<<<<<<< ");
+      if(at >= 0) elEditor.setSelectionRange(at, at);
+      editorChangedProgrammatically();
+    } else {
+      t.content = res.content;
+    }
+    const n = (res.conflicts || []).length;
+    setStatus(`Conflict with changes saved elsewhere: ${n} section${n === 1 ? "" : "s"} marked with <<<<<<< / >>>>>>>`);
+  }
+
   function scheduleSave(){
     if(saveTimer) clearTimeout(saveTimer);
     saveTimer = setTimeout(() => {
@@ -1975,7 +2542,7 @@ async function renameNote(){
       t.rev = meta.rev || t.rev;
       setFileName(t.meta);
       setStatus("Idle");
-      await loadNotes();
+      patchNoteMeta(meta);
       renderTabs();
       updatePinButton();
     }catch(e){
@@ -2002,7 +2569,7 @@ async function renameNote(){
       await apiDelete(`/api/notes/${encodeURIComponent(t.noteId)}`);
       closeTabsForNotes([t.noteId]);
 
-      await loadNotes();
+      removeNotesLocal([t.noteId]);
       setStatus("Idle");
     }catch(e){
       console.error(e);
@@ -2050,8 +2617,8 @@ async function renameNote(){
         throw new Error(msg || "Upload failed");
       }
       const data = await r.json();
-      await loadNotes();
       if(Array.isArray(data.created)){
+        data.created.forEach(patchNoteMeta);
         for(const meta of data.created){
           if(meta && meta.id){
             await openNoteInNewTab(meta.id);
@@ -2095,25 +2662,47 @@ async function renameNote(){
     for(const t of tabs){
       if(t.isAggregate) continue;
       try{
-        const data = await apiGet(`/api/notes/${encodeURIComponent(t.noteId)}`);
-        const remoteRev = data.meta?.rev || 0;
-        if(remoteRev > (t.rev || 0)){
-          t.rev = remoteRev;
-          t.meta = data.meta;
-          const remoteContent = data.content || "";
-          t.content = remoteContent;
-
-          if(t.tabId === activeTabId){
-            setSaveState("Updated remotely", t.meta.updated);
-            if(elEditor.value === t.lastLoadedContent){
-              elEditor.value = remoteContent;
-            }
-            t.lastLoadedContent = remoteContent;
+        // Only the meta is polled; content is fetched when the rev moved
+        const meta = await apiGet(`/api/notes/${encodeURIComponent(t.noteId)}/meta`);
+        const remoteRev = meta.rev || 0;
+        if(remoteRev <= (t.rev || 0)) continue;
+        const isActive = t.tabId === activeTabId;
+        const clean = isActive ? elEditor.value === t.lastLoadedContent : t.content === t.lastLoadedContent;
+        if(t.large){
+          t.meta = meta;
+          // With local edits pending, keep the old rev so their save is refused
+          if(clean) await loadLargeWindow(t, t.large.offset);
+          if(isActive){
+            setSaveState("Updated remotely", meta.updated);
             setFileName(t.meta);
-          } else {
-            t.lastLoadedContent = remoteContent;
           }
+          continue;
+        }
+        if(!clean){
+          // Keep the old base rev: the pending save is merged on the server
+          if(isActive) scheduleSave();
+          continue;
+        }
+        const data = await apiGet(`/api/notes/${encodeURIComponent(t.noteId)}`);
+        if(data.large){
+          t.meta = data.meta;
+          await loadLargeWindow(t, 0);
+          continue;
+        }
+        // Typed while the content was in flight: the next save merges instead
+        if(localTabText(t) !== t.lastLoadedContent) continue;
+        t.rev = data.meta?.rev || remoteRev;
+        t.meta = data.meta;
+        const remoteContent = data.content || "";
+
+        if(isActive){
+          setSaveState("Updated remotely", t.meta.updated);
+          replaceEditorText(elEditor.value, remoteContent);
+          refreshEditorViews();
+          setFileName(t.meta);
         }
+        t.content = remoteContent;
+        t.lastLoadedContent = remoteContent;
       }catch(e){
         // quiet
       }
@@ -2121,9 +2710,27 @@ async function renameNote(){
     renderTabs();
   }
 
+  // Files changed behind the app's back (sync pulls, manual edits) are reported by
+  // the server's watcher; refresh the list. Open tabs follow through their rev.
+  async function pollChanges(){
+    let res;
+    try{
+      res = await apiGet(`/api/changes?since=${changesSeq ?? 0}`);
+    }catch(e){
+      return;
+    }
+    const first = changesSeq === null;
+    changesSeq = res.seq;
+    if(first || !(res.changes.length || res.reset)) return;
+    if(!isTyping && !searchTimer) loadNotes();
+  }
+
   function setupPolling(){
     if(pollTimer) clearInterval(pollTimer);
-    pollTimer = setInterval(pollTabs, 5000);
+    pollTimer = setInterval(async () => {
+      await pollChanges();
+      await pollTabs();
+    }, 5000);
   }
 
   // Events
@@ -2131,7 +2738,7 @@ async function renameNote(){
     if(fileView === "off"){
       searchInCurrentNote(false);
     } else {
-      loadNotes();
+      scheduleSearch();
     }
   });
   elSearch.addEventListener("keydown", (e) => {
@@ -2161,12 +2768,15 @@ async function renameNote(){
   if(elSelectAll) elSelectAll.addEventListener("click", selectAll);
   if(elSelectNone) elSelectNone.addEventListener("click", selectNone);
   if(elDownloadSelected) elDownloadSelected.addEventListener("click", downloadSelected);
+  if(elPdfSelected) elPdfSelected.addEventListener("click", (e) => pdfSelected(e.shiftKey ? "zip" : "combined"));
   if(elDeleteSelected) elDeleteSelected.addEventListener("click", deleteSelected);
   if(elRename){ elRename.addEventListener("click", renameNote); }
   elPreviewToggle.addEventListener("click", () => setPreviewMode(!previewMode));
   if(elUndo) elUndo.addEventListener("click", () => { elEditor.focus(); document.execCommand("undo"); });
   if(elRedo) elRedo.addEventListener("click", () => { elEditor.focus(); document.execCommand("redo"); });
   if(elPin){ elPin.addEventListener("click", togglePin); }
+  if(elLargePrev) elLargePrev.addEventListener("click", () => moveLargeWindow(-1));
+  if(elLargeNext) elLargeNext.addEventListener("click", () => moveLargeWindow(1));
   if(elTocToggle){ elTocToggle.addEventListener("click", () => { closeDropdowns(); setTocOpen(tocOpen !== "on"); }); }
   if(elTocDepth){ elTocDepth.addEventListener("change", updateToc); }
 
@@ -2202,6 +2812,8 @@ async function renameNote(){
   if(elReplaceBtn) elReplaceBtn.addEventListener("click", openReplaceModal);
   const elMetadataBtn = $("metadataBtn");
   if(elMetadataBtn) elMetadataBtn.addEventListener("click", () => openRenameModal("metadata"));
+  const elHistoryBtn = $("historyBtn");
+  if(elHistoryBtn) elHistoryBtn.addEventListener("click", openHistoryModal);
   const elTlpBadge = $("tlpBadge");
   if(elTlpBadge) elTlpBadge.addEventListener("click", cycleTlp);
   if(elPreviewFormat){
@@ -2209,6 +2821,7 @@ async function renameNote(){
   }
   bindReplaceModal();
   bindRenameModal();
+  bindHistoryModal();
 
   window.addEventListener("beforeunload", () => {
     const t = getActiveTab();
@@ -2326,6 +2939,11 @@ async function renameNote(){
         closeRenameModal();
         return;
       }
+      const historyModal = document.getElementById("history-modal");
+      if(historyModal && !historyModal.classList.contains("hidden")){
+        closeHistoryModal();
+        return;
+      }
       const replacePanel = document.getElementById("replace-panel");
       if(replacePanel && !replacePanel.classList.contains("hidden")){
         closeReplaceModal();
@@ -2364,6 +2982,36 @@ async function renameNote(){
     URL.revokeObjectURL(url);
   }
 
+  // Bulk PDF export: one combined PDF with a TOC, or a ZIP of per-note PDFs.
+  async function pdfSelected(mode){
+    const ids = Array.from(selectedIds);
+    if(!ids.length) return;
+    setStatus("Rendering PDFs...");
+    try{
+      const r = await fetch("/api/export/pdf", {
+        method: "POST",
+        headers: {"Content-Type":"application/json"},
+        body: JSON.stringify({ids, mode}),
+      });
+      if(!r.ok){ alert("PDF export failed"); setStatus("Idle"); return; }
+      const cd = r.headers.get("Content-Disposition") || "";
+      const m = cd.match(/filename="?([^";]+)"?/);
+      const blob = await r.blob();
+      const url = URL.createObjectURL(blob);
+      const a = document.createElement("a");
+      a.href = url;
+      a.download = m ? m[1] : (mode === "zip" ? "notes-pdf.zip" : "notes.pdf");
+      document.body.appendChild(a);
+      a.click();
+      a.remove();
+      URL.revokeObjectURL(url);
+      setStatus("Idle");
+    }catch(e){
+      console.error(e);
+      setStatus("PDF export failed");
+    }
+  }
+
   async function deleteSelected(){
     if(deleteInProgress) { dlog("deleteSelected already running"); return; }
     deleteInProgress = true;
@@ -2382,7 +3030,7 @@ if(!ids.length) return;
           }
               closeTabsForNotes(ids);
           selectedIds.clear();
-          await loadNotes();
+          removeNotesLocal(ids);
 } finally {
       deleteInProgress = false;
     }
@@ -2697,6 +3345,7 @@ async function loadSyncSettings(){
     _$("syncMode").value = j.mode || "push";
     _$("syncInterval").value = (j.interval_s || 60);
     _$("syncNoDelete").checked = (j.no_deletes !== false);
+    _$("syncEngine").value = j.engine || "native";
   }catch(e){}
 }
 
@@ -2707,7 +3356,14 @@ async function loadSyncStatus(){
     const t = j.last_time || "never";
     const res = j.last_result || "idle";
     const err = j.last_error ? (" - " + j.last_error) : "";
-    _$("syncStatus").textContent = `Status: ${res} (last: ${t})${err}`;
+    let run = "";
+    const lr = j.last_run;
+    if(lr && lr.engine === "native"){
+      const bytes = (lr.bytes_up || 0) + (lr.bytes_down || 0);
+      const size = bytes < 1024 ? `${bytes} B` : `${(bytes / 1024).toFixed(1)} KB`;
+      run = ` · ${lr.files_transferred || 0} of ${lr.files_checked || 0} files, ${size}, ${lr.requests || 0} requests, ${lr.duration_ms || 0} ms`;
+    }
+    _$("syncStatus").textContent = `Status: ${res} (last: ${t})${err}${run}`;
   }catch(e){
     const el = _$("syncStatus");
     if(el) el.textContent = "Status: unavailable";
@@ -2723,7 +3379,8 @@ async function saveSyncSettings(){
     password: _$("syncPass").value,
     mode: _$("syncMode").value,
     interval_s: parseInt(_$("syncInterval").value || "60", 10),
-    no_deletes: _$("syncNoDelete").checked
+    no_deletes: _$("syncNoDelete").checked,
+    engine: _$("syncEngine").value
   };
   const r = await fetch("/api/sync/settings", {
     method: "POST",
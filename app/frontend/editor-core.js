@@ -0,0 +1,364 @@
+// Pure text functions shared by app.js and editor-worker.js.
+// No DOM access here: everything must also run inside a Web Worker.
+(function(root){
+  function escapeHtml(s){
+    return s.replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/>/g,"&gt;");
+  }
+
+  function escapeRegExp(s){
+    return (s || "").replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
+  }
+
+  function slugifyHeading(s){
+    return (s || "")
+      .toLowerCase()
+      .replace(/<\/?[^>]+>/g, "")
+      .replace(/[^a-z0-9\s_-]+/g, "")
+      .trim()
+      .replace(/\s+/g, "-")
+      .slice(0, 48) || "section";
+  }
+
+  function buildHeadingIndex(md){
+    const lines = (md || "").replace(/\r\n/g,"\n").split("\n");
+    const counters = {};
+    const out = [];
+    let idx = 0;
+    for(const raw of lines){
+      const line = raw;
+      const m = line.match(/^(#{1,6})\s+(.*)$/);
+      if(m){
+        const level = m[1].length;
+        const text = m[2].trim();
+        const base = slugifyHeading(text);
+        const n = (counters[base] || 0) + 1;
+        counters[base] = n;
+        const id = n > 1 ? `${base}-${n}` : base;
+        out.push({ level, text, id, index: idx });
+      }
+      idx += line.length + 1;
+    }
+    return out;
+  }
+
+  function renderMarkdown(md){
+    const lines = (md || "").replace(/\r\n/g,"\n").split("\n");
+    let out = "";
+    let inCode = false;
+    let codeBuf = [];
+    let listMode = null;
+    const headingCounters = {};
+
+    const flushList = () => { if(listMode){ out += `</${listMode}>`; listMode=null; } };
+    const flushCode = () => {
+      if(inCode){
+        out += `<pre><code>${escapeHtml(codeBuf.join("\n"))}</code></pre>`;
+        inCode = false; codeBuf = [];
+      }
+    };
+    const inlineMd = (s) => {
+      const parts = String(s || "").split("`");
+      let x = "";
+      for(let i = 0; i < parts.length; i++){
+        const seg = parts[i];
+        if(i % 2 === 1){
+          x += `<code>${escapeHtml(seg)}</code>`;
+        } else {
+          x += escapeHtml(seg);
+        }
+      }
+      x = x.replace(/\*\*([\s\S]+?)\*\*/g, (m, inner) => {
+        const safe = String(inner || "").replace(/\*/g, "&#42;");
+        return `<strong>${safe}</strong>`;
+      });
+      x = x.replace(/(^|[^*])\*([^\s*][^*]*?[^\s*])\*([^*]|$)/g, "$1<em>$2</em>$3");
+      return x;
+    };
+
+    const splitTableRow = (line) => {
+      let s = (line || "").trim();
+      if(s.startsWith("|")) s = s.slice(1);
+      if(s.endsWith("|")) s = s.slice(0, -1);
+      return s.split("|").map(c => c.trim());
+    };
+    const isTableSep = (line) => {
+      if(!line || !line.includes("|")) return false;
+      let s = line.trim();
+      if(s.startsWith("|")) s = s.slice(1);
+      if(s.endsWith("|")) s = s.slice(0, -1);
+      if(!s.trim()) return false;
+      const parts = s.split("|").map(c => c.trim());
+      return parts.every(p => /^:?-{3,}:?$/.test(p));
+    };
+    const cellAlign = (cell) => {
+      const c = (cell || "").trim();
+      const left = c.startsWith(":");
+      const right = c.endsWith(":");
+      if(left && right) return "center";
+      if(right) return "right";
+      return "left";
+    };
+
+    for(let i = 0; i < lines.length; i++){
+      const line = lines[i];
+
+      if(line.trim().startsWith("```")){
+        if(inCode) flushCode();
+        else { flushList(); inCode = true; }
+        continue;
+      }
+      if(inCode){ codeBuf.push(line); continue; }
+
+      const next = lines[i + 1];
+      if(next && isTableSep(next) && line.includes("|")){
+        flushList();
+        const headers = splitTableRow(line);
+        const aligns = splitTableRow(next).map(cellAlign);
+        const rows = [];
+        i += 2;
+        for(; i < lines.length; i++){
+          const rowLine = lines[i];
+          if(!rowLine || !rowLine.includes("|")) break;
+          if(rowLine.trim() === "") break;
+          rows.push(splitTableRow(rowLine));
+        }
+        i -= 1;
+
+        out += "<table><thead><tr>";
+        for(let c = 0; c < headers.length; c++){
+          const a = aligns[c] || "left";
+          out += `<th style="text-align:${a}">${inlineMd(headers[c] || "")}</th>`;
+        }
+        out += "</tr></thead><tbody>";
+        for(const row of rows){
+          out += "<tr>";
+          for(let c = 0; c < headers.length; c++){
+            const a = aligns[c] || "left";
+            out += `<td style="text-align:${a}">${inlineMd(row[c] || "")}</td>`;
+          }
+          out += "</tr>";
+        }
+        out += "</tbody></table>";
+        continue;
+      }
+
+      if(/^---\s*$/.test(line) || /^\*\*\*\s*$/.test(line)){ flushList(); out += "<hr/>"; continue; }
+
+      const h = line.match(/^(#{1,6})\s+(.*)$/);
+      if(h){
+        flushList();
+        const lvl = h[1].length;
+        const text = h[2].trim();
+        const base = slugifyHeading(text);
+        const n = (headingCounters[base] || 0) + 1;
+        headingCounters[base] = n;
+        const id = n > 1 ? `${base}-${n}` : base;
+        out += `<h${lvl} id="${id}">${inlineMd(text)}</h${lvl}>`;
+        continue;
+      }
+
+      const bq = line.match(/^>\s?(.*)$/);
+      if(bq){ flushList(); out += `<blockquote>${inlineMd(bq[1])}</blockquote>`; continue; }
+
+      const ol = line.match(/^\s*\d+\.\s+(.*)$/);
+      if(ol){
+        if(listMode !== "ol"){ flushList(); listMode="ol"; out += "<ol>"; }
+        out += `<li>${inlineMd(ol[1])}</li>`;
+        continue;
+      }
+
+      const ul = line.match(/^\s*[-*]\s+(.*)$/);
+      if(ul){
+        if(listMode !== "ul"){ flushList(); listMode="ul"; out += "<ul>"; }
+        out += `<li>${inlineMd(ul[1])}</li>`;
+        continue;
+      }
+
+      if(line.trim() === ""){ flushList(); continue; }
+
+      flushList();
+      out += `<p>${inlineMd(line)}</p>`;
+    }
+
+    flushCode(); flushList();
+    return out;
+  }
+
+  function matchRegExp(query, matchCase, wholeWord){
+    const flags = matchCase ? "g" : "gi";
+    const pattern = wholeWord ? `\\b${escapeRegExp(query)}\\b` : escapeRegExp(query);
+    return new RegExp(pattern, flags);
+  }
+
+  // First index in a sorted offset array whose value is >= pos.
+  function lowerBound(arr, pos){
+    let lo = 0;
+    let hi = arr.length;
+    while(lo < hi){
+      const mid = (lo + hi) >> 1;
+      if(arr[mid] < pos) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  // Match positions for one query, as parallel start/end offset arrays.
+  function scanMatches(text, query, matchCase, wholeWord){
+    const state = { text, query, matchCase, wholeWord, starts: [], ends: [] };
+    if(!query) return state;
+    const re = matchRegExp(query, matchCase, wholeWord);
+    let m;
+    while((m = re.exec(text)) !== null){
+      if(m[0].length === 0){
+        re.lastIndex += 1;
+        continue;
+      }
+      state.starts.push(m.index);
+      state.ends.push(m.index + m[0].length);
+    }
+    return state;
+  }
+
+  // Bring a scanMatches() state up to date after text[start:oldEnd] was
+  // replaced by insertLen characters (`text` is the new text). Matches before
+  // the edit are kept, the edited region is rescanned, and scanning stops as
+  // soon as it is back in step with the old (shifted) matches.
+  function updateMatches(state, text, start, oldEnd, insertLen){
+    const { starts, ends } = state;
+    const delta = insertLen - (oldEnd - start);
+    const editEnd = start + insertLen;
+    state.text = text;
+    if(!state.query) return state;
+    const keep = lowerBound(ends, start);
+    const newStarts = [];
+    const newEnds = [];
+    const re = matchRegExp(state.query, state.matchCase, state.wholeWord);
+    let pos = Math.max(keep ? ends[keep - 1] : 0, start - state.query.length, 0);
+    let tail = -1;
+    re.lastIndex = pos;
+    for(;;){
+      if(pos > editEnd){
+        // Past the edit (and the word-boundary character after it): if no old
+        // match straddles pos, every old match from here on is still valid.
+        const j = lowerBound(starts, pos - delta);
+        if(j === 0 || ends[j - 1] + delta <= pos){
+          tail = j;
+          break;
+        }
+      }
+      const m = re.exec(text);
+      if(!m) break;
+      if(m[0].length === 0){
+        re.lastIndex += 1;
+        pos = re.lastIndex;
+        continue;
+      }
+      newStarts.push(m.index);
+      newEnds.push(m.index + m[0].length);
+      pos = re.lastIndex;
+    }
+    const stop = tail === -1 ? starts.length : tail;
+    if(newStarts.length < 8192){
+      // Usual case (typing): patch in place, then shift the tail
+      starts.splice(keep, stop - keep, ...newStarts);
+      ends.splice(keep, stop - keep, ...newEnds);
+      if(delta && tail !== -1){
+        for(let k = keep + newStarts.length; k < starts.length; k++){
+          starts[k] += delta;
+          ends[k] += delta;
+        }
+      }
+      return state;
+    }
+    const outStarts = starts.slice(0, keep).concat(newStarts);
+    const outEnds = ends.slice(0, keep).concat(newEnds);
+    for(let k = stop; k < starts.length; k++){
+      outStarts.push(starts[k] + delta);
+      outEnds.push(ends[k] + delta);
+    }
+    state.starts = outStarts;
+    state.ends = outEnds;
+    return state;
+  }
+
+  // Index of the match at or after a selection: the exact selected match if
+  // there is one, else the first match starting at or after `from`.
+  function matchIndexAt(state, selStart, selEnd, from){
+    const { starts, ends } = state;
+    let idx = lowerBound(starts, selStart);
+    if(idx < starts.length && starts[idx] === selStart && ends[idx] === selEnd) return idx;
+    if(from !== selStart) idx = lowerBound(starts, from);
+    return idx < starts.length ? idx : -1;
+  }
+
+  function escapeForHighlight(s){
+    return (s || "").replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+  }
+
+  // Match count, current match and the matches overlapping [args.from, args.to)
+  // for the find panel. `cache.find` holds match positions between calls.
+  function findState(text, args, cache){
+    let state = cache.find;
+    if(!state || state.text !== text || state.query !== args.query
+       || state.matchCase !== !!args.matchCase || state.wholeWord !== !!args.wholeWord){
+      state = scanMatches(text, args.query, !!args.matchCase, !!args.wholeWord);
+      cache.find = state;
+    }
+    const { starts, ends } = state;
+    const out = { total: starts.length, countIdx: 0, current: null, ranges: [] };
+    if(!starts.length) return out;
+    const countIdx = matchIndexAt(state, args.selStart, args.selEnd, args.selEnd);
+    out.countIdx = countIdx === -1 ? 0 : countIdx;
+    const curIdx = matchIndexAt(state, args.selStart, args.selEnd, args.selStart);
+    const cur = curIdx === -1 ? 0 : curIdx;
+    out.current = [starts[cur], ends[cur]];
+    for(let k = lowerBound(ends, (args.from || 0) + 1); k < starts.length && starts[k] < (args.to || 0); k++){
+      out.ranges.push(starts[k], ends[k]);
+    }
+    return out;
+  }
+
+  // Highlight markup for text[from:to) given flat [start, end, ...] match
+  // ranges; `top` selects the inverted-text layer's classes.
+  function buildHighlightSlice(text, from, to, ranges, current, top){
+    let out = "";
+    let last = from;
+    for(let k = 0; k < ranges.length; k += 2){
+      const s = Math.max(ranges[k], from);
+      const e = Math.min(ranges[k + 1], to);
+      if(e <= s) continue;
+      out += escapeForHighlight(text.slice(last, s));
+      const isCur = !!current && ranges[k] === current[0] && ranges[k + 1] === current[1];
+      const seg = escapeForHighlight(text.slice(s, e));
+      if(top){
+        out += `<span class="${isCur ? "hl-current-text" : "hl-text"}">${seg}</span>`;
+      } else {
+        const id = isCur && s === ranges[k] ? ' id="hl-active"' : "";
+        out += `<span class="${isCur ? "hl-current" : "hl"}"${id}>${seg}</span>`;
+      }
+      last = e;
+    }
+    return out + escapeForHighlight(text.slice(last, to));
+  }
+
+  // Jobs the worker runs against its copy of the editor text.
+  const jobs = {
+    preview: (text) => renderMarkdown(text),
+    toc: (text) => buildHeadingIndex(text),
+    find: (text, args, cache) => findState(text, args, cache),
+  };
+
+  root.SNCore = {
+    escapeHtml,
+    escapeRegExp,
+    slugifyHeading,
+    buildHeadingIndex,
+    renderMarkdown,
+    matchRegExp,
+    scanMatches,
+    updateMatches,
+    escapeForHighlight,
+    findState,
+    buildHighlightSlice,
+    jobs,
+  };
+})(typeof self !== "undefined" ? self : this);
@@ -0,0 +1,53 @@
+// Background worker for preview, TOC and find-highlight computation.
+//
+// Holds its own copy of the editor text, kept current with splices from
+// app.js, so a keystroke only ships the changed range; find-match positions
+// are patched for that range instead of rescanning the note. Jobs are coalesced
+// per kind: if several arrive before the worker gets to them, only the newest one
+// runs. app.js drops any result whose sequence number is no longer current.
+importScripts("/static/editor-core.js");
+
+let text = "";
+// Per-job state carried between runs (e.g. match positions for find)
+const cache = {};
+const pending = {};
+let flushScheduled = false;
+
+function flush(){
+  flushScheduled = false;
+  for(const kind of Object.keys(pending)){
+    const job = pending[kind];
+    delete pending[kind];
+    const fn = self.SNCore.jobs[kind];
+    if(!fn) continue;
+    let result = null;
+    let error = null;
+    try{
+      result = fn(text, job.args || {}, cache);
+    }catch(e){
+      error = e && e.message ? e.message : String(e);
+    }
+    self.postMessage({ type: "result", kind, seq: job.seq, result, error });
+  }
+}
+
+self.onmessage = (e) => {
+  const msg = e.data || {};
+  if(msg.type === "set"){
+    text = msg.text || "";
+    cache.find = null;
+  } else if(msg.type === "splice"){
+    const insert = msg.insert || "";
+    text = text.slice(0, msg.start) + insert + text.slice(msg.end);
+    if(cache.find) self.SNCore.updateMatches(cache.find, text, msg.start, msg.end, insert.length);
+  } else if(msg.type === "job"){
+    pending[msg.kind] = msg;
+    if(!flushScheduled){
+      // Let queued text updates and newer jobs land before doing any work
+      flushScheduled = true;
+      setTimeout(flush, 0);
+    }
+  } else if(msg.type === "cancel"){
+    delete pending[msg.kind];
+  }
+};
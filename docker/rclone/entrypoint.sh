@@ -8,6 +8,7 @@ SYNC_DIR="${SYNC_DIR:-/data/sync}"
 SETTINGS="${SYNC_DIR}/settings.json"
 STATUS="${SYNC_DIR}/status.json"
 RUN_ONCE="${SYNC_DIR}/run_once"
+RUNS="${SYNC_DIR}/runs.jsonl"
 RCLONE_CONF="${SYNC_DIR}/rclone.conf"
 LOG_DIR="${SYNC_DIR}/logs"
 LOG_FILE="${LOG_DIR}/rclone.log"
@@ -42,6 +43,20 @@ EOF
   fi
 }
 
+# Append a run to the history shown by /api/sync/status, keeping the newest 500.
+# rclone's own transfer stats stay in the log file.
+record_run(){
+  result="$1"
+  mode="$2"
+  duration_s="$3"
+  errors=0
+  if [ "${result}" = "error" ]; then errors=1; fi
+  echo "{\"time\":\"$(ts)\",\"engine\":\"rclone\",\"mode\":\"${mode}\",\"full\":true,\"result\":\"${result}\",\"duration_ms\":$((duration_s * 1000)),\"errors\":${errors}}" >> "${RUNS}" || true
+  if [ "$(wc -l < "${RUNS}")" -gt 1000 ]; then
+    tail -n 500 "${RUNS}" > "${RUNS}.tmp" && mv "${RUNS}.tmp" "${RUNS}" || true
+  fi
+}
+
 make_conf(){
   url="$1"
   user="$2"
@@ -58,6 +73,17 @@ pass = ${pass_obsc}
 EOF
 }
 
+# Sleep up to $1 seconds, returning early when the backend drops RUN_ONCE
+# (manual "Sync now", or its debounced trigger after saves)
+wait_for_trigger(){
+  left="$1"
+  while [ "${left}" -gt 0 ]; do
+    if [ -f "${RUN_ONCE}" ]; then return 0; fi
+    sleep 1
+    left=$((left - 1))
+  done
+}
+
 read_setting_bool(){
   key="$1"
   def="$2"
@@ -147,6 +173,17 @@ while true; do
   interval_s="$(read_setting_int interval_s 60)"
   no_deletes="$(read_setting_bool no_deletes true)"
   paused="$(read_setting_bool paused false)"
+  engine="$(read_setting_str engine native)"
+
+  if [ -z "${interval_s}" ]; then interval_s="60"; fi
+  if [ "${interval_s}" -lt 10 ] 2>/dev/null; then interval_s="10"; fi
+
+  if [ "${engine}" != "rclone" ]; then
+    # The backend's native engine syncs and writes the status
+    rm -f "${RUN_ONCE}" || true
+    sleep "${interval_s}"
+    continue
+  fi
 
   do_run="false"
   if [ -f "${RUN_ONCE}" ]; then
@@ -161,14 +198,17 @@ while true; do
   fi
 
   if [ "${do_run}" = "true" ]; then
+    started="$(date +%s)"
     set +e
     run_sync "${enabled}" "${url}" "${remote_path}" "${user}" "${pass_plain}" "${mode}" "${no_deletes}"
     rc=$?
     set -e
     if [ $rc -eq 0 ]; then
       write_status "ok"
+      record_run "ok" "${mode}" "$(( $(date +%s) - started ))"
     else
       write_status "error" "rclone exit ${rc}"
+      record_run "error" "${mode}" "$(( $(date +%s) - started ))"
     fi
   else
     if [ "${paused}" = "true" ]; then
@@ -178,7 +218,5 @@ while true; do
     fi
   fi
 
-  if [ -z "${interval_s}" ]; then interval_s="60"; fi
-  if [ "${interval_s}" -lt 10 ] 2>/dev/null; then interval_s="10"; fi
-  sleep "${interval_s}"
+  wait_for_trigger "${interval_s}"
 done
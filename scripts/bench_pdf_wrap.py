@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark _pdf_wrap_lines against the previous implementation.
+
+Wraps large preformatted blocks (logs, wide code) with both versions, checks the
+output is identical and prints timings.
+
+    python scripts/bench_pdf_wrap.py [--lines N] [--repeat N]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-data-"))
+os.environ.setdefault("CONFIG_DIR", tempfile.mkdtemp(prefix="bench-config-"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.units import mm  # noqa: E402
+from reportlab.pdfbase import pdfmetrics  # noqa: E402
+
+from app.backend.server import _pdf_wrap_lines  # noqa: E402
+
+
+def legacy_wrap_lines(text: str, c, max_width: float, font_name: str, font_size: int):
+    # Implementation before the glyph width cache, kept verbatim for comparison
+    lines_out = []
+    for raw_line in (text or "").splitlines():
+        if not raw_line:
+            lines_out.append("")
+            continue
+        words = raw_line.split(" ")
+        cur = ""
+        for w in words:
+            cand = (cur + " " + w).strip() if cur else w
+            if pdfmetrics.stringWidth(cand, font_name, font_size) <= max_width:
+                cur = cand
+            else:
+                if cur:
+                    lines_out.append(cur)
+                if pdfmetrics.stringWidth(w, font_name, font_size) <= max_width:
+                    cur = w
+                else:
+                    chunk = ""
+                    for ch in w:
+                        cand2 = chunk + ch
+                        if pdfmetrics.stringWidth(cand2, font_name, font_size) <= max_width:
+                            chunk = cand2
+                        else:
+                            if chunk:
+                                lines_out.append(chunk)
+                            chunk = ch
+                    cur = chunk
+        if cur:
+            lines_out.append(cur)
+    return lines_out
+
+
+def make_corpus(lines: int, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    words = ["GET", "/api/notes", "200", "user=alice", "latency_ms=12", "päth/öbject", "→", "{\"k\": [1, 2]}", "",
+             "\tindented", "ERROR", "x" * 40]
+    log = "\n".join(
+        f"2026-01-{rnd.randint(1, 28):02d}T12:00:00Z " + " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 40)))
+        for _ in range(lines)
+    )
+    blob = "\n".join("".join(rnd.choice("0123456789abcdef") for _ in range(rnd.randint(50, 600))) for _ in range(lines // 4))
+    code = "\n".join("    " * rnd.randint(0, 6) + "result = compute(" + ", ".join(f"arg{i}" for i in range(rnd.randint(1, 30))) + ")"
+                     for _ in range(lines))
+    return {"log lines": log, "hex blobs (hard split)": blob, "wide code": code}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--lines", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    max_width = A4[0] - (18 * mm * 2)
+    cases = [("Courier", 8), ("Helvetica", 10.5)]
+    ok = True
+    for name, text in make_corpus(args.lines).items():
+        for font_name, font_size in cases:
+            timings = {}
+            outputs = {}
+            for label, fn in (("legacy", legacy_wrap_lines), ("cached", _pdf_wrap_lines)):
+                best = float("inf")
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    outputs[label] = fn(text, None, max_width, font_name, font_size)
+                    best = min(best, time.perf_counter() - t0)
+                timings[label] = best
+            same = outputs["legacy"] == outputs["cached"]
+            ok = ok and same
+            print(f"{name:<24} {font_name:<10} {font_size:>5}  legacy {timings['legacy'] * 1000:8.1f} ms  "
+                  f"cached {timings['cached'] * 1000:8.1f} ms  x{timings['legacy'] / timings['cached']:5.1f}  "
+                  f"{'identical' if same else 'DIFFERENT'} ({len(outputs['cached'])} lines)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
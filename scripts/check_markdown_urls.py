@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Check that the server-side Markdown preview drops unsafe link/image URLs.
+
+Renders links and images with script schemes (plain, entity-encoded, with
+embedded control characters) and safe ones, and fails if an unsafe URL
+survives or a safe one is rewritten.
+
+    python scripts/check_markdown_urls.py
+"""
+from __future__ import annotations
+
+import html
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="check-data-"))
+os.environ.setdefault("CONFIG_DIR", tempfile.mkdtemp(prefix="check-config-"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.backend.server import render_markdown_html  # noqa: E402
+
+UNSAFE = [
+    "[a](javascript:alert(1))",
+    "[a](JavaScript:alert(1))",
+    "[a](jav&#x61;script:alert(1))",
+    "[a](&#106;avascript:alert(1))",
+    "[a](&#x6A&#x61vascript:alert(1))",
+    "[a](java&Tab;script:alert(1))",
+    "[a](&#32;javascript:alert(1))",
+    "[a](vbscript:msgbox(1))",
+    "![i](data:text/html;base64,PHNjcmlwdD5hbGVydCgxKTwvc2NyaXB0Pg==)",
+    "[a][r]\n\n[r]: jav&#x61;script:alert(1)",
+    "<javascript:alert(1)>",
+]
+SAFE = {
+    "[a](https://example.com/?a=1&b=2)": "https://example.com/?a=1&b=2",
+    "[a](http://example.com)": "http://example.com",
+    "[a](mailto:me@example.com)": "mailto:me@example.com",
+    "[a](#section)": "#section",
+    "[a](other/note.md)": "other/note.md",
+    "<me@example.com>": "mailto:me@example.com",
+}
+_URL_ATTR_RE = re.compile(r'\b(?:href|src)="([^"]*)"')
+
+
+def urls(md: str) -> list:
+    return [html.unescape(u) for u in _URL_ATTR_RE.findall(render_markdown_html(md))]
+
+
+def main() -> int:
+    failures = []
+    for md in UNSAFE:
+        for u in urls(md):
+            if re.sub(r"[\x00-\x20]+", "", u).lower().split(":", 1)[0] in ("javascript", "vbscript", "data"):
+                failures.append(f"unsafe URL kept: {md!r} -> {u!r}")
+    for md, want in SAFE.items():
+        got = urls(md)
+        if got != [want]:
+            failures.append(f"safe URL changed: {md!r} -> {got!r}")
+    for f in failures:
+        print(f)
+    print(f"{len(UNSAFE) + len(SAFE) - len(failures)}/{len(UNSAFE) + len(SAFE)} ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Check PDF export: bulk (/api/export/pdf) in both modes and per note.
+
+Creates notes in a throw-away data dir, including titles and a subject with
+markup characters (`<`, `&`), exports them combined (with TOC) and as a ZIP,
+and fails unless every export returns a PDF.
+
+    python scripts/check_pdf_export.py
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="check-data-"))
+os.environ.setdefault("CONFIG_DIR", tempfile.mkdtemp(prefix="check-config-"))
+os.environ.setdefault("WATCH_FS", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.backend.server import app, ensure_dirs  # noqa: E402
+
+NOTES = [
+    {"title": "Plain note", "subject": "Work", "content": "# Heading\n\nSome text.\n"},
+    {"title": "A <b>&", "subject": "Work", "content": "Title with markup characters.\n"},
+    {"title": "Tom & Jerry <3", "subject": "R&D <lab>", "content": "- one\n- two\n"},
+]
+
+
+def main() -> int:
+    ensure_dirs()
+    client = app.test_client()
+    ids = []
+    for n in NOTES:
+        r = client.post("/api/notes", json={})
+        if r.status_code not in (200, 201):
+            print(f"create failed: {r.status_code}")
+            return 1
+        note_id = r.get_json()["id"]
+        client.put(f"/api/notes/{note_id}/content", json={"content": n["content"], "base_rev": 0})
+        r = client.put(f"/api/notes/{note_id}/meta", json={"title": n["title"], "subject": n["subject"]})
+        if r.status_code != 200:
+            print(f"meta update failed: {n['title']!r}: {r.status_code}")
+            return 1
+        ids.append(note_id)
+    failures = []
+
+    cases = [
+        ("combined, ids", {"mode": "combined", "ids": ids}),
+        ("combined, subject", {"mode": "combined", "subject": "R&D <lab>"}),
+        ("zip, ids", {"mode": "zip", "ids": ids}),
+    ]
+    for label, body in cases:
+        r = client.post("/api/export/pdf", json=body)
+        data = r.get_data()
+        if r.status_code != 200:
+            failures.append(f"{label}: HTTP {r.status_code} {data[:200]!r}")
+            continue
+        if body["mode"] == "combined":
+            pdfs = [data]
+        else:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                pdfs = [zf.read(name) for name in zf.namelist()]
+            if len(pdfs) != len(ids):
+                failures.append(f"{label}: {len(pdfs)} PDFs in ZIP, expected {len(ids)}")
+        if not all(p.startswith(b"%PDF") for p in pdfs):
+            failures.append(f"{label}: not a PDF")
+    for note_id in ids:
+        r = client.get(f"/api/notes/{note_id}/pdf")
+        if r.status_code != 200 or not r.get_data().startswith(b"%PDF"):
+            failures.append(f"single note {note_id}: HTTP {r.status_code}")
+    total = len(cases) + len(ids)
+    for f in failures:
+        print(f)
+    print(f"{total - len(failures)}/{total} ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Benchmark the native WebDAV sync engine.
+
+Creates N notes in a throw-away data dir, then runs push, pull and bisync
+scenarios against a WebDAV server and prints wall time, HTTP requests, bytes
+and files moved per run. Without --url a minimal in-process WebDAV server is
+used; pass --url to measure a real one instead, e.g. the compose `webdav-test`
+profile (`docker compose --profile webdav-test up -d webdav-test`):
+
+    python scripts/sync_bench.py [--notes N] [--mutate FRACTION] [--size BYTES]
+    python scripts/sync_bench.py --url http://127.0.0.1:8081/ --user test --password test
+"""
+from __future__ import annotations
+
+import argparse
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-data-"))
+os.environ.setdefault("CONFIG_DIR", tempfile.mkdtemp(prefix="bench-config-"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.backend.server as srv  # noqa: E402
+
+
+class _DAVStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}  # path -> (data, etag, mtime)
+        self.dirs = {""}
+        self.dir_etags = {}
+
+    def touch(self, path: str) -> None:
+        # A collection's etag changes whenever one of its children changes
+        parent = path.rsplit("/", 1)[0] if "/" in path else ""
+        self.dir_etags[parent] = f'"{time.time_ns()}"'
+
+
+class _DAVHandler(BaseHTTPRequestHandler):
+    """Just enough WebDAV (PROPFIND depth 0/1, GET, PUT, DELETE, MKCOL) for the engine."""
+
+    protocol_version = "HTTP/1.1"
+    store = _DAVStore()
+
+    def log_message(self, *args):
+        pass
+
+    def _path(self) -> str:
+        return urllib.parse.unquote(urllib.parse.urlsplit(self.path).path).strip("/")
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, code: int, body: bytes = b"", headers=None) -> None:
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.store.lock:
+            f = self.store.files.get(self._path())
+        if f is None:
+            return self._send(404)
+        self._send(200, f[0], {"ETag": f[1]})
+
+    def do_PUT(self):
+        path, data = self._path(), self._body()
+        parent = path.rsplit("/", 1)[0] if "/" in path else ""
+        with self.store.lock:
+            if parent not in self.store.dirs:
+                return self._send(409)
+            etag = '"%s"' % hashlib.md5(data).hexdigest()
+            self.store.files[path] = (data, etag, float(self.headers.get("X-OC-Mtime") or time.time()))
+            self.store.touch(path)
+        self._send(201, b"", {"ETag": etag})
+
+    def do_DELETE(self):
+        path = self._path()
+        with self.store.lock:
+            if self.store.files.pop(path, None) is None:
+                return self._send(404)
+            self.store.touch(path)
+        self._send(204)
+
+    def do_MKCOL(self):
+        self._body()
+        path = self._path()
+        with self.store.lock:
+            if path in self.store.dirs:
+                return self._send(405)
+            self.store.dirs.add(path)
+            self.store.touch(path)
+        self._send(201)
+
+    def do_PROPFIND(self):
+        self._body()
+        path, depth = self._path(), self.headers.get("Depth", "1")
+        with self.store.lock:
+            if path not in self.store.dirs and path not in self.store.files:
+                return self._send(404)
+            out = [self._response(path)]
+            if depth == "1" and path in self.store.dirs:
+                prefix = path + "/" if path else ""
+                for child in list(self.store.files) + list(self.store.dirs):
+                    if child and child.startswith(prefix) and "/" not in child[len(prefix):]:
+                        out.append(self._response(child))
+        body = '<?xml version="1.0" encoding="utf-8"?><d:multistatus xmlns:d="DAV:">' + "".join(out) + "</d:multistatus>"
+        self._send(207, body.encode("utf-8"), {"Content-Type": "application/xml; charset=utf-8"})
+
+    def _response(self, path: str) -> str:
+        if path in self.store.dirs:
+            href = urllib.parse.quote("/" + path + ("/" if path else ""))
+            etag = self.store.dir_etags.setdefault(path, '"0"')
+            props = f"<d:resourcetype><d:collection/></d:resourcetype><d:getetag>{escape(etag)}</d:getetag>"
+        else:
+            data, etag, mtime = self.store.files[path]
+            href = urllib.parse.quote("/" + path)
+            props = (f"<d:resourcetype/><d:getetag>{escape(etag)}</d:getetag>"
+                     f"<d:getcontentlength>{len(data)}</d:getcontentlength>"
+                     f"<d:getlastmodified>{email.utils.formatdate(mtime, usegmt=True)}</d:getlastmodified>")
+        return (f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{props}</d:prop>"
+                f"<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>")
+
+
+def start_local_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DAVHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def write_settings(args, mode: str) -> None:
+    # Written directly rather than via POST /api/sync/settings, which would also
+    # request a full re-listing and hide the incremental path being measured
+    srv._ensure_sync_dirs()
+    settings = srv._default_sync_settings()
+    settings.update({
+        "enabled": True, "webdav_url": args.url, "remote_path": args.remote_path,
+        "username": args.user, "password": args.password, "mode": mode, "no_deletes": False,
+    })
+    with open(srv.SYNC_SETTINGS, "w", encoding="utf-8") as f:
+        json.dump(settings, f)
+
+
+def make_text(rnd: random.Random, size: int) -> str:
+    words = ["note", "sync", "webdav", "meeting", "todo", "- [ ] item", "## heading", "lorem", "ipsum", "\n"]
+    out = []
+    n = 0
+    while n < size:
+        w = rnd.choice(words)
+        out.append(w)
+        n += len(w) + 1
+    return " ".join(out)
+
+
+def run(label: str, full: bool = False) -> None:
+    t0 = time.perf_counter()
+    status = srv.sync_run_once(full)
+    wall = time.perf_counter() - t0
+    r = status.get("last_run") or {}
+    print(f"{label:<34} {wall * 1000:9.1f} ms  {r.get('requests', 0):6d} req  "
+          f"up {r.get('bytes_up', 0) / 1024:9.1f} KB  down {r.get('bytes_down', 0) / 1024:9.1f} KB  "
+          f"{r.get('files_transferred', 0):5d} moved / {r.get('files_checked', 0):5d} checked  "
+          f"{status.get('last_result', 'nothing to do')}{' - ' + status['last_error'] if status.get('last_error') else ''}")
+
+
+def mutate_remote(args, names, rnd: random.Random) -> None:
+    dav = srv._WebDAVClient(args.url, args.user, args.password, args.remote_path)
+    try:
+        for name in names:
+            dav.put(name, make_text(rnd, args.size).encode("utf-8"))
+    finally:
+        dav.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--notes", type=int, default=1000)
+    ap.add_argument("--mutate", type=float, default=0.05, help="fraction of notes changed per scenario")
+    ap.add_argument("--size", type=int, default=2000, help="approximate note size in bytes")
+    ap.add_argument("--url", help="WebDAV server to use instead of the in-process one")
+    ap.add_argument("--user", default="test")
+    ap.add_argument("--password", default="test")
+    ap.add_argument("--remote-path", default=f"sync-bench-{os.getpid()}")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    if not args.url:
+        args.url = start_local_server()
+
+    srv.log.setLevel(logging.WARNING)
+    rnd = random.Random(args.seed)
+    client = srv.app.test_client()
+    srv.ensure_dirs()
+    t0 = time.perf_counter()
+    notes = []
+    for i in range(args.notes):
+        meta = client.post("/api/notes", json={}).get_json()
+        client.put(f"/api/notes/{meta['id']}/content", json={"content": make_text(rnd, args.size), "base_rev": meta["rev"]})
+        notes.append(meta["id"])
+    print(f"created {args.notes} notes (~{args.size} B) in {time.perf_counter() - t0:.1f} s; remote {args.url}{args.remote_path}")
+    k = max(1, int(args.notes * args.mutate))
+
+    def mutate_local():
+        for note_id in rnd.sample(notes, k):
+            client.put(f"/api/notes/{note_id}/content", json={"content": make_text(rnd, args.size), "base_rev": 0})
+
+    def remote_names():
+        return rnd.sample(sorted(p.name for p in srv.NOTES_DIR.glob("*.md")), k)
+
+    write_settings(args, "push")
+    run(f"push: initial ({args.notes} notes)")
+    run("push: idle")
+    run("push: idle safety-net reconcile", full=True)
+    mutate_local()
+    run(f"push: {k} notes changed")
+
+    write_settings(args, "pull")
+    run("pull: idle (folder etag check)")
+    mutate_remote(args, remote_names(), rnd)
+    run(f"pull: {k} notes changed remotely")
+
+    write_settings(args, "bisync")
+    run("bisync: idle")
+    mutate_local()
+    mutate_remote(args, remote_names(), rnd)
+    run(f"bisync: {k} local + {k} remote changes")
+    run("bisync: idle safety-net reconcile", full=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())